@@ -11,7 +11,7 @@ from flask_jwt_extended import JWTManager
 from flask_mail import Mail
 from flask_socketio import SocketIO
 
-from database import db, init_db, check_db, create_tables, load_initial_data
+from database import db, init_db, check_db, create_tables, load_initial_data, session_scope
 from models.token import TokenBlocklist
 from services.socket_events import register_socket_handlers
 
@@ -89,13 +89,26 @@ def setup_environment():
         from models import chapter
         from models import lesson
         from models import notification
+        from models import course_search_document
+        from models import channel_course
+        from models import course_skill
 
         check_db()
         create_tables()
         load_initial_data()
 
-        from utils.recommender_system import get_course_recommender
-        _ = get_course_recommender()
+        # skills, search documents and channel memberships of courses created before they were maintained
+        # skills first, search documents are built from them
+        with session_scope() as session:
+            course_skill.CourseSkill.backfill(session)
+            course_search_document.CourseSearchDocument.backfill(session)
+            channel_course.ChannelCourse.backfill(session)
+
+        # workers load the recommender lazily from its artifacts, only train on first deploy
+        from utils.recommender_artifacts import get_latest_artifacts_version
+        if get_latest_artifacts_version() is None:
+            from utils.recommender_system import ensure_course_recommender_artifacts
+            ensure_course_recommender_artifacts()
 
 def init_auth_endpoints():
     from endpoints.auth.signup import UserSignupEndpoint, InstructorSignupEndpoint
@@ -269,6 +282,7 @@ def init_course_endpoints():
         GetUnenrolledCourseEndpoint,
         GetEnrolledCourseEndpoint,
         SearchCoursesEndpoint,
+        BrowseCoursesEndpoint,
         GetInstructorCoursesEndpoint,
         CreateCourseEndpoint,
         RetrieveCourseDetailsEndpoint,
@@ -284,10 +298,12 @@ def init_course_endpoints():
     )
     from endpoints.course.favourite import (
         GetFavouriteCoursesEndpoint,
+        GetPaginatedFavouriteCoursesEndpoint,
         AddFavouriteCourseEndpoint,
         RemoveFavouriteCourseEndpoint
     )
     from endpoints.course.recommender import GetRecommendedCoursesEndpoint
+    from endpoints.course.skill import SearchSkillsEndpoint, GetSkillCoursesEndpoint
     from endpoints.course.lesson import (
         GetLessonDetailsEndpoint,
         PreviewLessonEndpoint,
@@ -304,6 +320,15 @@ def init_course_endpoints():
     search_courses_path = f"/{VERSION}/search/<string:channel_id>"
     ns_course.add_resource(SearchCoursesEndpoint, search_courses_path)
 
+    browse_courses_path = f"/{VERSION}/browse/<string:channel_id>"
+    ns_course.add_resource(BrowseCoursesEndpoint, browse_courses_path)
+
+    search_skills_path = f"/{VERSION}/skill/search"
+    ns_course.add_resource(SearchSkillsEndpoint, search_skills_path)
+
+    get_skill_courses_path = f"/{VERSION}/skill/getCourses/<string:channel_id>"
+    ns_course.add_resource(GetSkillCoursesEndpoint, get_skill_courses_path)
+
     get_instructor_courses_path = f"/{VERSION}/instructor/getInstructorCourses"
     ns_course.add_resource(GetInstructorCoursesEndpoint, get_instructor_courses_path)
 
@@ -343,6 +368,9 @@ def init_course_endpoints():
     get_favourite_courses_path = f"/{VERSION}/user/getFavouriteCourses/<string:channel_id>"
     ns_course.add_resource(GetFavouriteCoursesEndpoint, get_favourite_courses_path)
 
+    get_paginated_favourite_courses_path = f"/{VERSION}/user/getPaginatedFavouriteCourses/<string:channel_id>"
+    ns_course.add_resource(GetPaginatedFavouriteCoursesEndpoint, get_paginated_favourite_courses_path)
+
     add_favourite_course_path = f"/{VERSION}/user/addFavouriteCourse"
     ns_course.add_resource(AddFavouriteCourseEndpoint, add_favourite_course_path)
 
@@ -449,7 +477,7 @@ def init_admin_endpoints():
     from endpoints.admin.channel import CreateChannelEndpoint
     from endpoints.admin.community import CreateCommunityEndpoint, AttachCommunityToChannelEndpoint
     from endpoints.admin.course import EnrollUserEndpoint
-    from endpoints.admin.recommender import ChangeRecommendationTypeEndpoint
+    from endpoints.admin.recommender import ChangeRecommendationTypeEndpoint, RefreshRecommenderEndpoint
 
     change_user_status_path = f"/{VERSION}/user/editStatus"
     ns_admin.add_resource(ChangeUserStatusEndpoint, change_user_status_path)
@@ -481,17 +509,27 @@ def init_admin_endpoints():
     change_recommendation_type_path = f"/{VERSION}/recommender/editType"
     ns_admin.add_resource(ChangeRecommendationTypeEndpoint, change_recommendation_type_path)
 
+    refresh_recommender_path = f"/{VERSION}/recommender/refresh"
+    ns_admin.add_resource(RefreshRecommenderEndpoint, refresh_recommender_path)
+
 def init_internal_endpoints():
-    from endpoints.internal.health import CheckBasicHealthEndpoint
+    from endpoints.internal.health import CheckBasicHealthEndpoint, CheckRecommenderHealthEndpoint
 
     check_basic_health_path = f"/{VERSION}/health/basic"
     ns_internal.add_resource(CheckBasicHealthEndpoint, check_basic_health_path)
 
+    check_recommender_health_path = f"/{VERSION}/health/recommender"
+    ns_internal.add_resource(CheckRecommenderHealthEndpoint, check_recommender_health_path)
+
 def init():
     """ Startup local environment, API warmup, namespaces, etc """
     if os.environ.get('WERKZEUG_RUN_MAIN') != 'true':
         setup_environment()
 
+    # retrain on schedule/on demand and pick up models published by other workers
+    from utils.recommender_retrainer import start_recommender_retrainer
+    start_recommender_retrainer(app)
+
     init_auth_endpoints()
     api.add_namespace(ns_auth)
 
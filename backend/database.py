@@ -1,9 +1,10 @@
 import csv
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import text
+from sqlalchemy import text, event
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.orm.base import NO_VALUE
 from contextlib import contextmanager
 
 COMMUNITY_DATASET_PATH = './data/communities.csv'
@@ -39,8 +40,17 @@ def clear_db():
 
 def create_tables():
     """ Initialise PostgreSQL database tables """
+    if db.engine.dialect.name == 'postgresql':
+        # trigram indexes of course search documents
+        with db.engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
     Base.metadata.create_all(bind=db.engine)
 
+    # create_all skips existing tables, add indexes introduced since they were created
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+
 def create_session():
     """ Create a session for apis """
     session = sessionmaker(bind=db.engine) # HACK: use autoflush=False for more control and enable bulk operations with rollback
@@ -62,6 +72,41 @@ def session_scope():
     finally:
         session.close()
 
+def after_commit(session, callback, *args):
+    """ 
+    Call callback(*args) once the session's transaction commits, e.g. to invalidate caches
+    Callbacks of a transaction that rolls back are dropped, so caches never see uncommitted state
+    """
+    session.info.setdefault('after_commit', []).append((callback, args))
+
+@event.listens_for(Session, 'after_commit')
+def run_after_commit_callbacks(session):
+    for callback, args in session.info.pop('after_commit', []):
+        try:
+            callback(*args)
+        except Exception as e:
+            print(f"After commit callback {callback} failed: {e}")
+
+@event.listens_for(Session, 'after_transaction_end')
+def drop_after_commit_callbacks(session, transaction):
+    # runs after after_commit, anything left belongs to a transaction that rolled back
+    if transaction.parent is None:
+        session.info.pop('after_commit', None)
+
+def attributes_changed(state, attributes):
+    """ Whether any of the attributes of a flushed object changed """
+    return any(state.attrs[attribute].history.has_changes() for attribute in attributes)
+
+def changed_ids(state, attribute):
+    """ Ids of the objects added to or removed from a collection of a flushed object """
+    history = state.attrs[attribute].history
+    return {item.id for item in (*history.added, *history.deleted) if item.id is not None}
+
+def loaded_ids(state, attribute):
+    """ Ids of the objects held by a collection, without loading it """
+    items = state.attrs[attribute].loaded_value
+    return set() if items is NO_VALUE else {item.id for item in items}
+
 def load_initial_data():
     """ Load initial data into database """
     print("Loading initial data into the database. This process may take a while...")
@@ -5,9 +5,12 @@ from flask_restx import Resource
 from app import api, app
 from database import session_scope, create_session
 from utils.admin_decorator import require_admin_key
+from utils.recommender_retrainer import start_recommender_retrainer
 
 change_user_status_parser = api.parser()
 change_user_status_parser.add_argument('recommendation_type', type=str, help='New Recommendation Type', location='json', required=True)
+change_user_status_parser.add_argument('content_weight', type=float, help='Hybrid content weight', location='json', required=False)
+change_user_status_parser.add_argument('collaborative_weight', type=float, help='Hybrid collaborative weight', location='json', required=False)
 
 class ChangeRecommendationTypeEndpoint(Resource):
     @api.doc(
@@ -29,7 +32,9 @@ class ChangeRecommendationTypeEndpoint(Resource):
             Example request JSON:
 
             {
-                "recommendation_type": "collaborative"
+                "recommendation_type": "hybrid",
+                "content_weight": 0.5, (optional, hybrid only)
+                "collaborative_weight": 0.5 (optional, hybrid only)
             }
             """
     )
@@ -40,15 +45,64 @@ class ChangeRecommendationTypeEndpoint(Resource):
         data = request.get_json()
         recommendation_type = data.get('recommendation_type')
 
-        if not recommendation_type or recommendation_type not in ['content', 'collaborative']:
+        if not recommendation_type or recommendation_type not in ['content', 'collaborative', 'hybrid', 'two_tower']:
             return Response(
                 json.dumps({'message': 'Invalid recommendation type'}),
                 status=400, mimetype='application/json'
             )
+
+        weights = {
+            'HYBRID_CONTENT_WEIGHT': data.get('content_weight'),
+            'HYBRID_COLLABORATIVE_WEIGHT': data.get('collaborative_weight'),
+        }
+        for weight in weights.values():
+            if weight is not None and (not isinstance(weight, (int, float)) or weight < 0):
+                return Response(
+                    json.dumps({'message': 'Invalid hybrid weight'}),
+                    status=400, mimetype='application/json'
+                )
         
         app.config['RECOMMENDATION_TYPE'] = recommendation_type
+        for config_key, weight in weights.items():
+            if weight is not None:
+                app.config[config_key] = float(weight)
 
         return Response(
             json.dumps({'message': '(Admin) Recommendation type changed successfully'}),
             status=200, mimetype='application/json'
-        )
\ No newline at end of file
+        )
+
+class RefreshRecommenderEndpoint(Resource):
+    @api.doc(
+        responses={
+            202: 'Accepted',
+            403: 'Forbidden',
+            409: 'Conflict',
+            500: 'Internal Server Error'
+        },
+        params={
+            'X-Admin-Key': {
+                'in': 'header',
+                'description': 'Admin key for running admin apis',
+                'required': True
+            }
+        }
+    )
+    @require_admin_key
+    def post(self):
+        """ 
+        Refresh course recommender
+        Retrains in the background and swaps the new model in once it is validated
+        """
+        retrainer = start_recommender_retrainer(app)
+
+        if not retrainer.request_retrain():
+            return Response(
+                json.dumps({'message': 'Recommender is already retraining'}),
+                status=409, mimetype='application/json'
+            )
+
+        return Response(
+            json.dumps({'message': '(Admin) Recommender retraining started'}),
+            status=202, mimetype='application/json'
+        )
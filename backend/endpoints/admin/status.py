@@ -3,12 +3,16 @@ from flask import Response, request
 from flask_restx import Resource
 
 from app import api
-from database import session_scope, create_session
+from database import session_scope, create_session, after_commit
 from models.user import User, STATUS as USER_STATUS
 from models.instructor import Instructor, STATUS as INSTRUCTOR_STATUS
 from models.channel import Channel, STATUS as CHANNEL_STATUS
 from models.course import Course, STATUS as COURSE_STATUS
 from utils.admin_decorator import require_admin_key
+from utils.candidate_filter import get_candidate_filter
+from utils.course_facets import get_course_facets
+from utils.recommendation_cache import get_recommendation_cache
+from utils.recommender_retrainer import request_recommender_update
 from services.notification_services import NotificationService
 
 change_user_status_parser = api.parser()
@@ -262,6 +266,12 @@ class ChangeCourseStatusEndpoint(Resource):
             try:
                 Course.change_status(session, course_id, new_status)
 
+                # the course may enter or leave the recommendable courses of its channels
+                after_commit(session, request_recommender_update)
+                after_commit(session, get_candidate_filter().invalidate_channel)
+                after_commit(session, get_course_facets().invalidate_channel)
+                after_commit(session, get_recommendation_cache().invalidate_channel)
+
                 # if new_status == 'active':
                 #     NotificationService.add_notification(
                 #         session,
@@ -8,17 +8,24 @@ from flask_jwt_extended import (
 )
 
 from app import api
-from database import session_scope, create_session
+from database import session_scope, create_session, after_commit
 from models.course import Course, STATUS as COURSE_STATUS
 from models.enrollment import Enrollment
 from models.instructor import Instructor
 from models.community import Community
 from models.chapter import Chapter
 from models.lesson import Lesson, LESSON
+from models.skill import split_skills
+from enums.difficulty import DIFFICULTY
+from enums.course import COURSE
 from services.course_services import CourseService
 from services.chapter_services import ChapterService
 from services.instructor_services import InstructorService
 from utils.s3 import s3_client, allowed_file, bucket_name, cloudfront_domain, upload_file
+from utils.candidate_filter import get_candidate_filter
+from utils.course_facets import get_course_facets, PRICE_BANDS, DURATION_BANDS
+from utils.recommendation_cache import get_recommendation_cache
+from utils.recommender_retrainer import request_recommender_update
 
 class GetUnenrolledCourseEndpoint(Resource):
     @api.doc(
@@ -59,6 +66,7 @@ class GetUnenrolledCourseEndpoint(Resource):
                     'lesson_count': str(sum(len(chapter.lessons) for chapter in course.chapters)),
                     'duration': str(course.duration),
                     'skills': course.skills,
+                    'skill_list': [skill.name for skill in course.skill_tags],
                 }),
                 status=200, mimetype='application/json'
             )
@@ -151,6 +159,7 @@ class SearchCoursesEndpoint(Resource):
     @api.doc(
         responses={
             200: 'Ok',
+            400: 'Bad Request',
             401: 'Unauthorized',
             404: 'Resource not found',
             500: 'Internal Server Error'
@@ -166,6 +175,16 @@ class SearchCoursesEndpoint(Resource):
                 'description': 'Search term for courses',
                 'required': False
             },
+            'search_mode': {
+                'in': 'query',
+                'description': 'keyword (default) or semantic',
+                'required': False
+            },
+            'cursor': {
+                'in': 'query',
+                'description': 'Cursor returned with the previous page, replaces page (an offset token for search results)',
+                'required': False
+            },
             'page': {
                 'in': 'query',
                 'description': 'Page number',
@@ -182,33 +201,48 @@ class SearchCoursesEndpoint(Resource):
     def get(self, channel_id):
         """ Get all courses in a channel """
         search_term = request.args.get('search_term', '')
+        search_mode = request.args.get('search_mode', 'keyword')
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 5))
+        cursor = request.args.get('cursor')
+
+        if search_mode not in ['keyword', 'semantic']:
+            return Response(
+                json.dumps({'message': 'Invalid search mode'}),
+                status=400, mimetype='application/json'
+            )
 
         current_email = get_jwt_identity()
 
         session = create_session()
 
         try:
-            courses = CourseService.get_channel_courses(
+            search_courses = (
+                CourseService.search_channel_courses
+                if search_mode == 'semantic'
+                else CourseService.get_channel_courses
+            )
+            courses, next_cursor = search_courses(
                 session,
                 channel_id=channel_id,
                 search_term=search_term,
                 page=page,
-                per_page=per_page
+                per_page=per_page,
+                cursor=cursor
             )
             courses_info = [{
                 'id': course.id,
                 'course_name': course.name,
                 'rating': str(course.rating),
                 'skills': course.skills,
+                'skill_list': [skill.name for skill in course.skill_tags],
                 'course_image': course.image_url,
                 'community_name': course.community.name,
                 'community_logo': course.community.community_logo_url,
             } for course in courses]
 
             return Response(
-                json.dumps({'courses': courses_info}),
+                json.dumps({'courses': courses_info, 'next_cursor': next_cursor}),
                 status=200, mimetype='application/json'
             )
         except ValueError as ee:
@@ -223,7 +257,163 @@ class SearchCoursesEndpoint(Resource):
             )
         finally:
             session.close()
-    
+
+class BrowseCoursesEndpoint(Resource):
+    @api.doc(
+        responses={
+            200: 'Ok',
+            400: 'Bad Request',
+            401: 'Unauthorized',
+            404: 'Resource not found',
+            500: 'Internal Server Error'
+        },
+        params={
+            'Authorization': {
+                'in': 'header',
+                'description': 'Bearer token',
+                'required': True
+            },
+            'difficulty': {
+                'in': 'query',
+                'description': f'Comma delimited difficulties: {", ".join(DIFFICULTY.values())}',
+                'required': False
+            },
+            'course_type': {
+                'in': 'query',
+                'description': f'Comma delimited course types: {", ".join(COURSE.values())}',
+                'required': False
+            },
+            'price': {
+                'in': 'query',
+                'description': f'Comma delimited price bands: {", ".join(PRICE_BANDS)}',
+                'required': False
+            },
+            'duration': {
+                'in': 'query',
+                'description': f'Comma delimited duration bands in weeks: {", ".join(DURATION_BANDS)}',
+                'required': False
+            },
+            'skills': {
+                'in': 'query',
+                'description': 'Comma delimited skills',
+                'required': False
+            },
+            'min_price': {
+                'in': 'query',
+                'description': 'Minimum price',
+                'required': False
+            },
+            'max_price': {
+                'in': 'query',
+                'description': 'Maximum price',
+                'required': False
+            },
+            'min_duration': {
+                'in': 'query',
+                'description': 'Minimum duration in weeks',
+                'required': False
+            },
+            'max_duration': {
+                'in': 'query',
+                'description': 'Maximum duration in weeks',
+                'required': False
+            },
+            'cursor': {
+                'in': 'query',
+                'description': 'Cursor returned with the previous page, replaces page',
+                'required': False
+            },
+            'page': {
+                'in': 'query',
+                'description': 'Page number',
+                'required': False
+            },
+            'per_page': {
+                'in': 'query',
+                'description': 'Number of courses per page',
+                'required': False
+            }
+        },
+    )
+    @jwt_required()
+    def get(self, channel_id):
+        """ Browse courses in a channel by facets, with the course count of every facet value """
+        page = int(request.args.get('page', 1))
+        per_page = int(request.args.get('per_page', 5))
+        cursor = request.args.get('cursor')
+
+        filters = {'skills': split_skills(request.args.get('skills'))}
+        for facet, values in (
+            ('difficulty', DIFFICULTY.values()),
+            ('course_type', COURSE.values()),
+            ('price', PRICE_BANDS),
+            ('duration', DURATION_BANDS)
+        ):
+            selected = [value.strip() for value in request.args.get(facet, '').split(',') if value.strip()]
+            invalid = [value for value in selected if value not in values]
+            if invalid:
+                return Response(
+                    json.dumps({'message': f'Invalid {facet}: {", ".join(invalid)}'}),
+                    status=400, mimetype='application/json'
+                )
+            filters[facet] = selected
+        for bound in ('min_price', 'max_price', 'min_duration', 'max_duration'):
+            try:
+                filters[bound] = float(request.args[bound]) if request.args.get(bound) else None
+            except ValueError:
+                return Response(
+                    json.dumps({'message': f'Invalid {bound}'}),
+                    status=400, mimetype='application/json'
+                )
+
+        session = create_session()
+
+        try:
+            courses, facets, total, next_cursor = CourseService.browse_channel_courses(
+                session,
+                channel_id=channel_id,
+                filters=filters,
+                page=page,
+                per_page=per_page,
+                cursor=cursor
+            )
+            courses_info = [{
+                'id': course.id,
+                'course_name': course.name,
+                'rating': str(course.rating),
+                'skills': course.skills,
+                'skill_list': [skill.name for skill in course.skill_tags],
+                'difficulty': str(course.difficulty),
+                'course_type': str(course.course_type),
+                'price': str(course.price),
+                'duration': str(course.duration),
+                'course_image': course.image_url,
+                'community_name': course.community.name,
+                'community_logo': course.community.community_logo_url,
+            } for course in courses]
+
+            return Response(
+                json.dumps({
+                    'courses': courses_info,
+                    'facets': facets,
+                    'total': total,
+                    'next_cursor': next_cursor
+                }),
+                status=200, mimetype='application/json'
+            )
+        except ValueError as ee:
+            return Response(
+                json.dumps({"error": str(ee)}),
+                status=404, mimetype='application/json'
+            )
+        except Exception as ee:
+            return Response(
+                json.dumps({"error": str(ee)}),
+                status=500, mimetype='application/json'
+            )
+        finally:
+            session.close()
+
 class GetInstructorCoursesEndpoint(Resource):
     @api.doc(
         responses={
@@ -482,6 +672,12 @@ class CreateCourseEndpoint(Resource):
                 # Send a notification to the admin for approval
                 # This can be done through a notification service or email
 
+                # Make the course available to similar course recommendations once committed
+                after_commit(session, request_recommender_update)
+                after_commit(session, get_candidate_filter().invalidate_channel)
+                after_commit(session, get_course_facets().invalidate_channel)
+                after_commit(session, get_recommendation_cache().invalidate_channel)
+
                 return Response(
                     json.dumps({'message': f'Course successfully created'}),
                     status=200, mimetype="application/json"
@@ -540,6 +736,7 @@ class RetrieveCourseDetailsEndpoint(Resource):
                 'currency': course.currency,
                 'difficulty': course.difficulty,
                 'skills': course.skills,
+                'skill_list': [skill.name for skill in course.skill_tags],
                 'course_type': course.course_type,
                 'instructors': [{
                         'instructor_id': instructor.id,
@@ -776,6 +973,12 @@ class EditCourseEndpoint(Resource):
                         
                         Lesson.delete_lesson(session, lesson.id)
 
+                # Refresh the course in similar course recommendations once committed
+                after_commit(session, request_recommender_update)
+                after_commit(session, get_candidate_filter().invalidate_channel)
+                after_commit(session, get_course_facets().invalidate_channel)
+                after_commit(session, get_recommendation_cache().invalidate_channel)
+
                 return Response(
                     json.dumps({'message': 'Course successfully edited'}),
                     status=200, mimetype="application/json"
@@ -29,6 +29,11 @@ class GetUserEnrolledCoursesEndpoint(Resource):
                 'description': 'Bearer token',
                 'required': True
             },
+            'cursor': {
+                'in': 'query',
+                'description': 'Cursor returned with the previous page, replaces page',
+                'required': False
+            },
             'page': {
                 'in': 'query',
                 'description': 'Page number',
@@ -46,18 +51,20 @@ class GetUserEnrolledCoursesEndpoint(Resource):
         """ Get courses the user is enrolled in """
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 5))
+        cursor = request.args.get('cursor')
 
         current_email = get_jwt_identity()
 
         session = create_session()
 
         try:
-            courses = UserService.get_user_enrolled_courses(
+            courses, next_cursor = UserService.get_user_enrolled_courses(
                 session,
                 user_email=current_email,
                 channel_id=channel_id,
                 page=page,
-                per_page=per_page
+                per_page=per_page,
+                cursor=cursor
             )
             course_info = [{
                 'id': course.id,
@@ -74,7 +81,7 @@ class GetUserEnrolledCoursesEndpoint(Resource):
             } for course in courses]
 
             return Response(
-                json.dumps({'courses': course_info}),
+                json.dumps({'courses': course_info, 'next_cursor': next_cursor}),
                 status=200, mimetype='application/json'
             )
         except ValueError as ee:
@@ -104,6 +111,11 @@ class GetUserTopEnrolledCoursesEndpoint(Resource):
                 'description': 'Bearer token',
                 'required': True
             },
+            'cursor': {
+                'in': 'query',
+                'description': 'Cursor returned with the previous page, replaces page',
+                'required': False
+            },
             'page': {
                 'in': 'query',
                 'description': 'Page number',
@@ -121,18 +133,20 @@ class GetUserTopEnrolledCoursesEndpoint(Resource):
         """ Get top enrolled courses for users """
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 5))
+        cursor = request.args.get('cursor')
 
         current_email = get_jwt_identity()
 
         session = create_session()
 
         try:
-            courses = UserService.get_top_enrolled_courses(
+            courses, next_cursor = UserService.get_top_enrolled_courses(
                 session,
                 user_email=current_email,
                 channel_id=channel_id,
                 page=page,
-                per_page=per_page
+                per_page=per_page,
+                cursor=cursor
             )
             course_info = [{
                 'id': course.id,
@@ -143,7 +157,7 @@ class GetUserTopEnrolledCoursesEndpoint(Resource):
             } for course in courses]
 
             return Response(
-                json.dumps({'courses': course_info}),
+                json.dumps({'courses': course_info, 'next_cursor': next_cursor}),
                 status=200, mimetype='application/json'
             )
         except ValueError as ee:
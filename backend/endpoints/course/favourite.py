@@ -10,6 +10,17 @@ from app import api
 from database import session_scope, create_session
 from services.user_services import UserService
 
+def _favourite_course_info(course):
+    return {
+        'id': course.id,
+        'course_name': course.name,
+        'description': course.description,
+        'rating': str(course.rating),
+        'course_image': course.image_url,
+        'community_name': course.community.name,
+        'enrollments': int(len(course.user_enrollments) if course.user_enrollments else 0),
+    }
+
 class GetFavouriteCoursesEndpoint(Resource):
     @api.doc(
         responses={
@@ -47,22 +58,14 @@ class GetFavouriteCoursesEndpoint(Resource):
         session = create_session()
 
         try:
-            courses = UserService.get_user_favourite_courses(
+            courses, _ = UserService.get_user_favourite_courses(
                 session,
                 user_email=current_email,
                 channel_id=channel_id,
                 page=page,
                 per_page=per_page
             )
-            course_info = [{
-                'id': course.id,
-                'course_name': course.name,
-                'description': course.description,
-                'rating': str(course.rating),
-                'course_image': course.image_url,
-                'community_name': course.community.name,
-                'enrollments': int(len(course.user_enrollments) if course.user_enrollments else 0),
-            } for course in courses]
+            course_info = [_favourite_course_info(course) for course in courses]
 
             return Response(
                 json.dumps(course_info),
@@ -81,6 +84,76 @@ class GetFavouriteCoursesEndpoint(Resource):
         finally:
             session.close()
 
+class GetPaginatedFavouriteCoursesEndpoint(Resource):
+    @api.doc(
+        responses={
+            200: 'Ok',
+            401: 'Unauthorized',
+            404: 'Resource not found',
+            500: 'Internal Server Error'
+        },
+        params={
+            'Authorization': {
+                'in': 'header',
+                'description': 'Bearer token',
+                'required': True
+            },
+            'cursor': {
+                'in': 'query',
+                'description': 'Cursor returned with the previous page, replaces page',
+                'required': False
+            },
+            'page': {
+                'in': 'query',
+                'description': 'Page number',
+                'required': False
+            },
+            'per_page': {
+                'in': 'query',
+                'description': 'Number of courses per page',
+                'required': False
+            }
+        },
+    )
+    @jwt_required()
+    def get(self, channel_id):
+        """ Get a page of the user's favourite courses with the cursor of the next page """
+        page = int(request.args.get('page', 1))
+        per_page = int(request.args.get('per_page', 5))
+        cursor = request.args.get('cursor')
+
+        current_email = get_jwt_identity()
+
+        session = create_session()
+
+        try:
+            courses, next_cursor = UserService.get_user_favourite_courses(
+                session,
+                user_email=current_email,
+                channel_id=channel_id,
+                page=page,
+                per_page=per_page,
+                cursor=cursor
+            )
+            course_info = [_favourite_course_info(course) for course in courses]
+
+            return Response(
+                json.dumps({'courses': course_info, 'next_cursor': next_cursor}),
+                status=200, mimetype='application/json'
+            )
+        except ValueError as ee:
+            return Response(
+                json.dumps({"error": str(ee)}),
+                status=404, mimetype='application/json'
+            )
+        except Exception as e:
+            return Response(
+                json.dumps({"error": str(e)}),
+                status=500, mimetype='application/json'
+            )
+        finally:
+            session.close()
+
 add_favourite_course_parser = api.parser()
 add_favourite_course_parser.add_argument('course_id', type=int, help='Course ID', location='json', required=True)
 class AddFavouriteCourseEndpoint(Resource):
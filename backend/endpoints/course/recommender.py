@@ -10,37 +10,6 @@ from flask_jwt_extended import (
 from app import api, app
 from database import session_scope, create_session
 from services.course_services import CourseService
-from utils.recommender_system import get_course_recommender
-
-class RefreshRecommenderEndpoint(Resource):
-    @api.doc(
-        responses={
-            200: 'Ok',
-            401: 'Unauthorized',
-            500: 'Internal Server Error'
-        }
-    )
-    def get(self):
-        """ 
-        Refresh course recommender
-        If recommender is not trained, train it 
-        """
-        # HACK: create a ML pipeline to periodically train the recommender
-        session = create_session()
-
-        try:
-            _ = get_course_recommender()
-            return Response(
-                json.dumps({"message": "Recommender refreshed"}),
-                status=200, mimetype='application/json'
-            )
-        except Exception as e:
-            return Response(
-                json.dumps({"error": str(e)}),
-                status=500, mimetype='application/json'
-            )
-        finally:
-            session.close()
 
 class GetRecommendedCoursesEndpoint(Resource):
     @api.doc(
@@ -78,7 +47,7 @@ class GetRecommendedCoursesEndpoint(Resource):
 
         session = create_session()
 
-        RECOMMENDATION_TYPE = app.config.get('RECOMMENDATION_TYPE', 'content') # 'content' or 'collaborative'
+        RECOMMENDATION_TYPE = app.config.get('RECOMMENDATION_TYPE', 'content') # 'content', 'collaborative', 'hybrid' or 'two_tower'
 
         try:
             courses = CourseService.get_recommended_courses(
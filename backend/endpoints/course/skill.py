@@ -0,0 +1,164 @@
+import json
+from flask import Response, request
+from flask_restx import Resource
+from flask_jwt_extended import jwt_required
+
+from app import api
+from database import create_session
+from models.skill import split_skills
+from services.skill_services import SkillService
+
+class SearchSkillsEndpoint(Resource):
+    @api.doc(
+        responses={
+            200: 'Ok',
+            401: 'Unauthorized',
+            500: 'Internal Server Error'
+        },
+        params={
+            'Authorization': {
+                'in': 'header',
+                'description': 'Bearer token',
+                'required': True
+            },
+            'prefix': {
+                'in': 'query',
+                'description': 'Start of the skill name, case insensitive',
+                'required': False
+            },
+            'limit': {
+                'in': 'query',
+                'description': 'Maximum number of skills',
+                'required': False
+            }
+        },
+    )
+    @jwt_required()
+    def get(self):
+        """ Look up skills by the start of their name """
+        prefix = request.args.get('prefix', '')
+        limit = int(request.args.get('limit', 10))
+
+        session = create_session()
+
+        try:
+            skills = SkillService.search_skills(session, prefix=prefix, limit=limit)
+            skills_info = [{
+                'id': skill.id,
+                'name': skill.name,
+            } for skill in skills]
+
+            return Response(
+                json.dumps({'skills': skills_info}),
+                status=200, mimetype='application/json'
+            )
+        except Exception as ee:
+            return Response(
+                json.dumps({"error": str(ee)}),
+                status=500, mimetype='application/json'
+            )
+        finally:
+            session.close()
+
+class GetSkillCoursesEndpoint(Resource):
+    @api.doc(
+        responses={
+            200: 'Ok',
+            400: 'Bad Request',
+            401: 'Unauthorized',
+            404: 'Resource not found',
+            500: 'Internal Server Error'
+        },
+        params={
+            'Authorization': {
+                'in': 'header',
+                'description': 'Bearer token',
+                'required': True
+            },
+            'skills': {
+                'in': 'query',
+                'description': 'Comma delimited skills',
+                'required': True
+            },
+            'match': {
+                'in': 'query',
+                'description': 'any (default) to match courses teaching one of the skills, all to match courses teaching every skill',
+                'required': False
+            },
+            'cursor': {
+                'in': 'query',
+                'description': 'Cursor returned with the previous page, replaces page',
+                'required': False
+            },
+            'page': {
+                'in': 'query',
+                'description': 'Page number',
+                'required': False
+            },
+            'per_page': {
+                'in': 'query',
+                'description': 'Number of courses per page',
+                'required': False
+            }
+        },
+    )
+    @jwt_required()
+    def get(self, channel_id):
+        """ Get courses in a channel that teach the skills """
+        skills = split_skills(request.args.get('skills'))
+        match = request.args.get('match', 'any')
+        page = int(request.args.get('page', 1))
+        per_page = int(request.args.get('per_page', 5))
+        cursor = request.args.get('cursor')
+
+        if not skills:
+            return Response(
+                json.dumps({'message': 'Skills are required'}),
+                status=400, mimetype='application/json'
+            )
+
+        if match not in ['any', 'all']:
+            return Response(
+                json.dumps({'message': 'Invalid match'}),
+                status=400, mimetype='application/json'
+            )
+
+        session = create_session()
+
+        try:
+            courses, next_cursor = SkillService.get_channel_skill_courses(
+                session,
+                channel_id=channel_id,
+                skills=skills,
+                match_all=match == 'all',
+                page=page,
+                per_page=per_page,
+                cursor=cursor
+            )
+            courses_info = [{
+                'id': course.id,
+                'course_name': course.name,
+                'rating': str(course.rating),
+                'skills': course.skills,
+                'skill_list': [skill.name for skill in course.skill_tags],
+                'course_image': course.image_url,
+                'community_name': course.community.name,
+                'community_logo': course.community.community_logo_url,
+            } for course in courses]
+
+            return Response(
+                json.dumps({'courses': courses_info, 'next_cursor': next_cursor}),
+                status=200, mimetype='application/json'
+            )
+        except ValueError as ee:
+            return Response(
+                json.dumps({"error": str(ee)}),
+                status=404, mimetype='application/json'
+            )
+        except Exception as ee:
+            return Response(
+                json.dumps({"error": str(ee)}),
+                status=500, mimetype='application/json'
+            )
+        finally:
+            session.close()
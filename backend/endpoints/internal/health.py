@@ -3,6 +3,7 @@ from flask import Response, request
 from flask_restx import Resource
 
 from app import api
+from utils.recommender_metrics import get_recommender_metrics
 
 class CheckBasicHealthEndpoint(Resource):
     @api.doc(
@@ -16,4 +17,29 @@ class CheckBasicHealthEndpoint(Resource):
         return Response(
             json.dumps({'message': 'I am okay. I am fine.'}),
             status=200, mimetype='application/json'
-        )
\ No newline at end of file
+        )
+
+class CheckRecommenderHealthEndpoint(Resource):
+    @api.doc(
+        responses={
+            200: 'Ok',
+            500: 'Internal Server Error'
+        },
+        description="""
+            Recommender metrics of the worker that serves the request:
+            stage timings and memory, query latency histograms and percentiles,
+            cache hit rates and the served model version
+            """
+    )
+    def get(self):
+        """ Check recommender health and performance of this worker """
+        try:
+            return Response(
+                json.dumps(get_recommender_metrics().snapshot()),
+                status=200, mimetype='application/json'
+            )
+        except Exception as e:
+            return Response(
+                json.dumps({'error': str(e)}),
+                status=500, mimetype='application/json'
+            )
@@ -0,0 +1,110 @@
+# Channel courses
+# Materialized membership of courses in channels: one row per active course offered in a channel
+# through one of the channel's communities, so course listings filter on an indexed
+# (channel_id, course_id) pair instead of joining courses, communities and channel communities
+# Rows are maintained inside the transaction that changes membership, by a flush listener:
+# - communities attached to or detached from channels
+# - courses created, deleted, changing status or moving community
+
+from sqlalchemy import Column, Integer, ForeignKey, Index, event, inspect, delete, insert, select, or_, and_, exists
+from sqlalchemy.orm import Session
+
+from database import Base, attributes_changed, changed_ids
+from models.course import Course, STATUS as COURSE_STATUS
+from models.channel import Channel
+from models.community import Community
+from models.channel_community import ChannelCommunity
+
+class ChannelCourse(Base):
+    __tablename__ = 'channel_courses'
+
+    channel_id = Column(Integer, ForeignKey('channels.id', ondelete='CASCADE'), primary_key=True)
+    course_id = Column(Integer, ForeignKey('courses.id', ondelete='CASCADE'), primary_key=True)
+
+    __table_args__ = (
+        Index('ix_channel_courses_course_id', 'course_id'),
+    )
+
+    @staticmethod
+    def _members(course_ids=None, channel_ids=None):
+        """ (channel id, course id) of active courses offered in channels, of the given courses or channels """
+        members = (
+            select(ChannelCommunity.channel_id, Course.id)
+            .join(Course, Course.community_id == ChannelCommunity.community_id)
+            .where(Course.status == COURSE_STATUS.ACTIVE)
+        )
+        if course_ids is not None or channel_ids is not None:
+            members = members.where(or_(
+                Course.id.in_(list(course_ids or ())),
+                ChannelCommunity.channel_id.in_(list(channel_ids or ()))
+            ))
+        return members
+
+    @staticmethod
+    def refresh(connection, course_ids=(), channel_ids=()):
+        """ Rebuild the memberships of the given courses and channels """
+        if not (course_ids or channel_ids):
+            return
+
+        connection.execute(
+            delete(ChannelCourse.__table__)
+            .where(or_(
+                ChannelCourse.course_id.in_(list(course_ids)),
+                ChannelCourse.channel_id.in_(list(channel_ids))
+            ))
+        )
+        connection.execute(
+            insert(ChannelCourse.__table__)
+            .from_select(['channel_id', 'course_id'], ChannelCourse._members(course_ids, channel_ids))
+        )
+
+    @staticmethod
+    def backfill(session):
+        """ Reconcile every membership, e.g. after the table was introduced or changed outside the ORM """
+        members = ChannelCourse._members().subquery()
+        session.execute(
+            delete(ChannelCourse.__table__)
+            .where(~exists().where(and_(
+                members.c.channel_id == ChannelCourse.channel_id,
+                members.c.id == ChannelCourse.course_id
+            )))
+        )
+        session.execute(
+            insert(ChannelCourse.__table__)
+            .from_select(
+                ['channel_id', 'course_id'],
+                select(members.c.channel_id, members.c.id)
+                .where(~exists().where(and_(
+                    ChannelCourse.channel_id == members.c.channel_id,
+                    ChannelCourse.course_id == members.c.id
+                )))
+            )
+        )
+
+    def __repr__(self):
+        return f'<Channel: {self.channel_id}, Course: {self.course_id}>'
+
+@event.listens_for(Session, 'after_flush')
+def refresh_channel_courses(session, flush_context):
+    course_ids, channel_ids = set(), set()
+
+    for obj in [*session.new, *session.dirty, *session.deleted]:
+        state = inspect(obj)
+        if isinstance(obj, Course):
+            # rows of deleted courses are dropped by the refresh, their foreign keys cascade on PostgreSQL
+            if obj in session.new or obj in session.deleted or attributes_changed(state, ['status', 'community_id', 'community']):
+                course_ids.add(obj.id)
+        elif isinstance(obj, ChannelCommunity):
+            channel_ids.add(obj.channel_id)
+        elif isinstance(obj, Channel):
+            if obj in session.deleted or attributes_changed(state, ['communities']):
+                channel_ids.add(obj.id)
+        elif isinstance(obj, Community):
+            if attributes_changed(state, ['channels']):
+                channel_ids |= changed_ids(state, 'channels')
+            if attributes_changed(state, ['courses']):
+                course_ids |= changed_ids(state, 'courses')
+
+    course_ids.discard(None)
+    channel_ids.discard(None)
+    ChannelCourse.refresh(session.connection(), course_ids, channel_ids)
@@ -6,20 +6,25 @@ from sqlalchemy import (
     String,
     DateTime,
     ForeignKey,
+    Index,
     event,
     func,
+    inspect,
     select,
     text
 )
 from typing import List
 from sqlalchemy.orm import relationship
 
-from database import Base
+from database import Base, attributes_changed
 from enums.status import STATUS
 from enums.difficulty import DIFFICULTY
 from enums.course import COURSE
 from models.community import Community
 from models.review import Review
+from models.skill import Skill
+from models.course_skill import CourseSkill
+from models.course_update import CourseUpdate
 
 class CourseBuilder:
     """ Unified builder for creating Course instances with factory method """
@@ -231,6 +236,9 @@ class Course(Base):
     # Many-to-one relationship with Chapter
     chapters = relationship("Chapter", back_populates="course", cascade="all, delete-orphan")
 
+    # Many-to-many relationship with Skill, normalized from skills
+    skill_tags = relationship("Skill", secondary="course_skills", order_by="CourseSkill.position", viewonly=True)
+
     @staticmethod
     def get_courses(session):
         return (
@@ -446,6 +454,7 @@ class Course(Base):
             course.skills = ', '.join(new_skills)
             course.updated = func.now()
             session.flush()
+            session.expire(course, ['skill_tags'])
         else:
             raise ValueError("Course not found")
     
@@ -473,6 +482,9 @@ class Course(Base):
     
     def __repr__(self):
         return f'<Name: {self.name}'
+
+# newest courses first, for keyset pagination of course listings
+Index('ix_courses_created_id', Course.created, Course.id)
     
 @event.listens_for(Review, 'after_insert')
 @event.listens_for(Review, 'after_update')
@@ -492,6 +504,22 @@ def update_course_rating(mapper, connection, target):
         .where(Course.id == course_id)
         .values(rating=avg_rating)
     )
+
+@event.listens_for(Course, 'after_insert', propagate=True)
+@event.listens_for(Course, 'after_update', propagate=True)
+def update_course_skills(mapper, connection, target):
+    if attributes_changed(inspect(target), ['skills']):
+        CourseSkill.sync(connection, {target.id: target.skills})
+
+@event.listens_for(Course, 'after_insert', propagate=True)
+@event.listens_for(Course, 'after_update', propagate=True)
+def log_course_update(mapper, connection, target):
+    # the recommender replays the log after commit, bookkeeping columns do not change its features
+    if attributes_changed(
+        inspect(target),
+        [column.key for column in mapper.column_attrs if column.key not in ('created', 'updated')]
+    ):
+        CourseUpdate.record(connection, target.id)
     
 class AcademicCourse(Course):
     # for academic progressions with a broader and theoretical focus
@@ -561,6 +589,7 @@ class AcademicCourse(Course):
             'price': float(self.price),
             'difficulty': self.difficulty,
             'skills': self.skills.split(', ') if self.skills else [],
+            'skill_list': [skill.name for skill in self.skill_tags],
             'school_name': self.school_name,
             'program_type': self.program_type,
             'field': self.field,
@@ -616,6 +645,7 @@ class ProfessionalCourse(Course):
             'price': float(self.price),
             'difficulty': self.difficulty,
             'skills': self.skills.split(', ') if self.skills else [],
+            'skill_list': [skill.name for skill in self.skill_tags],
             'department': self.department,
             'expertise': self.expertise,
             'created': self.created.isoformat() if self.created else None,
@@ -658,6 +688,7 @@ class SpecializationCourse(Course):
             'price': float(self.price),
             'difficulty': self.difficulty,
             'skills': self.skills.split(', ') if self.skills else [],
+            'skill_list': [skill.name for skill in self.skill_tags],
             'subject': self.subject,
             'created': self.created.isoformat() if self.created else None,
             'updated': self.updated.isoformat() if self.updated else None,
@@ -699,6 +730,7 @@ class ProjectCourse(Course):
             'price': float(self.price),
             'difficulty': self.difficulty,
             'skills': self.skills.split(', ') if self.skills else [],
+            'skill_list': [skill.name for skill in self.skill_tags],
             'platform': self.platform,
             'created': self.created.isoformat() if self.created else None,
             'updated': self.updated.isoformat() if self.updated else None,
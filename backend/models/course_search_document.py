@@ -0,0 +1,150 @@
+# Course search documents
+# One row per course holding the text keyword search matches against:
+# course name, description and skills, its community name and its instructors' names
+# - search_vector: weighted tsvector (name A; skills, community and instructors B; description C)
+#   behind a GIN index, for ranked full-text matching
+# - keywords: lowercased name, skills, community and instructor names behind a trigram GIN index,
+#   for substring and typo-tolerant matching
+# Skills are read from the normalized course_skills rows, which are rewritten before the flush ends
+# Documents are refreshed inside the transaction that changes them, by a flush listener,
+# so searches never join the course, skill, community, offer and instructor tables
+# PostgreSQL only, other databases search with the in-process index of utils/course_search
+
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, event, func, inspect, text, bindparam
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import Session
+
+from database import Base, after_commit, attributes_changed, changed_ids, loaded_ids
+from models.course import Course
+from models.community import Community
+from models.instructor import Instructor
+
+SEARCH_CONFIGURATION = 'english' # text search configuration, stems and drops stop words
+COURSE_SEARCH_FIELDS = ('name', 'description', 'skills', 'community', 'community_id', 'instructors')
+
+_REFRESH_STATEMENT = """
+INSERT INTO course_search_documents (course_id, keywords, search_vector, updated)
+SELECT
+    courses.id,
+    lower(concat_ws(' ', courses.name, course_skill_names.names, communities.name, course_instructors.names)),
+    setweight(to_tsvector('{configuration}', coalesce(courses.name, '')), 'A')
+    || setweight(to_tsvector('{configuration}', concat_ws(' ', course_skill_names.names, communities.name, course_instructors.names)), 'B')
+    || setweight(to_tsvector('{configuration}', coalesce(courses.description, '')), 'C'),
+    now()
+FROM courses
+LEFT JOIN communities ON communities.id = courses.community_id
+LEFT JOIN LATERAL (
+    SELECT string_agg(skills.name, ' ' ORDER BY course_skills.position) AS names
+    FROM course_skills
+    JOIN skills ON skills.id = course_skills.skill_id
+    WHERE course_skills.course_id = courses.id
+) AS course_skill_names ON true
+LEFT JOIN LATERAL (
+    SELECT string_agg(instructors.name, ' ' ORDER BY instructors.id) AS names
+    FROM offers
+    JOIN instructors ON instructors.id = offers.instructor_id
+    WHERE offers.course_id = courses.id
+) AS course_instructors ON true
+WHERE {condition}
+ON CONFLICT (course_id) DO UPDATE SET
+    keywords = excluded.keywords,
+    search_vector = excluded.search_vector,
+    updated = excluded.updated
+"""
+
+class CourseSearchDocument(Base):
+    __tablename__ = 'course_search_documents'
+
+    course_id = Column(Integer, ForeignKey('courses.id', ondelete='CASCADE'), primary_key=True)
+    keywords = Column(String, nullable=False)
+    search_vector = Column(TSVECTOR().with_variant(String(), 'sqlite'), nullable=False) # unused outside PostgreSQL
+    updated = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index('ix_course_search_documents_search_vector', 'search_vector', postgresql_using='gin'),
+        Index(
+            'ix_course_search_documents_keywords',
+            'keywords',
+            postgresql_using='gin',
+            postgresql_ops={'keywords': 'gin_trgm_ops'}
+        ),
+    )
+
+    @staticmethod
+    def refresh(connection, course_ids=(), community_ids=(), instructor_ids=()):
+        """ Rebuild the documents of the given courses and of the courses of the given communities and instructors """
+        if not (course_ids or community_ids or instructor_ids):
+            return
+
+        statement = text(_REFRESH_STATEMENT.format(
+            configuration=SEARCH_CONFIGURATION,
+            condition=(
+                "courses.id IN :course_ids"
+                " OR courses.community_id IN :community_ids"
+                " OR courses.id IN (SELECT course_id FROM offers WHERE instructor_id IN :instructor_ids)"
+            )
+        )).bindparams(
+            bindparam('course_ids', expanding=True),
+            bindparam('community_ids', expanding=True),
+            bindparam('instructor_ids', expanding=True)
+        )
+        connection.execute(statement, {
+            'course_ids': list(course_ids),
+            'community_ids': list(community_ids),
+            'instructor_ids': list(instructor_ids),
+        })
+
+    @staticmethod
+    def backfill(session):
+        """ Build the documents of courses that have none, e.g. created before search documents existed """
+        if session.get_bind().dialect.name != 'postgresql':
+            return
+
+        session.execute(text(_REFRESH_STATEMENT.format(
+            configuration=SEARCH_CONFIGURATION,
+            condition=(
+                "NOT EXISTS (SELECT 1 FROM course_search_documents"
+                " WHERE course_search_documents.course_id = courses.id)"
+            )
+        )))
+
+    def __repr__(self):
+        return f'<Course: {self.course_id}>'
+
+@event.listens_for(Session, 'after_flush')
+def refresh_course_search_documents(session, flush_context):
+    course_ids, community_ids, instructor_ids = set(), set(), set()
+    deleted = False
+
+    for obj in [*session.new, *session.dirty]:
+        state = inspect(obj)
+        if isinstance(obj, Course):
+            if obj in session.new or attributes_changed(state, COURSE_SEARCH_FIELDS):
+                course_ids.add(obj.id)
+        elif isinstance(obj, Community):
+            if attributes_changed(state, ['name']):
+                community_ids.add(obj.id)
+            if attributes_changed(state, ['courses']):
+                course_ids |= changed_ids(state, 'courses')
+        elif isinstance(obj, Instructor):
+            if attributes_changed(state, ['name']):
+                instructor_ids.add(obj.id)
+            if attributes_changed(state, ['courses']):
+                course_ids |= changed_ids(state, 'courses')
+
+    for obj in session.deleted:
+        if isinstance(obj, Instructor):
+            # offers are gone by now, the loaded collection still names the courses
+            course_ids |= loaded_ids(inspect(obj), 'courses')
+        elif isinstance(obj, (Course, Community)):
+            # documents of deleted courses cascade, only the in-process index has to drop them
+            deleted = True
+
+    if not (course_ids or community_ids or instructor_ids or deleted):
+        return
+
+    if session.get_bind().dialect.name == 'postgresql':
+        CourseSearchDocument.refresh(session.connection(), course_ids, community_ids, instructor_ids)
+    else:
+        from utils.course_search import get_course_search_index
+        after_commit(session, get_course_search_index().invalidate)
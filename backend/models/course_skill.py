@@ -0,0 +1,95 @@
+# Course skills
+# Association table between Course and Skill, normalized from the comma delimited Course.skills
+# - (course_id, skill_id) primary key: the skills of a course, in their written order by position
+# - (skill_id, course_id) index: the posting list of every skill, the courses teaching it
+# Rows are rewritten whenever a course's skills string is inserted or changes (see models/course.py)
+
+from collections import defaultdict
+from sqlalchemy import Column, Integer, ForeignKey, Index, select, insert, delete
+from sqlalchemy.dialects import postgresql
+
+from database import Base
+from models.skill import Skill, normalize_skill, split_skills
+
+SKILL_BACKFILL_BATCH_SIZE = 1000 # courses per backfill statement
+
+class CourseSkill(Base):
+    __tablename__ = 'course_skills'
+
+    course_id = Column(Integer, ForeignKey('courses.id', ondelete='CASCADE'), primary_key=True)
+    skill_id = Column(Integer, ForeignKey('skills.id', ondelete='CASCADE'), primary_key=True)
+    position = Column(Integer, nullable=False)
+
+    __table_args__ = (Index('ix_course_skills_skill_course', 'skill_id', 'course_id'),)
+
+    @staticmethod
+    def sync(connection, course_skills):
+        """ Rewrite the skill rows of courses from {course id: comma delimited skills} """
+        if not course_skills:
+            return
+
+        parsed = {course_id: split_skills(skills) for course_id, skills in course_skills.items()}
+        names = {}
+        for skills in parsed.values():
+            for skill in skills:
+                names.setdefault(normalize_skill(skill), skill)
+
+        skill_ids = {}
+        if names:
+            lookup = select(Skill.normalized_name, Skill.id).where(Skill.normalized_name.in_(list(names)))
+            skill_ids = dict(connection.execute(lookup).all())
+            missing = [
+                {'name': name, 'normalized_name': normalized_name}
+                for normalized_name, name in names.items() if normalized_name not in skill_ids
+            ]
+            if missing:
+                if connection.dialect.name == 'postgresql':
+                    # concurrent transactions may add the same skill
+                    statement = postgresql.insert(Skill.__table__).on_conflict_do_nothing(index_elements=['normalized_name'])
+                else:
+                    statement = insert(Skill.__table__)
+                connection.execute(statement, missing)
+                skill_ids = dict(connection.execute(lookup).all())
+
+        connection.execute(delete(CourseSkill.__table__).where(CourseSkill.course_id.in_(list(parsed))))
+        rows = [
+            {'course_id': course_id, 'skill_id': skill_ids[normalize_skill(skill)], 'position': position}
+            for course_id, skills in parsed.items()
+            for position, skill in enumerate(skills)
+        ]
+        if rows:
+            connection.execute(insert(CourseSkill.__table__), rows)
+
+    @staticmethod
+    def backfill(session):
+        """ Load the skills of courses that have none, e.g. created before skills were normalized """
+        from models.course import Course
+
+        course_skills = (
+            session.query(Course.id, Course.skills)
+            .filter(
+                Course.skills.isnot(None),
+                Course.skills != '',
+                ~select(CourseSkill.course_id).where(CourseSkill.course_id == Course.id).exists()
+            )
+            .all()
+        )
+        for start in range(0, len(course_skills), SKILL_BACKFILL_BATCH_SIZE):
+            CourseSkill.sync(session.connection(), dict(course_skills[start:start + SKILL_BACKFILL_BATCH_SIZE]))
+
+    @staticmethod
+    def get_postings(session, skill_ids=None, course_ids=None):
+        """ {skill id: ascending ids of the courses teaching it}, of the given skills and courses """
+        postings = session.query(CourseSkill.skill_id, CourseSkill.course_id)
+        if skill_ids is not None:
+            postings = postings.filter(CourseSkill.skill_id.in_(list(skill_ids)))
+        if course_ids is not None:
+            postings = postings.filter(CourseSkill.course_id.in_(list(course_ids)))
+
+        skill_courses = defaultdict(list)
+        for skill_id, course_id in postings.order_by(CourseSkill.skill_id, CourseSkill.course_id):
+            skill_courses[skill_id].append(course_id)
+        return dict(skill_courses)
+
+    def __repr__(self):
+        return f'<Course: {self.course_id}, Skill: {self.skill_id}>'
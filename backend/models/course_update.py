@@ -0,0 +1,48 @@
+# Course updates
+# Append-only log of courses created or changed, replayed into the recommender of every worker
+# without retraining (see utils/recommender_system.py apply_course_updates)
+# Rows are written inside the transaction that changes the course (see models/course.py),
+# so an edit that rolls back is never replayed
+# Trained artifacts record the last update they already include, rows up to it are pruned on publish
+
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, insert, delete, func
+
+from database import Base
+
+class CourseUpdate(Base):
+    __tablename__ = 'course_updates'
+
+    id = Column(Integer, primary_key=True)
+    course_id = Column(Integer, ForeignKey('courses.id', ondelete='CASCADE'), nullable=False)
+    created = Column(DateTime, server_default=func.now())
+
+    @staticmethod
+    def record(connection, course_id):
+        """ Log a change of a course """
+        connection.execute(insert(CourseUpdate.__table__).values(course_id=course_id))
+
+    @staticmethod
+    def get_last_update_id(session):
+        """ Id of the latest logged update, 0 if there is none """
+        return session.query(func.max(CourseUpdate.id)).scalar() or 0
+
+    @staticmethod
+    def get_updates_after(session, update_id):
+        """ (course ids, last update id) of the courses changed after an update, oldest change first """
+        rows = (
+            session.query(CourseUpdate.id, CourseUpdate.course_id)
+            .filter(CourseUpdate.id > update_id)
+            .order_by(CourseUpdate.id)
+            .all()
+        )
+        if not rows:
+            return [], update_id
+        return list(dict.fromkeys(course_id for _, course_id in rows)), rows[-1][0]
+
+    @staticmethod
+    def prune(session, update_id):
+        """ Drop the updates up to and including update_id """
+        session.execute(delete(CourseUpdate.__table__).where(CourseUpdate.id <= update_id))
+
+    def __repr__(self):
+        return f'<CourseUpdate: {self.id}, Course: {self.course_id}>'
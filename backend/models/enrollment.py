@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, DateTime, ForeignKey, func
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Index, func
 
 from database import Base
 
@@ -10,5 +10,8 @@ class Enrollment(Base):
     course_id = Column(Integer, ForeignKey('courses.id', ondelete='CASCADE'), primary_key=True)
     enrolled = Column(DateTime(timezone=True), default=func.now(), nullable=False)
 
+    # a user's enrollments, latest first, for keyset pagination
+    __table_args__ = (Index('ix_enrollments_user_enrolled', 'user_id', 'enrolled', 'course_id'),)
+
     def __repr__(self):
         return f'<(Enrollment) Course: {self.course_id}, User: {self.user_id}>'
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, DateTime, ForeignKey, func
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Index, func
 
 from database import Base
 
@@ -10,5 +10,8 @@ class Favourite(Base):
     course_id = Column(Integer, ForeignKey('courses.id', ondelete='CASCADE'), primary_key=True)
     created = Column(DateTime(timezone=True), default=func.now(), nullable=False)
 
+    # a user's favourites, latest first, for keyset pagination
+    __table_args__ = (Index('ix_favourites_user_created', 'user_id', 'created', 'course_id'),)
+
     def __repr__(self):
         return f'<(Favourite) Course: {self.course_id}, User: {self.user_id}>'
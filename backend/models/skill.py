@@ -0,0 +1,63 @@
+# Skills
+# One row per distinct skill taught by courses, matched case and whitespace insensitively
+# through normalized_name; name keeps the spelling the skill was first written with
+# Courses map to skills through course_skills (see models/course_skill.py), which is
+# maintained from Course.skills and serves as the skill -> courses inverted index
+
+from sqlalchemy import Column, Integer, String, Index
+
+from database import Base
+
+def normalize_skill(skill):
+    """ Case and whitespace insensitive form of a skill """
+    return ' '.join(skill.split()).lower()
+
+def split_skills(skills):
+    """ Distinct skills of a comma delimited skills string, in order """
+    distinct = {}
+    for skill in (skills or '').split(','):
+        skill = ' '.join(skill.split())
+        if skill:
+            distinct.setdefault(normalize_skill(skill), skill)
+    return list(distinct.values())
+
+class Skill(Base):
+    __tablename__ = 'skills'
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    normalized_name = Column(String, unique=True, nullable=False)
+
+    # prefix lookups, text_pattern_ops lets LIKE 'prefix%' use the index under any collation
+    __table_args__ = (
+        Index(
+            'ix_skills_normalized_name_pattern',
+            'normalized_name',
+            postgresql_ops={'normalized_name': 'text_pattern_ops'}
+        ),
+    )
+
+    @staticmethod
+    def get_skill_by_name(session, name):
+        return session.query(Skill).filter_by(normalized_name=normalize_skill(name)).first()
+
+    @staticmethod
+    def get_skills_by_names(session, names):
+        return (
+            session.query(Skill)
+            .filter(Skill.normalized_name.in_([normalize_skill(name) for name in names]))
+            .all()
+        )
+
+    @staticmethod
+    def search_skills(session, prefix, limit):
+        return (
+            session.query(Skill)
+            .filter(Skill.normalized_name.startswith(normalize_skill(prefix), autoescape=True))
+            .order_by(Skill.normalized_name.asc())
+            .limit(limit)
+            .all()
+        )
+
+    def __repr__(self):
+        return f'<Skill: {self.name}>'
@@ -1,10 +1,14 @@
 from sqlalchemy import func
 
+from database import after_commit
 from models.user import User, STATUS as USER_STATUS
 from models.channel import Channel
 from models.user_channel import UserChannel
 from models.community import Community, STATUS as COMMUNITY_STATUS
 from models.channel_community import ChannelCommunity
+from utils.candidate_filter import get_candidate_filter
+from utils.course_facets import get_course_facets
+from utils.recommendation_cache import get_recommendation_cache
 
 class ChannelServiceError(Exception):
     pass
@@ -103,6 +107,10 @@ class ChannelService:
         
         channel.communities.append(community)
         session.flush()
+
+        after_commit(session, get_candidate_filter().invalidate_channel, channel.id)
+        after_commit(session, get_course_facets().invalidate_channel, channel.id)
+        after_commit(session, get_recommendation_cache().invalidate_channel, channel.id)
     
     @staticmethod
     def detach_community(session, channel_id, community_id):
@@ -120,4 +128,8 @@ class ChannelService:
             raise ValueError("Community is not attached to the channel")
         
         session.delete(channel_community)
-        session.flush()
\ No newline at end of file
+        session.flush()
+
+        after_commit(session, get_candidate_filter().invalidate_channel, channel.id)
+        after_commit(session, get_course_facets().invalidate_channel, channel.id)
+        after_commit(session, get_recommendation_cache().invalidate_channel, channel.id)
\ No newline at end of file
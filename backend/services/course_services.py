@@ -1,10 +1,10 @@
 from flask import current_app
 from sqlalchemy import or_, not_, func
+from sqlalchemy.orm import selectinload
 
 from models.course import Course, STATUS as COURSE_STATUS
 from models.channel import Channel
-from models.community import Community
-from models.channel_community import ChannelCommunity
+from models.channel_course import ChannelCourse
 from models.user import User, STATUS as USER_STATUS
 from models.user_channel import UserChannel
 from models.enrollment import Enrollment
@@ -15,53 +15,150 @@ from models.lesson import Lesson
 from models.chapter_lesson import ChapterLesson
 from models.lesson_completion import LessonCompletion
 from models.review import Review
-from utils.recommender_system import get_course_recommender
+from utils.course_search import search_courses
+from utils.pagination import paginate, get_offset, encode_offset_token, encode_cursor, decode_cursor
+from utils.candidate_filter import get_candidate_filter, filter_candidates, page_candidates
+from utils.course_facets import get_course_facets
+from utils.recommendation_cache import get_recommendation_cache
+from utils.user_profiles import get_user_profiles
+from utils.recommender_metrics import get_recommender_metrics
+
+RECOMMENDATION_CANDIDATES = 500 # ranked courses requested before channel filtering
+RANKED_RECOMMENDATION_TYPES = ['content', 'collaborative', 'hybrid', 'two_tower'] # other types are served in random order
 
 class CourseServiceError(Exception):
     pass
 
 class CourseService:
     @staticmethod
-    def get_channel_courses(session, channel_id, search_term, page, per_page):
-        """ Get courses that are in the channel """
+    def get_channel_courses(session, channel_id, search_term, page, per_page, cursor=None):
+        """ 
+        Get courses that are in the channel
+        Returns (courses, next_cursor), a cursor continues after the last course of the previous page
+        Search results are ranked by relevance and page by offset, their next_cursor is an offset token
+        """
         channel = Channel.get_channel_by_id(session, channel_id)
         if not channel:
             raise ValueError("Channel not found")
 
-        offset = (page - 1) * per_page
-
+        # one row per course, so matches can be ranked and paged in the database
         courses = (
             session.query(Course)
-            .join(Community)
-            .join(ChannelCommunity)
-            .join(Channel)
-            .join(Offer)
-            .join(Instructor)
+            .options(selectinload(Course.skill_tags))
+            .join(ChannelCourse)
             .filter(
-                Channel.id == channel_id,
-                Course.status == COURSE_STATUS.ACTIVE
+                ChannelCourse.channel_id == channel.id,
+                Course.instructors.any()
             )
-            .distinct()
         )
 
         if (search_term):
-            search_filters = [
-                Course.name.ilike(f'%{search_term}%'),
-                Community.name.ilike(f'%{search_term}%'),
-                Instructor.name.ilike(f'%{search_term}%'),
-            ]
-
-            courses = courses.filter(or_(*search_filters))
+            # ranked full-text and typo-tolerant matching on the indexed course search documents
+            scope = f'search:{search_term}'
+            offset = get_offset(scope, page, per_page, cursor)
+            matched_courses = search_courses(session, courses, search_term, offset, per_page + 1)
+            next_cursor = encode_offset_token(scope, offset + per_page) if len(matched_courses) > per_page else None
+            return matched_courses[:per_page], next_cursor
         
+        return paginate(
+            courses,
+            sort_keys=[(Course.created, True), (Course.id, True)],
+            scope='channel_courses',
+            per_page=per_page,
+            page=page,
+            cursor=cursor
+        )
+
+    @staticmethod
+    def search_channel_courses(session, channel_id, search_term, page, per_page, cursor=None):
+        """
+        Semantic search over the courses in the channel
+        The query is embedded with the recommender vocabularies and matched against an in-memory
+        vector index, falling back to keyword search when the query has no known words
+        Returns (courses, next_cursor), next_cursor is an offset token into the ranked matches
+        """
+        if not search_term:
+            return CourseService.get_channel_courses(session, channel_id, search_term, page, per_page, cursor)
+
+        channel = Channel.get_channel_by_id(session, channel_id)
+        if not channel:
+            raise ValueError("Channel not found")
+
+        if cursor and decode_cursor(cursor)[0] == f'search:{search_term}':
+            # the query fell back to keyword search on the first page, keep paging its results
+            return CourseService.get_channel_courses(session, channel_id, search_term, page, per_page, cursor)
+
+        scope = f'semantic_search:{search_term}'
+        offset = get_offset(scope, page, per_page, cursor)
+
+        channel_course_ids = get_candidate_filter().get_channel_course_ids(session, channel.id)
+
+        from utils.recommender_system import get_course_recommender
+
+        recommender = get_course_recommender()
+        matched_course_ids = recommender.search_courses(
+            search_term,
+            top_n=offset + per_page + 1,
+            course_ids=channel_course_ids.tolist()
+        )
+        if matched_course_ids is None:
+            return CourseService.get_channel_courses(session, channel_id, search_term, page, per_page, cursor)
+
+        next_cursor = encode_offset_token(scope, offset + per_page) if len(matched_course_ids) > offset + per_page else None
+        page_course_ids = matched_course_ids[offset:offset + per_page]
+        if not page_course_ids:
+            return [], None
+
         paginated_courses = (
-            courses
-            .order_by(Course.created.desc())
-            .offset(offset)
-            .limit(per_page)
+            session.query(Course)
+            .options(selectinload(Course.skill_tags))
+            .filter(Course.id.in_(page_course_ids))
+            .order_by(func.array_position(page_course_ids, Course.id))
             .all()
         )
-        
-        return paginated_courses
+
+        return paginated_courses, next_cursor
+
+    @staticmethod
+    def browse_channel_courses(session, channel_id, filters, page, per_page, cursor=None):
+        """
+        Filter the courses in the channel by difficulty, course type, price, duration and skills
+        Matches and facet counts come from the channel's in-memory facet index, only the page is queried
+        Returns (courses, facets, total, next_cursor)
+        """
+        channel = Channel.get_channel_by_id(session, channel_id)
+        if not channel:
+            raise ValueError("Channel not found")
+
+        after = None
+        if cursor:
+            cursor_scope, values = decode_cursor(cursor)
+            if (
+                cursor_scope != 'browse_courses'
+                or len(values) != 2
+                or not isinstance(values[0], (int, float))
+                or not isinstance(values[1], int)
+            ):
+                raise ValueError("Invalid cursor")
+            after = tuple(values)
+
+        facet_index = get_course_facets().get_channel_index(session, channel.id)
+        page_course_ids, total, facets, following = facet_index.browse(
+            filters,
+            limit=per_page,
+            offset=(page - 1) * per_page,
+            after=after
+        )
+
+        next_cursor = encode_cursor('browse_courses', list(following)) if following else None
+        if not page_course_ids:
+            return [], facets, total, None
+
+        page_courses = {
+            course.id: course
+            for course in session.query(Course).options(selectinload(Course.skill_tags)).filter(Course.id.in_(page_course_ids))
+        }
+        return [page_courses[course_id] for course_id in page_course_ids if course_id in page_courses], facets, total, next_cursor
 
     @staticmethod
     def get_course_instructors(session, course_id):
@@ -84,8 +181,13 @@ class CourseService:
         return instructors
     
     @staticmethod
+    @get_recommender_metrics().timed_query('recommended_courses')
     def get_recommended_courses(session, user_email, channel_id, page, per_page, recommendation_type='random'):
-        """ Get recommended courses for the user """
+        """ 
+        Get recommended courses for the user
+        The recommender ranks candidates, which are filtered to the channel's active courses
+        the user is not enrolled in and paged in memory; only the page itself is queried
+        """
         user = User.get_user_by_email(session, user_email)
         if not user:
             raise ValueError("User not found")
@@ -96,91 +198,81 @@ class CourseService:
         
         offset = (page - 1) * per_page
 
-        user_enrolled_courses = (
-            session.query(Course)
-            .join(Enrollment)
-            .join(User)
-            .join(UserChannel)
-            .join(Channel)
-            .filter(
-                Enrollment.user_id == user.id,
-                Channel.id == channel_id,
-                Course.status == COURSE_STATUS.ACTIVE
-            )
-            .order_by(Enrollment.enrolled.desc())
-            .all()
-        )
+        candidate_filter = get_candidate_filter()
+        channel_course_ids = candidate_filter.get_channel_course_ids(session, channel.id)
+        enrolled_course_ids = candidate_filter.get_user_enrolled_course_ids(session, user.id)
 
-        if recommendation_type == 'random':
-            courses = (
-                session.query(Course)
-                .join(Community)
-                .join(ChannelCommunity)
-                .join(Channel)
-                .filter(
-                    Channel.id == channel_id,
-                    not_(Course.id.in_([course.id for course in user_enrolled_courses])),
-                    Course.status == COURSE_STATUS.ACTIVE,
-                )
-            )
-        elif recommendation_type == 'content':
-            user_latest_enrolled_course_id = user_enrolled_courses[0].id if user_enrolled_courses else None
+        # the ML stack is only imported by processes that serve recommendations
+        from utils.recommender_system import get_course_recommender, HYBRID_CONTENT_WEIGHT, HYBRID_COLLABORATIVE_WEIGHT
 
-            if user_latest_enrolled_course_id:
-                recommender = get_course_recommender()
-                recommended_course_ids = recommender.get_item_to_item_recommendations(
-                    user_latest_enrolled_course_id
-                )
+        recommender = get_course_recommender() if recommendation_type in RANKED_RECOMMENDATION_TYPES else None
+        options = None
+        if recommendation_type == 'hybrid':
+            options = (
+                current_app.config.get('HYBRID_CONTENT_WEIGHT', HYBRID_CONTENT_WEIGHT),
+                current_app.config.get('HYBRID_COLLABORATIVE_WEIGHT', HYBRID_COLLABORATIVE_WEIGHT)
+            )
 
-                courses = (
-                    session.query(Course)
-                    .join(Community)
-                    .join(ChannelCommunity)
-                    .join(Channel)
-                    .filter(
-                        Channel.id == channel_id,
-                        not_(Course.id.in_([course.id for course in user_enrolled_courses])),
-                        Course.status == COURSE_STATUS.ACTIVE,
+        # later pages of the same listing are sliced from the cached ranking
+        recommendation_cache = get_recommendation_cache()
+        cache_key = (channel.id, recommendation_type, recommender.version if recommender else None, options)
+        candidate_course_ids = recommendation_cache.get(user.id, cache_key)
+        if candidate_course_ids is None:
+            ranked_course_ids = []
+            if recommendation_type == 'content':
+                # recency-weighted profile of all enrollments, favourites and completed lessons
+                profile_scores = get_user_profiles().get_scores(session, recommender, user.id)
+                if profile_scores is not None:
+                    ranked_course_ids = recommender.get_profile_recommendations(
+                        profile_scores,
+                        top_n=RECOMMENDATION_CANDIDATES,
+                        exclude_course_ids=enrolled_course_ids.tolist()
                     )
-                    .order_by(func.array_position(recommended_course_ids, Course.id))
+                # cold start problem: no ranked courses, fallback to random recommendation
+            elif recommendation_type == 'collaborative':
+                # users enrolled after training are folded in from their enrollments
+                ranked_course_ids = recommender.get_user_to_item_recommendations(
+                    user.id,
+                    top_n=RECOMMENDATION_CANDIDATES,
+                    enrolled_course_ids=enrolled_course_ids.tolist()
                 )
-            else:
-                # cold start problem: fallback to random recommendation
-                courses = (
-                    session.query(Course)
-                    .join(Community)
-                    .join(ChannelCommunity)
-                    .join(Channel)
-                    .filter(
-                        Channel.id == channel_id,
-                        not_(Course.id.in_([course.id for course in user_enrolled_courses])),
-                        Course.status == COURSE_STATUS.ACTIVE,
-                    )
+            elif recommendation_type == 'hybrid':
+                # cold users get no ranking and fall back to random recommendation
+                ranked_course_ids = recommender.get_hybrid_recommendations(
+                    user.id,
+                    enrolled_course_ids=enrolled_course_ids.tolist(),
+                    top_n=RECOMMENDATION_CANDIDATES,
+                    content_weight=options[0],
+                    collaborative_weight=options[1],
+                    content_scores=get_user_profiles().get_scores(session, recommender, user.id)
                 )
-        elif recommendation_type == 'collaborative':
-            recommender = get_course_recommender()
-            recommended_course_ids = recommender.get_user_to_item_recommendations(
-                user.id
-            )
-
-            courses = (
-                session.query(Course)
-                .join(Community)
-                .join(ChannelCommunity)
-                .join(Channel)
-                .filter(
-                    Channel.id == channel_id,
-                    not_(Course.id.in_([course.id for course in user_enrolled_courses])),
-                    Course.status == COURSE_STATUS.ACTIVE,
+            elif recommendation_type == 'two_tower':
+                # the user tower embeds the current enrollments, cold users fall back to random recommendation
+                ranked_course_ids = recommender.get_two_tower_recommendations(
+                    enrolled_course_ids.tolist(),
+                    top_n=RECOMMENDATION_CANDIDATES
                 )
-                .order_by(func.array_position(recommended_course_ids, Course.id))
-            )
-        
+
+            candidate_course_ids = filter_candidates(ranked_course_ids, channel_course_ids, enrolled_course_ids)
+            recommendation_cache.set(user.id, cache_key, candidate_course_ids)
+
+        # unranked courses keep a stable order per user and channel so pages do not overlap
+        page_course_ids = page_candidates(
+            candidate_course_ids,
+            channel_course_ids,
+            enrolled_course_ids,
+            offset=offset,
+            limit=per_page,
+            seed=[user.id, channel.id]
+        )
+        if not page_course_ids:
+            return []
+
         paginated_courses = (
-            courses
-            .order_by(func.random())
-            .offset(offset)
-            .limit(per_page)
+            session.query(Course)
+            .options(selectinload(Course.skill_tags))
+            .filter(Course.id.in_(page_course_ids))
+            .order_by(func.array_position(page_course_ids, Course.id))
             .all()
         )
         
@@ -1,11 +1,14 @@
 from sqlalchemy import or_, not_, func
 
+from database import after_commit
 from models.user import User
 from models.lesson import Lesson
 from models.course import Course
 from models.homework_submission import HomeworkSubmission
 from services.course_services import CourseService
 from services.notification_services import NotificationService
+from utils.user_profiles import get_user_profiles
+from utils.recommendation_cache import get_recommendation_cache
 
 class LessonServiceError(Exception):
     pass
@@ -29,6 +32,9 @@ class LessonService:
         user.lesson_completions.append(lesson)
         session.flush()
 
+        after_commit(session, get_user_profiles().invalidate, user.id)
+        after_commit(session, get_recommendation_cache().invalidate_user, user.id)
+
         # check if completing this lesson results in completing a course
         newly_completed_course_ids = CourseService.check_course_completion(
             session,
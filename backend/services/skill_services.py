@@ -0,0 +1,57 @@
+from sqlalchemy import func, select
+from sqlalchemy.orm import selectinload
+
+from models.course import Course
+from models.channel import Channel
+from models.channel_course import ChannelCourse
+from models.skill import Skill, normalize_skill
+from models.course_skill import CourseSkill
+from utils.pagination import paginate
+
+class SkillServiceError(Exception):
+    pass
+
+class SkillService:
+    @staticmethod
+    def search_skills(session, prefix, limit):
+        """ Get skills starting with the prefix, alphabetically """
+        return Skill.search_skills(session, prefix, limit)
+
+    @staticmethod
+    def get_channel_skill_courses(session, channel_id, skills, match_all, page, per_page, cursor=None):
+        """
+        Get courses in the channel teaching any of the skills, or all of them with match_all, newest first
+        Courses come from the skills' posting lists in course_skills, no skills string is scanned
+        Returns (courses, next_cursor)
+        """
+        channel = Channel.get_channel_by_id(session, channel_id)
+        if not channel:
+            raise ValueError("Channel not found")
+
+        skill_ids = sorted(skill.id for skill in Skill.get_skills_by_names(session, skills))
+        if not skill_ids or (match_all and len(skill_ids) < len({normalize_skill(skill) for skill in skills})):
+            return [], None
+
+        skill_courses = select(CourseSkill.course_id).where(CourseSkill.skill_id.in_(skill_ids))
+        if match_all:
+            skill_courses = skill_courses.group_by(CourseSkill.course_id).having(func.count() == len(skill_ids))
+
+        courses = (
+            session.query(Course)
+            .options(selectinload(Course.skill_tags))
+            .join(ChannelCourse)
+            .filter(
+                ChannelCourse.channel_id == channel.id,
+                Course.instructors.any(),
+                Course.id.in_(skill_courses)
+            )
+        )
+
+        return paginate(
+            courses,
+            sort_keys=[(Course.created, True), (Course.id, True)],
+            scope=f"skill_courses:{'all' if match_all else 'any'}:{','.join(map(str, skill_ids))}",
+            per_page=per_page,
+            page=page,
+            cursor=cursor
+        )
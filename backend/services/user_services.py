@@ -1,14 +1,19 @@
-from sqlalchemy import func, not_, or_
+from sqlalchemy import func, not_, or_, and_
+from sqlalchemy.orm import selectinload
 
+from database import after_commit
 from models.user import User, STATUS as USER_STATUS
 from models.channel import Channel, STATUS as CHANNEL_STATUS
-from models.community import Community
-from models.channel_community import ChannelCommunity
-from models.course import Course, STATUS as COURSE_STATUS
+from models.course import Course
+from models.channel_course import ChannelCourse
 from models.user_channel import UserChannel
 from models.enrollment import Enrollment
 from models.review import Review
 from models.favourite import Favourite
+from utils.candidate_filter import get_candidate_filter
+from utils.pagination import paginate, decode_cursor
+from utils.recommendation_cache import get_recommendation_cache
+from utils.user_profiles import get_user_profiles
 
 class UserServiceError(Exception):
     pass
@@ -70,8 +75,11 @@ class UserService:
         return channels
     
     @staticmethod
-    def get_user_enrolled_courses(session, user_email, channel_id, page, per_page):
-        """ Get all courses that a user is enrolled in """
+    def get_user_enrolled_courses(session, user_email, channel_id, page, per_page, cursor=None):
+        """ 
+        Get all courses that a user is enrolled in, latest enrollment first
+        Returns (courses, next_cursor)
+        """
         user = User.get_user_by_email(session, user_email)
         if not user:
             raise ValueError("User not found")
@@ -80,34 +88,35 @@ class UserService:
         if not channel:
             raise ValueError("Channel not found")
         
-        offset = (page - 1) * per_page
-        
+        if not session.query(UserChannel).filter_by(user_id=user.id, channel_id=channel.id).first():
+            return [], None
+
         courses = (
             session.query(Course)
+            .options(selectinload(Course.skill_tags))
             .join(Enrollment)
-            .join(User)
-            .join(UserChannel)
-            .join(Channel)
+            .join(ChannelCourse)
             .filter(
                 Enrollment.user_id == user.id,
-                Channel.id == channel_id,
-                Course.status == COURSE_STATUS.ACTIVE
+                ChannelCourse.channel_id == channel.id
             )
         )
 
-        paginated_courses = (
-            courses
-            .order_by(Enrollment.enrolled.desc())
-            .offset(offset)
-            .limit(per_page)
-            .all()
+        return paginate(
+            courses,
+            sort_keys=[(Enrollment.enrolled, True), (Enrollment.course_id, True)],
+            scope='enrolled_courses',
+            per_page=per_page,
+            page=page,
+            cursor=cursor
         )
-        
-        return paginated_courses
     
     @staticmethod
-    def get_top_enrolled_courses(session, user_email, channel_id, page, per_page):
-        """ Get top enrolled courses """
+    def get_top_enrolled_courses(session, user_email, channel_id, page, per_page, cursor=None):
+        """ 
+        Get top enrolled courses
+        Returns (courses, next_cursor), the cursor remembers whether the listing fell back to top rated courses
+        """
         user = User.get_user_by_email(session, user_email)
         if not user:
             raise ValueError("User not found")
@@ -116,64 +125,62 @@ class UserService:
         if not channel:
             raise ValueError("Channel not found")
         
-        offset = (page - 1) * per_page
-        
-        courses = (
-            session.query(Course)
-            .join(Enrollment)
-            .join(User)
-            .join(UserChannel)
-            .join(Channel)
-            .filter(
-                Enrollment.user_id != user.id,
-                Channel.id == channel_id,
-                Course.status == COURSE_STATUS.ACTIVE
-            )
-        )
-
-        paginated_courses = (
-            courses
-            .group_by(Course.id)
-            .order_by(func.count(Enrollment.user_id).desc())
-            .offset(offset)
-            .limit(per_page)
-            .all()
-        )
-
-        # Fallback to top rated courses if there are not enough enrollment data
-        if len(paginated_courses) < 5:
-            user_enrolled_courses = (
+        if not cursor or decode_cursor(cursor)[0] == 'top_enrolled_courses':
+            # courses of the channel ranked by the enrollments of the channel's other users
+            courses = (
                 session.query(Course)
+                .options(selectinload(Course.skill_tags))
+                .join(ChannelCourse)
                 .join(Enrollment)
-                .join(User)
-                .join(UserChannel)
-                .join(Channel)
+                .join(UserChannel, and_(
+                    UserChannel.user_id == Enrollment.user_id,
+                    UserChannel.channel_id == ChannelCourse.channel_id
+                ))
                 .filter(
-                    Enrollment.user_id == user.id,
-                    Channel.id == channel_id,
-                    Course.status == COURSE_STATUS.ACTIVE
+                    Enrollment.user_id != user.id,
+                    ChannelCourse.channel_id == channel.id
                 )
-                .all()
+                .group_by(Course.id)
             )
 
-            fallback_courses = (
-                session.query(Course)
-                .join(Community)
-                .join(ChannelCommunity)
-                .join(Channel)
-                .filter(
-                    Channel.id == channel_id,
-                    not_(Course.id.in_([course.id for course in user_enrolled_courses])),
-                    Course.status == COURSE_STATUS.ACTIVE,
+            # Fallback to top rated courses if there are not enough enrollment data,
+            # decided on the first page and kept for later pages like the cursor's scope
+            if cursor or page == 1 or min(courses.with_entities(Course.id).limit(5).count(), per_page) >= 5:
+                paginated_courses, next_cursor = paginate(
+                    courses,
+                    sort_keys=[(func.count(Enrollment.user_id), True), (Course.id, True)],
+                    scope='top_enrolled_courses',
+                    per_page=per_page,
+                    page=page,
+                    cursor=cursor,
+                    having=True
                 )
-                .order_by(Course.rating.desc(), Course.id)
-                .offset(offset)
-                .limit(per_page)
-                .all()
+                if cursor or page > 1 or len(paginated_courses) >= 5:
+                    return paginated_courses, next_cursor
+
+        user_enrolled_course_ids = (
+            session.query(Enrollment.course_id)
+            .filter(Enrollment.user_id == user.id)
+        )
+
+        fallback_courses = (
+            session.query(Course)
+            .options(selectinload(Course.skill_tags))
+            .join(ChannelCourse)
+            .filter(
+                ChannelCourse.channel_id == channel.id,
+                not_(Course.id.in_(user_enrolled_course_ids))
             )
-            paginated_courses = fallback_courses
-        
-        return paginated_courses
+        )
+
+        return paginate(
+            fallback_courses,
+            sort_keys=[(func.coalesce(Course.rating, 0), True), (Course.id, False)],
+            scope='top_rated_courses',
+            per_page=per_page,
+            page=page,
+            cursor=cursor
+        )
     
     @staticmethod
     def enroll_user(session, user_email, course_id):
@@ -195,6 +202,10 @@ class UserService:
         )
         session.add(enrollment)
         session.flush()
+
+        after_commit(session, get_candidate_filter().invalidate_user, user.id)
+        after_commit(session, get_user_profiles().invalidate, user.id)
+        after_commit(session, get_recommendation_cache().invalidate_user, user.id)
         
         return enrollment
     
@@ -225,6 +236,10 @@ class UserService:
         
         session.delete(enrollment)
         session.flush()
+
+        after_commit(session, get_candidate_filter().invalidate_user, user.id)
+        after_commit(session, get_user_profiles().invalidate, user.id)
+        after_commit(session, get_recommendation_cache().invalidate_user, user.id)
     
     @staticmethod
     def get_user_course_review(session, user_email, course_id):
@@ -330,8 +345,11 @@ class UserService:
         session.flush()
     
     @staticmethod
-    def get_user_favourite_courses(session, user_email, channel_id, page, per_page):
-        """ Get all favourite courses of a user """
+    def get_user_favourite_courses(session, user_email, channel_id, page, per_page, cursor=None):
+        """ 
+        Get all favourite courses of a user, latest first
+        Returns (courses, next_cursor)
+        """
         user = User.get_user_by_email(session, user_email)
         if not user:
             raise ValueError("User not found")
@@ -340,30 +358,28 @@ class UserService:
         if not channel:
             raise ValueError("Channel not found")
         
-        offset = (page - 1) * per_page
-        
+        if not session.query(UserChannel).filter_by(user_id=user.id, channel_id=channel.id).first():
+            return [], None
+
         courses = (
             session.query(Course)
+            .options(selectinload(Course.skill_tags))
             .join(Favourite)
-            .join(User)
-            .join(UserChannel)
-            .join(Channel)
+            .join(ChannelCourse)
             .filter(
-                User.id == user.id,
-                Channel.id == channel_id,
-                Course.status == COURSE_STATUS.ACTIVE
+                Favourite.user_id == user.id,
+                ChannelCourse.channel_id == channel.id
             )
         )
 
-        paginated_courses = (
-            courses
-            .order_by(Favourite.created.desc())
-            .offset(offset)
-            .limit(per_page)
-            .all()
+        return paginate(
+            courses,
+            sort_keys=[(Favourite.created, True), (Favourite.course_id, True)],
+            scope='favourite_courses',
+            per_page=per_page,
+            page=page,
+            cursor=cursor
         )
-        
-        return paginated_courses
     
     @staticmethod
     def add_favourite_course(session, user_email, course_id):
@@ -381,6 +397,9 @@ class UserService:
         
         user.course_favourites.append(course)
         session.flush()
+
+        after_commit(session, get_user_profiles().invalidate, user.id)
+        after_commit(session, get_recommendation_cache().invalidate_user, user.id)
     
     @staticmethod
     def remove_favourite_course(session, user_email, course_id):
@@ -397,4 +416,7 @@ class UserService:
             raise ValueError("Course is not in the user's favourite courses")
         
         user.course_favourites.remove(course)
-        session.flush()
\ No newline at end of file
+        session.flush()
+
+        after_commit(session, get_user_profiles().invalidate, user.id)
+        after_commit(session, get_recommendation_cache().invalidate_user, user.id)
\ No newline at end of file
@@ -0,0 +1,194 @@
+import pytest
+import json
+import importlib.util
+from datetime import datetime, timedelta
+from flask import Flask
+
+import database
+from database import db, init_db, create_session
+from models import token, user, instructor, chat_participant, chat, message, channel, community, course, chapter, lesson, notification
+from models import course_search_document, channel_course, course_skill, skill, user_channel
+from models.channel import Channel
+from models.community import Community
+from models.course import Course, STATUS as COURSE_STATUS
+from models.instructor import Instructor
+from models.user import User
+from models.user_channel import UserChannel
+from enums.course import COURSE
+from enums.difficulty import DIFFICULTY
+from enums.community import COMMUNITY
+from enums.gender import GENDER
+
+# The sample API and middleware tests import a Flask app factory and its config module
+# (create_app, TestConfig) that this backend does not ship, so they cannot be collected without them
+collect_ignore = [] if importlib.util.find_spec('config') else ['test_api.py', 'test_middleware.py']
+
+# Fixtures for the MobiLearn backend, backed by a SQLite database file
+
+@pytest.fixture
+def database_app(tmp_path, monkeypatch):
+    """ Flask app whose database is a fresh SQLite file """
+    from utils import candidate_filter, course_facets, course_search, recommendation_cache, user_profiles
+
+    # per-process caches are keyed by ids that every fresh database reuses
+    monkeypatch.setattr(candidate_filter, '_candidate_filter', candidate_filter.CandidateFilter())
+    monkeypatch.setattr(course_facets, '_course_facets', course_facets.CourseFacets())
+    monkeypatch.setattr(course_search, '_course_search_index', course_search.CourseSearchIndex())
+    monkeypatch.setattr(recommendation_cache, '_recommendation_cache', recommendation_cache.RecommendationCache())
+    monkeypatch.setattr(user_profiles, '_user_profiles', user_profiles.UserProfiles())
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'mobilearn.db'}"
+    init_db(app)
+
+    with app.app_context():
+        database.Base.metadata.create_all(bind=db.engine)
+        yield app
+        db.engine.dispose()
+
+@pytest.fixture
+def session(database_app):
+    session = create_session()
+    yield session
+    session.close()
+
+@pytest.fixture
+def nltk_data():
+    """ Skip tests that preprocess course text when the NLTK corpora are not installed """
+    from utils.field_processor import ensure_nltk_data
+    try:
+        ensure_nltk_data()
+    except LookupError as e:
+        pytest.skip(str(e))
+
+@pytest.fixture
+def make_channel():
+    """ Create a channel offering the courses of new communities """
+    def make_channel(session, name='Channel', communities=1):
+        channel = Channel(name=name, channel_picture_url='')
+        session.add(channel)
+        for index in range(communities):
+            channel.communities.append(Community(name=f'{name} Community {index}', community_type=list(COMMUNITY)[0]))
+        session.flush()
+        return channel
+    return make_channel
+
+@pytest.fixture
+def make_course():
+    """ Create an active course taught by an instructor """
+    def make_course(session, community, name='Course', created=None, **kwargs):
+        instructor = session.query(Instructor).first()
+        if instructor is None:
+            instructor = Instructor(
+                email='instructor@edu.com', password_hash='', name='Instructor',
+                gender=list(GENDER)[0], phone_number='', company='', position=''
+            )
+            session.add(instructor)
+
+        kwargs.setdefault('status', COURSE_STATUS.ACTIVE)
+        kwargs.setdefault('difficulty', DIFFICULTY.BEGINNER)
+        course = Course.add_course(
+            session,
+            community_id=community.id,
+            name=name,
+            description=kwargs.pop('description', f'Learn {name.lower()}'),
+            course_type=kwargs.pop('course_type', COURSE.SPECIALIZATION),
+            **kwargs
+        )
+        course.created = created or datetime(2024, 1, 1) + timedelta(days=course.id)
+        instructor.courses.append(course)
+        session.flush()
+        return course
+    return make_course
+
+@pytest.fixture
+def make_user():
+    """ Create a user in a channel """
+    def make_user(session, channel, email='user@edu.com'):
+        user = User(email=email, password_hash='', name=email, gender=list(GENDER)[0])
+        session.add(user)
+        session.flush()
+        session.add(UserChannel(user_id=user.id, channel_id=channel.id))
+        session.flush()
+        return user
+    return make_user
+
+SKILLS = ['python', 'sql', 'statistics', 'design', 'marketing', 'finance']
+TOPICS = ['data science', 'web development', 'machine learning', 'product design', 'digital marketing', 'accounting']
+
+@pytest.fixture
+def catalog(session, make_channel, make_course):
+    """ A channel with a small catalog of active courses """
+    channel = make_channel(session)
+    courses = [
+        make_course(
+            session,
+            channel.communities[0],
+            name=f'{TOPICS[index % len(TOPICS)]} {index}',
+            description=f'learn {TOPICS[index % len(TOPICS)]} with {SKILLS[index % len(SKILLS)]} projects',
+            skills=[SKILLS[index % len(SKILLS)], SKILLS[(index + 1) % len(SKILLS)]],
+            duration=4 + index,
+            price=10 * index
+        )
+        for index in range(24)
+    ]
+    session.commit()
+    return channel, courses
+
+@pytest.fixture
+def recommender_workdir(nltk_data, tmp_path, monkeypatch):
+    """ Run in tmp_path, so that training exports and artifacts under ./data stay out of the repository """
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'data').mkdir()
+    return tmp_path
+
+@pytest.fixture
+def served_recommender(catalog, recommender_workdir):
+    """ Train a recommender on the catalog, publish its artifacts and serve it """
+    from utils import recommender_system
+
+    recommender = recommender_system.CourseRecommender.train(create_session())
+    recommender.save_artifacts()
+    recommender_system.swap_course_recommender(recommender)
+    yield recommender
+    recommender_system.CourseRecommenderSingleton._instance = None
+
+# Sample fixtures for the app factory template, skipped without its config module
+
+@pytest.fixture
+def app():
+    """Create and configure a Flask app for testing"""
+    TestConfig = pytest.importorskip('config').TestConfig
+    from app import create_app, db
+
+    app = create_app(TestConfig)
+
+    # Create a test context
+    with app.app_context():
+        # Create all tables
+        db.create_all()
+
+        # Create test data
+        test_user = User(username="testuser", email="test@example.com")
+        test_user.set_password("password123")
+        db.session.add(test_user)
+
+        yield app
+
+        # Clean up after the test
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """Create a test client"""
+    return app.test_client()
+
+@pytest.fixture
+def auth_headers(app, client):
+    """Get authentication token and create headers"""
+    response = client.post('/api/login',
+                          data=json.dumps({'username': 'testuser', 'password': 'password123'}),
+                          content_type='application/json')
+    token = json.loads(response.data)['token']
+    return {'Authorization': f'Bearer {token}'}
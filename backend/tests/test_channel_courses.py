@@ -0,0 +1,42 @@
+from models.channel_course import ChannelCourse
+from models.course import Course, STATUS as COURSE_STATUS
+from services.channel_services import ChannelService
+
+def _members(session):
+    return set(session.query(ChannelCourse.channel_id, ChannelCourse.course_id))
+
+def test_memberships_follow_course_changes(session, make_channel, make_course):
+    channel = make_channel(session, communities=2)
+    first, second = channel.communities
+    course = make_course(session, first, name='Python')
+    pending = make_course(session, first, name='SQL', status=COURSE_STATUS.NOT_APPROVED)
+    session.commit()
+    assert _members(session) == {(channel.id, course.id)}
+
+    Course.change_status(session, pending.id, COURSE_STATUS.ACTIVE)
+    course.community = second
+    session.commit()
+    assert _members(session) == {(channel.id, course.id), (channel.id, pending.id)}
+
+    session.delete(course)
+    session.commit()
+    assert _members(session) == {(channel.id, pending.id)}
+
+def test_memberships_follow_channel_communities(session, make_channel, make_course):
+    channel = make_channel(session, name='Channel')
+    other_channel = make_channel(session, name='Other')
+    community = channel.communities[0]
+    course = make_course(session, community)
+    session.commit()
+
+    ChannelService.attach_community(session, other_channel.id, community.id)
+    session.commit()
+    assert _members(session) == {(channel.id, course.id), (other_channel.id, course.id)}
+
+    ChannelService.detach_community(session, channel.id, community.id)
+    session.commit()
+    assert _members(session) == {(other_channel.id, course.id)}
+
+    # rows kept in the same transaction match a full reconcile
+    ChannelCourse.backfill(session)
+    assert _members(session) == {(other_channel.id, course.id)}
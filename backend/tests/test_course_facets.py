@@ -0,0 +1,66 @@
+import pytest
+
+from services.course_services import CourseService
+from services.channel_services import ChannelService
+from utils.course_facets import get_course_facets
+
+def _browse(session, channel, filters, page=1, per_page=100, cursor=None):
+    return CourseService.browse_channel_courses(session, channel.id, filters, page, per_page, cursor)
+
+def _counts(facets, facet):
+    return {entry['value']: entry['count'] for entry in facets[facet]}
+
+def test_facet_counts_keep_alternatives_of_the_filtered_facet(catalog, session):
+    channel, courses = catalog
+    courses_, facets, total, _ = _browse(session, channel, {})
+    assert total == 24 and len(courses_) == 24
+    # prices are 0, 10, ..., 230
+    assert _counts(facets, 'price') == {'free': 1, '0-50': 5, '50-100': 5, '100-200': 10, '200+': 3}
+    assert _counts(facets, 'difficulty')['beginner'] == 24
+
+    filters = {'price': ['free', '0-50'], 'skills': ['Python']}
+    courses_, facets, total, _ = _browse(session, channel, filters)
+    teaches_python = [course for course in courses if 'python' in course.skills.split(',')]
+    expected = {course.id for course in teaches_python if course.price <= 50}
+    assert {course.id for course in courses_} == expected and total == len(expected)
+
+    # price counts are under the skills filter only, skill counts under the price filter only
+    assert sum(_counts(facets, 'price').values()) == len(teaches_python)
+    cheap = [course for course in courses if course.price <= 50]
+    assert _counts(facets, 'skills')['python'] == sum('python' in course.skills.split(',') for course in cheap)
+
+def test_ranges_narrow_their_facet(catalog, session):
+    channel, courses = catalog
+    courses_, _, total, _ = _browse(session, channel, {'min_price': 35, 'max_price': 95, 'max_duration': 10})
+    expected = {course.id for course in courses if 35 <= course.price <= 95 and course.duration <= 10}
+    assert {course.id for course in courses_} == expected and total == len(expected)
+
+def test_cursor_pages_continue_newest_first(catalog, session):
+    channel, courses = catalog
+    filters = {'duration': ['4-12', '12-26']}
+    expected = [course.id for course in sorted(courses, key=lambda course: course.created, reverse=True) if 4 < course.duration <= 26]
+
+    served, cursor = [], None
+    while True:
+        page, _, total, cursor = _browse(session, channel, filters, per_page=5, cursor=cursor)
+        served += [course.id for course in page]
+        if cursor is None:
+            break
+    assert served == expected and total == len(expected)
+    assert [course.id for course in _browse(session, channel, filters, page=2, per_page=5)[0]] == expected[5:10]
+
+    with pytest.raises(ValueError):
+        _browse(session, channel, filters, cursor=CourseService.get_channel_courses(session, channel.id, None, 1, 5)[1])
+
+def test_index_is_rebuilt_after_channel_communities_change(catalog, session, make_channel, make_course):
+    channel, _ = catalog
+    other_channel = make_channel(session, name='Other')
+    make_course(session, other_channel.communities[0], name='other course')
+    session.commit()
+    assert _browse(session, channel, {})[2] == 24
+
+    ChannelService.attach_community(session, channel.id, other_channel.communities[0].id)
+    assert _browse(session, channel, {})[2] == 24 # uncommitted changes keep the cached index
+    session.commit()
+    assert _browse(session, channel, {})[2] == 25
+    assert get_course_facets().misses == 2
@@ -0,0 +1,56 @@
+import pytest
+
+from services.course_services import CourseService
+from utils.course_search import get_course_search_index
+
+def _search(session, channel, search_term, page=1, per_page=100, cursor=None):
+    return CourseService.get_channel_courses(session, channel.id, search_term, page, per_page, cursor)
+
+def _search_ids(session, channel, search_term):
+    return [course.id for course in _search(session, channel, search_term)[0]]
+
+def test_name_matches_rank_above_description_matches(catalog, session, make_course):
+    channel, courses = catalog
+    described = make_course(session, channel.communities[0], name='Bookkeeping', description='balance sheets for accounting')
+    session.commit()
+
+    accounting = [course.id for course in courses if course.name.startswith('accounting')]
+    matched = _search_ids(session, channel, 'accounting')
+    assert set(matched) == set(accounting) | {described.id}
+    assert matched[-1] == described.id
+
+def test_typos_substrings_and_related_names_match(catalog, session, make_course):
+    channel, courses = catalog
+    accounting = {course.id for course in courses if course.name.startswith('accounting')}
+    assert set(_search_ids(session, channel, 'accountng')) == accounting
+    # the former ILIKE search matched inside words too
+    assert set(_search_ids(session, channel, 'ccount')) == accounting
+    # instructors and communities are searchable
+    assert len(_search_ids(session, channel, 'Instructor')) == 24
+    assert len(_search_ids(session, channel, channel.communities[0].name)) == 24
+    assert _search_ids(session, channel, 'astrophysics') == []
+
+def test_search_pages_continue_from_their_cursor(catalog, session):
+    channel, _ = catalog
+    ranked = _search_ids(session, channel, 'data science')
+
+    served, cursor = [], None
+    while True:
+        page, cursor = _search(session, channel, 'data science', per_page=3, cursor=cursor)
+        served += [course.id for course in page]
+        if cursor is None:
+            break
+    assert served == ranked
+    assert [course.id for course in _search(session, channel, 'data science', page=2, per_page=3)[0]] == ranked[3:6]
+    with pytest.raises(ValueError):
+        _search(session, channel, 'machine learning', cursor=_search(session, channel, 'data science', per_page=3)[1])
+
+def test_committed_edits_are_searchable(catalog, session):
+    channel, courses = catalog
+    assert _search_ids(session, channel, 'quantum') == []
+
+    courses[5].name = 'Quantum computing'
+    session.flush()
+    assert _search_ids(session, channel, 'quantum') == [] # rebuilt only once the edit commits
+    session.commit()
+    assert _search_ids(session, channel, 'quantum') == [courses[5].id]
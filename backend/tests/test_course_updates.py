@@ -0,0 +1,72 @@
+import pytest
+
+from database import after_commit
+from models.course import Course, STATUS as COURSE_STATUS
+from models.course_update import CourseUpdate
+
+def test_after_commit_runs_callbacks_only_once_committed(session, make_channel):
+    called = []
+    make_channel(session, name='Committed')
+    after_commit(session, called.append, 'committed')
+    assert called == []
+    session.commit()
+    assert called == ['committed']
+
+    make_channel(session, name='Rolled back')
+    after_commit(session, called.append, 'rolled back')
+    session.rollback()
+    session.commit()
+    assert called == ['committed']
+
+def test_course_changes_are_logged_in_their_transaction(catalog, session, make_course):
+    channel, courses = catalog
+    last_update_id = CourseUpdate.get_last_update_id(session)
+
+    courses[0].name = 'Renamed course'
+    session.commit()
+    assert CourseUpdate.get_updates_after(session, last_update_id)[0] == [courses[0].id]
+    last_update_id = CourseUpdate.get_last_update_id(session)
+
+    # bookkeeping columns do not change recommender features
+    courses[1].updated = courses[1].created
+    session.commit()
+    assert CourseUpdate.get_updates_after(session, last_update_id) == ([], last_update_id)
+
+    # rolled back edits leave nothing to replay
+    courses[2].name = 'Never committed'
+    session.flush()
+    session.rollback()
+    assert CourseUpdate.get_updates_after(session, last_update_id) == ([], last_update_id)
+
+    course = make_course(session, channel.communities[0], name='New course')
+    courses[0].description = 'Edited twice'
+    session.commit()
+    assert CourseUpdate.get_updates_after(session, last_update_id)[0] == [course.id, courses[0].id]
+
+def test_apply_course_updates_patches_only_active_courses(served_recommender, catalog, session, make_course):
+    from utils.recommender_system import apply_course_updates, get_course_recommender
+
+    channel, courses = catalog
+    assert served_recommender.course_update_id == CourseUpdate.get_last_update_id(session)
+    assert apply_course_updates() == 0
+
+    active = make_course(session, channel.communities[0], name='data science capstone', skills=['python', 'sql'])
+    pending = make_course(
+        session, channel.communities[0], name='machine learning capstone', skills=['python'],
+        status=COURSE_STATUS.NOT_APPROVED
+    )
+    session.commit()
+
+    assert apply_course_updates() == 1
+    recommender = get_course_recommender()
+    assert active.id in recommender.neighbor_index.id_to_row
+    assert pending.id not in recommender.neighbor_index.id_to_row
+    assert recommender.course_update_id == CourseUpdate.get_last_update_id(session)
+    active_vector = recommender.item_features[recommender.neighbor_index.id_to_row[active.id], :recommender._get_search_dimensions()]
+    assert active.id in recommender.search_index.search(active_vector, top_k=5)[0]
+
+    # approving the course replays it
+    Course.change_status(session, pending.id, COURSE_STATUS.ACTIVE)
+    session.commit()
+    assert apply_course_updates() == 1
+    assert pending.id in get_course_recommender().neighbor_index.id_to_row
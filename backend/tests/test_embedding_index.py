@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from utils.embedding_index import EmbeddingIndex
+
+def _unit_vectors(count, dimensions=16, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(count, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def test_exact_search_with_candidates_and_min_score():
+    vectors = _unit_vectors(20)
+    index = EmbeddingIndex(np.arange(100, 120), vectors, approximate_threshold=np.inf)
+
+    row_ids, scores = index.search(vectors[3], top_k=3)
+    assert row_ids[0] == 103
+    assert scores[0] == pytest.approx(1.0, abs=1e-5)
+    assert list(scores) == sorted(scores, reverse=True)
+
+    row_ids, _ = index.search(vectors[3], top_k=3, candidate_ids=[105, 107, 999])
+    assert set(row_ids) == {105, 107}
+
+    row_ids, scores = index.search(vectors[3], top_k=20, min_score=0.99)
+    assert list(row_ids) == [103]
+
+def test_with_row_leaves_the_searched_index_unchanged():
+    pytest.importorskip('faiss')
+    vectors = _unit_vectors(50)
+    index = EmbeddingIndex(np.arange(50), vectors, approximate_threshold=10)
+    assert index.is_approximate
+
+    new_vector = _unit_vectors(1, seed=1)[0]
+    updated = index.with_row(50, new_vector)
+
+    # requests holding the old index keep searching an unchanged graph
+    assert index.ann_index.ntotal == 50
+    assert len(index) == 50
+    assert updated.ann_index is not index.ann_index
+    assert updated.ann_index.ntotal == 51
+    assert updated.ann_index.hnsw.efSearch == index.ann_index.hnsw.efSearch
+    assert updated.search(new_vector, top_k=1)[0][0] == 50
+
+    # an edited row is re-scored with its new vector without touching the graph
+    edited = updated.with_row(0, new_vector)
+    assert edited.ann_index is updated.ann_index
+    _, scores = edited.search(new_vector, top_k=2, candidate_ids=[0, 50])
+    np.testing.assert_allclose(scores, [1.0, 1.0], atol=1e-5)
+
+def test_with_rows_copies_the_graph_once_per_batch(monkeypatch):
+    faiss = pytest.importorskip('faiss')
+    vectors = _unit_vectors(50)
+    index = EmbeddingIndex(np.arange(50), vectors, approximate_threshold=10)
+
+    clones = []
+    clone_index = faiss.clone_index
+    monkeypatch.setattr(faiss, 'clone_index', lambda ann_index: clones.append(ann_index) or clone_index(ann_index))
+
+    new_vectors = _unit_vectors(4, seed=2)
+    updated = index.with_rows([50, 3, 51, 52], new_vectors)
+
+    assert len(clones) == 1
+    assert index.ann_index.ntotal == 50
+    assert updated.ann_index.ntotal == 53
+    assert list(updated.row_ids[50:]) == [50, 51, 52]
+    np.testing.assert_allclose(updated.vectors[3], new_vectors[1])
+    np.testing.assert_allclose(updated.vectors[50:], new_vectors[[0, 2, 3]])
+    assert updated.search(new_vectors[3], top_k=1)[0][0] == 52
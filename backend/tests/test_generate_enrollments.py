@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.generate_enrollments import generate_enrollments, save_enrollments, load_enrollments, load_course_skills
+
+def _courses(skills):
+    return pd.DataFrame({'course_id': np.arange(1, len(skills) + 1) * 10, 'skills': skills})
+
+def test_enrollments_are_reproducible_and_within_the_catalog():
+    courses_df = _courses(['python, sql', "['python']", 'design', '', 'finance, sql'] * 4)
+    enrollments_df = generate_enrollments(n_users=30, max_enrollments_per_user=6, courses_df=courses_df, seed=7)
+
+    pd.testing.assert_frame_equal(
+        enrollments_df,
+        generate_enrollments(n_users=30, max_enrollments_per_user=6, courses_df=courses_df, seed=7)
+    )
+    assert set(enrollments_df['user_id']) == set(range(1, 31))
+    assert set(enrollments_df['course_id']) <= set(courses_df['course_id'])
+    assert not enrollments_df.duplicated().any()
+    assert enrollments_df.groupby('user_id').size().max() <= 6
+
+def test_walks_follow_shared_skills():
+    # two disjoint skill clusters, every step follows a skill
+    courses_df = _courses(['python'] * 5 + ['design'] * 5)
+    enrollments_df = generate_enrollments(n_users=20, monte=1.0, courses_df=courses_df, seed=0)
+    clusters = enrollments_df['course_id'].map(lambda course_id: course_id <= 50)
+    assert (clusters.groupby(enrollments_df['user_id']).nunique() == 1).all()
+
+@pytest.mark.parametrize('skills', [['', '', ''], [None, float('nan'), '[]']])
+def test_catalog_without_skills_draws_by_popularity(skills):
+    enrollments_df = generate_enrollments(n_users=10, courses_df=_courses(skills), seed=0)
+    assert set(enrollments_df['course_id']) <= {10, 20, 30}
+    assert (enrollments_df.groupby('user_id').size() >= 1).all()
+
+def test_empty_catalog_or_no_users_generates_nothing():
+    assert generate_enrollments(n_users=5, courses_df=_courses([])).empty
+    assert generate_enrollments(n_users=0, courses_df=_courses(['python'])).empty
+
+def test_saved_enrollments_load_back(tmp_path):
+    enrollments_df = generate_enrollments(n_users=5, courses_df=_courses(['python', 'sql', 'python, sql']), seed=1)
+    save_enrollments(enrollments_df, tmp_path / 'enrollments.npz')
+    pd.testing.assert_frame_equal(load_enrollments(tmp_path / 'enrollments.npz'), enrollments_df)
+
+def test_courses_come_from_the_database(catalog, session):
+    with pytest.raises(ValueError):
+        generate_enrollments(n_users=5)
+
+    _, courses = catalog
+    courses_df = load_course_skills(session)
+    assert courses_df['course_id'].tolist() == sorted(course.id for course in courses)
+    assert courses_df['skills'].iloc[0] == [skill.name for skill in courses[0].skill_tags]
+    enrollments_df = generate_enrollments(n_users=10, courses_df=courses_df, seed=0)
+    assert set(enrollments_df['course_id']) <= set(courses_df['course_id'])
@@ -0,0 +1,103 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from utils.neighbor_index import NeighborIndex
+
+def _unit_vectors(count, dimensions=8, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(count, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def _dense_neighbors(features, row, k):
+    scores = features @ features[row]
+    scores[row] = -np.inf
+    return np.argsort(-scores, kind='stable')[:k]
+
+def test_blocked_builds_match_the_dense_similarity_matrix():
+    features = _unit_vectors(40)
+    row_ids = np.arange(100, 140)
+    similarity_matrix = features @ features.T
+
+    indexes = [
+        NeighborIndex.from_similarity_matrix(similarity_matrix, row_ids, k=5, block_size=7),
+        NeighborIndex.from_features(features, row_ids, k=5, block_size=7),
+        # half of the columns sparse, the densest ones scored densely
+        NeighborIndex.from_sparse_features(csr_matrix(np.where(features > 0, features, 0)), row_ids, k=5, block_size=7),
+    ]
+    for index in indexes[:2]:
+        for row in range(40):
+            np.testing.assert_array_equal(index.neighbors[row], _dense_neighbors(features, row, 5))
+            assert row not in index.neighbors[row]
+
+    sparse_features = np.where(features > 0, features, 0)
+    for row in range(40):
+        expected = set(_dense_neighbors(sparse_features, row, 5))
+        assert len(expected & set(indexes[2].neighbors[row])) >= 4 # ties may be ordered differently
+
+def test_neighbors_are_cut_by_count_and_similarity():
+    features = _unit_vectors(20)
+    index = NeighborIndex.from_features(features, np.arange(20), k=10)
+    neighbor_ids, scores = index.get_neighbors(3, top_n=4)
+    assert len(neighbor_ids) == 4 and list(scores) == sorted(scores, reverse=True)
+
+    # like the dense recommender, only neighbors scoring above min_similarity are kept
+    cutoff = float(index.scores[3][5])
+    neighbor_ids, scores = index.get_neighbors(3, min_similarity=cutoff)
+    assert (scores > cutoff).all() and len(neighbor_ids) == 5
+
+def test_with_row_adds_and_refreshes_rows_without_touching_the_served_index():
+    features = _unit_vectors(21)
+    index = NeighborIndex.from_features(features[:20], np.arange(20), k=5)
+    served_neighbors = np.array(index.neighbors)
+
+    # the new row is a copy of row 0, so they become each other's best neighbor
+    features[20] = features[0]
+    updated = index.with_row(20, features[:21] @ features[20])
+    np.testing.assert_array_equal(index.neighbors, served_neighbors)
+    assert 20 in updated and 20 not in index
+    assert updated.get_neighbors(20, top_n=1)[0][0] == 0
+    assert updated.get_neighbors(0, top_n=1)[0][0] == 20
+
+    np.testing.assert_array_equal(
+        updated.neighbors[20], np.array([0, *_dense_neighbors(features[:20], 0, 4)])
+    )
+
+def test_saved_index_loads_memory_mapped(tmp_path):
+    index = NeighborIndex.from_features(_unit_vectors(10), np.arange(10), k=3)
+    index.save(tmp_path)
+    loaded = NeighborIndex.load(tmp_path)
+    assert isinstance(loaded.neighbors, np.memmap)
+    np.testing.assert_array_equal(loaded.neighbors, index.neighbors)
+    assert loaded.get_neighbors(4)[0].tolist() == index.get_neighbors(4)[0].tolist()
+
+def test_single_course_index_gains_neighbors_as_courses_are_added():
+    features = _unit_vectors(4)
+    index = NeighborIndex.from_features(features[:1], [10], k=2)
+    assert index.k == 0
+
+    index = index.with_row(11, features[:2] @ features[1])
+    assert index.k == 1
+    assert index.get_neighbors(10)[0].tolist() == [11]
+    assert index.get_neighbors(11)[0].tolist() == [10]
+
+    # grows with the catalog up to max_k, matching a rebuild
+    index = index.with_rows([12, 13], features[2:] @ features.T, max_k=2)
+    rebuilt = NeighborIndex.from_features(features, [10, 11, 12, 13], k=2)
+    assert index.k == 2
+    np.testing.assert_array_equal(index.neighbors, rebuilt.neighbors)
+    np.testing.assert_allclose(index.scores, rebuilt.scores, rtol=1e-6)
+
+def test_batched_rows_match_rows_added_one_by_one():
+    features = _unit_vectors(30)
+    index = NeighborIndex.from_features(features[:25], np.arange(25), k=4)
+    features[3] = _unit_vectors(1, seed=2)[0] # an edited row
+    updated_rows = [3, 25, 26, 27, 28, 29, 0]
+    features[0] = _unit_vectors(1, seed=3)[0]
+
+    batched = index.with_rows(updated_rows, features[updated_rows] @ features.T)
+    one_by_one = index
+    for row in updated_rows:
+        n_rows = max(len(one_by_one), row + 1)
+        one_by_one = one_by_one.with_row(row, features[:n_rows] @ features[row])
+    np.testing.assert_array_equal(batched.row_ids, one_by_one.row_ids)
+    for row in updated_rows:
+        np.testing.assert_array_equal(batched.neighbors[row], one_by_one.neighbors[row])
@@ -0,0 +1,113 @@
+import pytest
+from datetime import datetime
+
+from models.course import Course
+from models.enrollment import Enrollment
+from models.favourite import Favourite
+from services.course_services import CourseService
+from services.user_services import UserService
+from utils.pagination import paginate, encode_cursor, decode_cursor, get_offset
+
+def _walk(fetch_page):
+    """ Ids of every course served by following next cursors from the first page """
+    course_ids, cursor = [], None
+    while True:
+        courses, cursor = fetch_page(cursor)
+        course_ids += [course.id for course in courses]
+        if cursor is None:
+            return course_ids
+
+def test_cursor_round_trip():
+    cursor = encode_cursor('channel_courses', [datetime(2024, 5, 1, 12, 30), 7])
+    assert decode_cursor(cursor) == ('channel_courses', ['2024-05-01T12:30:00', 7])
+    with pytest.raises(ValueError):
+        decode_cursor('not a cursor')
+
+def test_cursors_match_offset_pages(catalog, session):
+    channel, courses = catalog
+    newest_first = [course.id for course in sorted(courses, key=lambda course: course.created, reverse=True)]
+
+    assert _walk(lambda cursor: CourseService.get_channel_courses(session, channel.id, None, 1, 5, cursor)) == newest_first
+    offset_pages = [
+        course.id
+        for page in range(1, 6)
+        for course in CourseService.get_channel_courses(session, channel.id, None, page, 5)[0]
+    ]
+    assert offset_pages == newest_first
+
+def test_cursor_pages_do_not_shift_on_inserts(catalog, session, make_course):
+    channel, courses = catalog
+    first_page, cursor = CourseService.get_channel_courses(session, channel.id, None, 1, 5)
+    # a newer course would push the first page's last course onto an offset page 2
+    make_course(session, channel.communities[0], name='newest course', created=datetime(2030, 1, 1))
+    session.commit()
+
+    second_page, _ = CourseService.get_channel_courses(session, channel.id, None, 1, 5, cursor)
+    assert first_page[-1].created > second_page[0].created
+    assert not {course.id for course in first_page} & {course.id for course in second_page}
+
+def test_cursors_are_bound_to_their_listing(catalog, session):
+    channel, _ = catalog
+    _, cursor = CourseService.get_channel_courses(session, channel.id, None, 1, 5)
+    with pytest.raises(ValueError):
+        paginate(session.query(Course), [(Course.id, True)], 'other_courses', 5, cursor=cursor)
+    with pytest.raises(ValueError):
+        get_offset('search:python', 1, 5, cursor)
+    assert get_offset('search:python', 3, 5) == 10
+
+def _enroll_others(session, channel, make_user, courses, enrollments_per_course):
+    """ Enroll other users of the channel, course i gets enrollments_per_course[i] enrollments """
+    users = [make_user(session, channel, email=f'other{index}@edu.com') for index in range(max(enrollments_per_course))]
+    for course, count in zip(courses, enrollments_per_course):
+        session.add_all(Enrollment(user_id=user.id, course_id=course.id) for user in users[:count])
+    session.commit()
+
+def test_top_enrolled_later_pages_keep_the_enrollment_ranking(catalog, session, make_user):
+    channel, courses = catalog
+    user = make_user(session, channel)
+    _enroll_others(session, channel, make_user, courses[:7], [7, 6, 5, 4, 3, 2, 1])
+    ranked = [course.id for course in courses[:7]]
+
+    first_page, cursor = UserService.get_top_enrolled_courses(session, user.email, channel.id, 1, 5)
+    second_page, next_cursor = UserService.get_top_enrolled_courses(session, user.email, channel.id, 2, 5)
+    assert [course.id for course in first_page + second_page] == ranked
+    assert next_cursor is None
+    # past the ranking, a page is empty instead of switching to top rated courses
+    assert UserService.get_top_enrolled_courses(session, user.email, channel.id, 3, 5) == ([], None)
+
+    assert _walk(lambda cursor: UserService.get_top_enrolled_courses(session, user.email, channel.id, 1, 5, cursor)) == ranked
+
+def test_top_enrolled_falls_back_to_top_rated_from_the_first_page(catalog, session, make_user):
+    channel, courses = catalog
+    user = make_user(session, channel)
+    _enroll_others(session, channel, make_user, courses[:3], [3, 2, 1])
+    for index, course in enumerate(courses):
+        course.rating = index % 5
+    session.commit()
+
+    top_rated = [course.id for course in sorted(courses, key=lambda course: (-course.rating, course.id))]
+    pages = [
+        course.id
+        for page in range(1, 6)
+        for course in UserService.get_top_enrolled_courses(session, user.email, channel.id, page, 5)[0]
+    ]
+    assert pages == top_rated
+    assert _walk(lambda cursor: UserService.get_top_enrolled_courses(session, user.email, channel.id, 1, 5, cursor)) == top_rated
+
+def test_user_course_listings_load_skills_with_the_page(catalog, session, make_user):
+    channel, courses = catalog
+    user = make_user(session, channel)
+    _enroll_others(session, channel, make_user, courses[:5], [5, 4, 3, 2, 1])
+    session.add_all(Enrollment(user_id=user.id, course_id=course.id) for course in courses[5:8])
+    session.add_all(Favourite(user_id=user.id, course_id=course.id) for course in courses[8:10])
+    session.commit()
+
+    session.expire_all()
+    for page, _ in (
+        UserService.get_user_enrolled_courses(session, user.email, channel.id, 1, 5),
+        UserService.get_top_enrolled_courses(session, user.email, channel.id, 1, 5),
+        UserService.get_user_favourite_courses(session, user.email, channel.id, 1, 5),
+    ):
+        assert page
+        # payloads list each course's skills without a query per course
+        assert all('skill_tags' in course.__dict__ for course in page)
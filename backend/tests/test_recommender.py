@@ -0,0 +1,133 @@
+import json
+import os
+import numpy as np
+
+from database import create_session
+from models.course import Course
+
+def test_tfidf_text_weighting_is_trained_saved_and_reloaded(catalog, recommender_workdir, monkeypatch):
+    from utils import recommender_system
+    from utils.recommender_system import CourseRecommender
+
+    monkeypatch.setattr(recommender_system, 'TEXT_EMBEDDING_WEIGHTING', 'tfidf')
+    recommender = CourseRecommender.train(create_session())
+    assert recommender.tfidf_weighting
+    assert set(recommender.text_idf) == {'name', 'description', 'skills'}
+
+    # 'learn' starts every description, a topic word is in a sixth of them
+    vocabulary = recommender.field_processor.description_embeddings.key_to_index
+    description_idf = recommender.text_idf['description']
+    assert description_idf[vocabulary['learn']] < description_idf[vocabulary['accounting']]
+
+    version_path = recommender.save_artifacts()
+    with open(os.path.join(version_path, 'manifest.json')) as file:
+        assert json.load(file)['text_weighting'] == 'tfidf'
+
+    # artifacts keep the weighting they were trained with
+    monkeypatch.setattr(recommender_system, 'TEXT_EMBEDDING_WEIGHTING', 'mean')
+    loaded = CourseRecommender.load_artifacts(create_session())
+    assert loaded.tfidf_weighting
+    for field, idf in recommender.text_idf.items():
+        np.testing.assert_array_equal(loaded.text_idf[field], idf)
+
+    # a course is embedded for an upsert with the idf learned in training
+    session = create_session()
+    course = session.query(Course).filter_by(id=int(loaded.courses_df['course_id'].iloc[0])).one()
+    row = loaded.neighbor_index.id_to_row[course.id]
+    trained_features = np.array(loaded.item_features[row])
+    loaded.upsert_course(course)
+    np.testing.assert_allclose(loaded.item_features[row], trained_features, atol=1e-5)
+    session.close()
+
+def test_mean_text_weighting_saves_no_idf(catalog, recommender_workdir):
+    from utils.recommender_system import CourseRecommender
+
+    recommender = CourseRecommender.train(create_session())
+    assert not recommender.tfidf_weighting
+    version_path = recommender.save_artifacts()
+    assert not os.path.exists(os.path.join(version_path, 'text_idf.npz'))
+    assert not CourseRecommender.load_artifacts(create_session()).tfidf_weighting
+
+def test_retraining_preprocesses_only_changed_texts(catalog, recommender_workdir, monkeypatch):
+    from utils import field_processor
+    from utils.field_processor import FieldProcessor
+    from utils.recommender_system import CourseRecommender
+
+    CourseRecommender.train(create_session()).save_artifacts()
+
+    # the next training process starts with an empty cache
+    monkeypatch.setattr(field_processor, '_text_cache', type(field_processor._text_cache)())
+    _, courses = catalog
+    session = create_session()
+    session.get(Course, courses[0].id).description = 'learn pottery with clay projects'
+    session.commit()
+    session.close()
+
+    preprocessed = []
+    for kind in ('name', 'description', 'skills'):
+        preprocess = getattr(FieldProcessor, f'preprocess_{kind}')
+        monkeypatch.setattr(
+            FieldProcessor, f'preprocess_{kind}',
+            lambda self, text, kind=kind, preprocess=preprocess: preprocessed.append((kind, text)) or preprocess(self, text)
+        )
+    CourseRecommender.train(create_session())
+    assert preprocessed == [('description', 'learn pottery with clay projects')]
+
+def test_latest_pointer_names_only_complete_current_artifacts(tmp_path):
+    from utils.recommender_artifacts import get_latest_artifacts_version, RECOMMENDER_ARTIFACTS_FORMAT
+
+    assert get_latest_artifacts_version(tmp_path) is None
+    (tmp_path / 'LATEST').write_text('20240101000000000000')
+    assert get_latest_artifacts_version(tmp_path) is None # version directory is missing
+
+    version_path = tmp_path / '20240101000000000000'
+    version_path.mkdir()
+    (version_path / 'manifest.json').write_text(json.dumps({'format': RECOMMENDER_ARTIFACTS_FORMAT - 1}))
+    assert get_latest_artifacts_version(tmp_path) is None # older formats are retrained
+    (version_path / 'manifest.json').write_text(json.dumps({'format': RECOMMENDER_ARTIFACTS_FORMAT}))
+    assert get_latest_artifacts_version(tmp_path) == '20240101000000000000'
+
+def test_artifacts_load_the_trained_recommender(served_recommender, session):
+    from utils import recommender_system
+    from utils.recommender_system import CourseRecommender, reload_course_recommender
+
+    version = CourseRecommender.get_latest_artifacts_version()
+    assert version == served_recommender.version
+    loaded = CourseRecommender.load_artifacts(session)
+    assert loaded.version == version
+    assert isinstance(loaded.item_features, np.memmap) # shared between workers through the page cache
+
+    for course_id in served_recommender.courses_df['course_id'].head(5).tolist():
+        assert loaded.get_item_to_item_recommendations(course_id) == served_recommender.get_item_to_item_recommendations(course_id)
+    user_id = next(iter(served_recommender.user_mapping))
+    assert loaded.get_user_to_item_recommendations(user_id) == served_recommender.get_user_to_item_recommendations(user_id)
+
+    # workers swap in newer published versions only
+    assert reload_course_recommender() is None
+    for _ in range(3):
+        loaded.save_artifacts()
+    reloaded = reload_course_recommender()
+    assert reloaded.version == loaded.version != version
+    assert recommender_system.get_course_recommender() is reloaded
+    # older versions are pruned
+    assert len([name for name in os.listdir('data/recommender') if name != 'LATEST']) == 3
+    assert version not in os.listdir('data/recommender')
+
+def test_unseen_users_are_folded_in_from_their_enrollments(served_recommender):
+    recommender = served_recommender
+    new_user_id = max(recommender.user_mapping) + 1
+    course_ids = recommender.courses_df['course_id'].head(3).tolist()
+
+    recommended = recommender.get_user_to_item_recommendations(new_user_id, top_n=5, enrolled_course_ids=course_ids)
+    assert len(recommended) == 5
+    assert not set(recommended) & set(course_ids)
+
+    # the solve is cached until the enrollments change
+    user_factors, user_items = recommender.get_folded_user_factors(new_user_id, course_ids)
+    assert recommender.get_folded_user_factors(new_user_id, course_ids)[0] is user_factors
+    np.testing.assert_allclose(user_factors, np.asarray(recommender.model.recalculate_user(0, user_items)).reshape(-1), rtol=1e-5)
+    assert recommender.get_folded_user_factors(new_user_id, course_ids[:2])[0] is not user_factors
+
+    # nothing known to fold in leaves the cold start fallback to the caller
+    assert recommender.get_user_to_item_recommendations(new_user_id + 1, enrolled_course_ids=[]) == []
+    assert recommender.get_user_to_item_recommendations(new_user_id + 1, enrolled_course_ids=[-1]) == []
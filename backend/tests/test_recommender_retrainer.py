@@ -0,0 +1,61 @@
+import os
+import time
+
+import pytest
+from flask import Flask
+
+from utils import recommender_retrainer
+from utils.recommender_retrainer import RecommenderRetrainer
+
+class _TrainingProcess:
+    returncode = None
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def poll(self):
+        return self.returncode
+
+@pytest.fixture
+def retrainer_app(monkeypatch):
+    # the tests drive the background thread's steps themselves
+    monkeypatch.setattr(RecommenderRetrainer, 'start', lambda self: self)
+    monkeypatch.setattr(recommender_retrainer.subprocess, 'Popen', _TrainingProcess)
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    return app
+
+def test_only_one_worker_trains_at_a_time(retrainer_app, tmp_path):
+    pytest.importorskip('fcntl')
+    workers = [RecommenderRetrainer(retrainer_app, artifacts_path=str(tmp_path)) for _ in range(2)]
+
+    assert workers[0].request_retrain()
+    assert not workers[0].request_retrain()
+    # another worker sees the training lock held in the shared artifacts directory
+    assert not workers[1].request_retrain()
+    assert not workers[1].is_training
+
+    # the lock is released once the training process exits
+    workers[0]._start_retrain()
+    workers[0]._process.returncode = 1
+    workers[0]._finish_retrain()
+    assert not workers[0].is_training
+    assert workers[1].request_retrain()
+
+def test_scheduled_retrain_waits_for_the_published_artifacts_to_age(retrainer_app, tmp_path):
+    pytest.importorskip('fcntl')
+    retrainer = RecommenderRetrainer(retrainer_app, retrain_interval=3600, artifacts_path=str(tmp_path))
+
+    # another worker published half an interval ago
+    latest_path = tmp_path / 'LATEST'
+    latest_path.write_text('20240101000000')
+    published = time.time() - 1800
+    os.utime(latest_path, (published, published))
+    remaining = retrainer._schedule_retrain()
+    assert remaining == pytest.approx(1800, abs=5)
+    assert not retrainer.is_training
+    assert retrainer._lock_file is None
+
+    os.utime(latest_path, (published - 1800, published - 1800))
+    assert retrainer._schedule_retrain() is None
+    assert retrainer.is_training
@@ -0,0 +1,102 @@
+from sqlalchemy import update
+
+from models.course import Course
+from models.course_skill import CourseSkill
+from models.skill import Skill, split_skills
+from services.course_services import CourseService
+from services.skill_services import SkillService
+from utils.course_search import CourseSearchIndex
+
+def _skill_names(session, course):
+    session.expire(course, ['skill_tags'])
+    return [skill.name for skill in course.skill_tags]
+
+def test_split_skills_keeps_the_first_spelling_in_order():
+    assert split_skills(' Python,  machine   learning, python ,,SQL') == ['Python', 'machine learning', 'SQL']
+    assert split_skills(None) == []
+
+def test_course_skills_follow_the_skills_string(catalog, session, make_course):
+    channel, _ = catalog
+    course = make_course(session, channel.communities[0], name='Analytics', skills=['SQL', ' Data  Visualization', 'sql'])
+    session.commit()
+    # skills are shared case and whitespace insensitively, in written order
+    assert _skill_names(session, course) == ['sql', 'Data Visualization']
+    assert Skill.get_skill_by_name(session, 'data visualization').id == course.skill_tags[1].id
+
+    Course.change_skills(session, course.id, ['Tableau', 'SQL'])
+    session.commit()
+    assert _skill_names(session, course) == ['Tableau', 'sql']
+
+    Course.change_skills(session, course.id, [])
+    session.commit()
+    assert _skill_names(session, course) == []
+
+def test_backfill_and_postings(catalog, session):
+    channel, courses = catalog
+    # skills written outside the ORM have no rows until backfilled
+    session.execute(update(Course.__table__).where(Course.id == courses[0].id).values(skills='Rust, Go'))
+    session.query(CourseSkill).filter_by(course_id=courses[0].id).delete()
+    session.commit()
+    assert _skill_names(session, courses[0]) == []
+
+    CourseSkill.backfill(session)
+    session.commit()
+    assert _skill_names(session, courses[0]) == ['Rust', 'Go']
+
+    python = Skill.get_skill_by_name(session, 'python')
+    python_course_ids = sorted(course.id for course in courses[1:] if 'python' in course.skills.split(','))
+    assert CourseSkill.get_postings(session, skill_ids=[python.id]) == {python.id: python_course_ids}
+    assert CourseSkill.get_postings(session, course_ids=[courses[0].id]) == {
+        skill.id: [courses[0].id] for skill in Skill.get_skills_by_names(session, ['rust', 'go'])
+    }
+
+def test_skill_lookup_and_channel_skill_courses(catalog, session):
+    channel, courses = catalog
+    assert [skill.name for skill in SkillService.search_skills(session, 'S', 10)] == ['sql', 'statistics']
+
+    def skill_course_ids(skills, match_all):
+        return {
+            course.id
+            for course in SkillService.get_channel_skill_courses(session, channel.id, skills, match_all, 1, 100)[0]
+        }
+
+    teaching = lambda skill: {course.id for course in courses if skill in course.skills.split(',')}
+    assert skill_course_ids(['Python', 'design'], False) == teaching('python') | teaching('design')
+    assert skill_course_ids(['python', 'sql'], True) == teaching('python') & teaching('sql')
+    assert skill_course_ids(['python', 'unknown'], True) == set()
+
+def test_search_index_matches_skills_from_postings(catalog, session):
+    channel, courses = catalog
+    course_ids = [course.id for course in courses]
+    Course.change_skills(session, courses[0].id, ['Kubernetes'])
+    session.commit()
+
+    search_index = CourseSearchIndex()
+    assert search_index.search(session, 'kubernetes', course_ids) == [courses[0].id]
+    # its former skills no longer match it
+    assert courses[0].id not in search_index.search(session, 'sql', course_ids)
+
+def test_course_listings_load_skills_with_the_page(catalog, session):
+    channel, _ = catalog
+    listings = [
+        CourseService.get_channel_courses(session, channel.id, None, 1, 5)[0],
+        CourseService.get_channel_courses(session, channel.id, 'python', 1, 5)[0],
+        CourseService.browse_channel_courses(session, channel.id, {'skills': ['python']}, 1, 5)[0],
+        SkillService.get_channel_skill_courses(session, channel.id, ['python'], False, 1, 5)[0],
+    ]
+    for courses in listings:
+        assert courses and all('skill_tags' in course.__dict__ for course in courses)
+        assert all('python' in [skill.name for skill in course.skill_tags] for course in listings[-1])
+
+def test_recommender_and_payloads_read_the_normalized_skills(catalog, session, make_course):
+    from utils.recommender_system import CourseRecommender
+
+    channel, _ = catalog
+    course = make_course(session, channel.communities[0], name='Analytics', skills=['SQL', ' Data  Visualization', 'sql'], duration=4, price=10)
+    session.commit()
+
+    assert CourseRecommender._course_to_record(course)['skills'] == 'sql, Data Visualization'
+    # payloads keep the written skills next to the normalized ones
+    payload = course.to_dict()
+    assert payload['skills'] == course.skills.split(', ')
+    assert payload['skill_list'] == ['sql', 'Data Visualization']
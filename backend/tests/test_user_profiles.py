@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from datetime import datetime, timedelta, timezone
+
+from models.enrollment import Enrollment
+from models.favourite import Favourite
+from utils.user_profiles import UserProfiles, load_user_interactions, PROFILE_RECENCY_HALF_LIFE
+
+class ProfileScorer:
+    """ Stands in for a served recommender, scores a profile by its total weight """
+    def __init__(self, offset):
+        self.offset = offset
+
+    def get_profile_scores(self, course_ids, weights):
+        return np.full(3, self.offset + weights.sum(), dtype=np.float32)
+
+def test_interactions_are_weighted_by_kind_and_recency(catalog, session, make_user):
+    channel, courses = catalog
+    user = make_user(session, channel)
+    now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    session.add_all([
+        Enrollment(user_id=user.id, course_id=courses[0].id, enrolled=now),
+        Enrollment(user_id=user.id, course_id=courses[1].id, enrolled=now - timedelta(days=PROFILE_RECENCY_HALF_LIFE)),
+        Favourite(user_id=user.id, course_id=courses[0].id, created=now),
+    ])
+    session.commit()
+
+    course_ids, weights = load_user_interactions(session, user.id, now=now)
+    assert dict(zip(course_ids.tolist(), weights.tolist())) == pytest.approx({courses[0].id: 1.5, courses[1].id: 0.5})
+
+def test_profiles_are_cached_sparse_and_scored_per_request(catalog, session, make_user):
+    channel, courses = catalog
+    user = make_user(session, channel)
+    profiles = UserProfiles()
+    assert profiles.get_scores(session, ProfileScorer(0), user.id) is None
+
+    profiles.invalidate(user.id)
+    session.add(Enrollment(user_id=user.id, course_id=courses[0].id))
+    session.commit()
+
+    scores = profiles.get_scores(session, ProfileScorer(0), user.id)
+    # a new served model scores the cached profile without reloading it
+    new_scores = profiles.get_scores(session, ProfileScorer(10), user.id)
+    np.testing.assert_allclose(new_scores, scores + 10)
+    assert (profiles.hits, profiles.misses) == (1, 2)
+    assert set(profiles._profiles[user.id]) == {'loaded', 'course_ids', 'weights'}
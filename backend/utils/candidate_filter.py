@@ -0,0 +1,130 @@
+# Candidate filtering for course recommendations
+# The recommender ranks the whole catalog, but a user may only be shown active courses of the
+# channel they are browsing that they are not enrolled in yet
+# Instead of joining every channel course in SQL for every request, this keeps
+# - a sorted array of active course ids per channel
+# - an array of each user's enrolled course ids, most recent first
+# in memory, intersects them with the ranked list and pages through the result,
+# so only the ids of the requested page are fetched from the database
+# Entries are dropped when enrollments, course statuses or channel communities change
+# and expire after a TTL so that other workers pick up changes too
+
+import os
+import time
+import threading
+import numpy as np
+from collections import OrderedDict
+
+from models.channel_course import ChannelCourse
+from models.enrollment import Enrollment
+
+CANDIDATE_CACHE_TTL = int(os.getenv('CANDIDATE_CACHE_TTL', 300)) # seconds
+USER_ENROLLMENT_CACHE_SIZE = 50000 # users
+
+class CandidateFilter:
+    def __init__(self, ttl=CANDIDATE_CACHE_TTL, max_users=USER_ENROLLMENT_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_users = max_users
+        self._channel_courses = {}
+        self._user_enrollments = OrderedDict()
+        self._lock = threading.Lock()
+        self.channel_hits = self.channel_misses = 0
+        self.enrollment_hits = self.enrollment_misses = 0
+
+    def get_channel_course_ids(self, session, channel_id):
+        """ Sorted ids of the active courses offered in a channel """
+        with self._lock:
+            cached = self._channel_courses.get(channel_id)
+        if cached is not None and time.monotonic() - cached[0] < self.ttl:
+            self.channel_hits += 1
+            return cached[1]
+        self.channel_misses += 1
+
+        course_ids = np.fromiter(
+            (
+                course_id for course_id, in (
+                    session.query(ChannelCourse.course_id)
+                    .filter(ChannelCourse.channel_id == channel_id)
+                )
+            ),
+            dtype=np.int64
+        )
+        course_ids = np.unique(course_ids)
+
+        with self._lock:
+            self._channel_courses[channel_id] = (time.monotonic(), course_ids)
+        return course_ids
+
+    def get_user_enrolled_course_ids(self, session, user_id):
+        """ Ids of the courses a user is enrolled in, most recent first """
+        with self._lock:
+            cached = self._user_enrollments.get(user_id)
+            if cached is not None and time.monotonic() - cached[0] < self.ttl:
+                self._user_enrollments.move_to_end(user_id)
+                self.enrollment_hits += 1
+                return cached[1]
+            self.enrollment_misses += 1
+
+        course_ids = np.fromiter(
+            (
+                course_id for course_id, in (
+                    session.query(Enrollment.course_id)
+                    .filter(Enrollment.user_id == user_id)
+                    .order_by(Enrollment.enrolled.desc())
+                )
+            ),
+            dtype=np.int64
+        )
+
+        with self._lock:
+            self._user_enrollments[user_id] = (time.monotonic(), course_ids)
+            self._user_enrollments.move_to_end(user_id)
+            while len(self._user_enrollments) > self.max_users:
+                self._user_enrollments.popitem(last=False)
+        return course_ids
+
+    def invalidate_channel(self, channel_id=None):
+        """ Drop the cached courses of a channel, or of every channel """
+        with self._lock:
+            if channel_id is None:
+                self._channel_courses.clear()
+            else:
+                self._channel_courses.pop(channel_id, None)
+
+    def invalidate_user(self, user_id):
+        """ Drop the cached enrollments of a user """
+        with self._lock:
+            self._user_enrollments.pop(user_id, None)
+
+def filter_candidates(ranked_course_ids, channel_course_ids, enrolled_course_ids):
+    """ Ranked courses that are in the channel and not enrolled, in rank order without repeats """
+    ranked_course_ids = np.asarray(ranked_course_ids, dtype=np.int64)
+    allowed = np.isin(ranked_course_ids, channel_course_ids) & ~np.isin(ranked_course_ids, enrolled_course_ids)
+    candidates = ranked_course_ids[allowed]
+    if len(candidates) > 1:
+        # the ranked list may repeat a course, keep its best position
+        _, first = np.unique(candidates, return_index=True)
+        candidates = candidates[np.sort(first)]
+    return candidates
+
+def page_candidates(candidate_course_ids, channel_course_ids, enrolled_course_ids, offset, limit, seed=None):
+    """
+    Page through the channel courses a user is not enrolled in, filtered candidates first
+    Pages within the candidates are plain slices, the remaining channel courses follow
+    in a random order fixed by seed, so consecutive pages neither repeat nor skip courses
+    """
+    candidates = np.asarray(candidate_course_ids, dtype=np.int64)
+    end = offset + limit
+
+    if len(candidates) < end:
+        rest = np.setdiff1d(channel_course_ids, enrolled_course_ids, assume_unique=True)
+        rest = np.setdiff1d(rest, candidates, assume_unique=True)
+        rest = np.random.default_rng(seed).permutation(rest)
+        candidates = np.concatenate([candidates, rest[:end - len(candidates)]])
+
+    return [int(course_id) for course_id in candidates[offset:end]]
+
+_candidate_filter = CandidateFilter()
+
+def get_candidate_filter():
+    return _candidate_filter
@@ -0,0 +1,215 @@
+# Faceted course browsing
+# Each channel's browsable courses are kept in memory as a columnar facet index, newest first:
+# - one small integer code per course for difficulty, course type, price band and duration band
+# - prices and durations for range filters
+# - (course row, skill code) pairs for the multi-valued skills facet, from the course_skills postings
+# A filter is a boolean mask over the rows, and the counts of a facet are one bincount of its codes
+# under the filters of every other facet: values of one facet are alternatives (OR), facets
+# combine with AND, so selecting a value keeps the counts of its alternatives visible
+# Indexes are built from one query per channel, dropped when courses or channel communities change
+# and expire after a TTL so that other workers pick up changes too
+
+import os
+import time
+import threading
+import numpy as np
+
+from models.course import Course
+from models.channel_course import ChannelCourse
+from models.skill import Skill, normalize_skill
+from models.course_skill import CourseSkill
+from enums.difficulty import DIFFICULTY
+from enums.course import COURSE
+
+FACET_CACHE_TTL = int(os.getenv('FACET_CACHE_TTL', 300)) # seconds
+SKILL_FACET_SIZE = 30 # most frequent skills returned with their counts
+PRICE_BAND_EDGES = [0, 50, 100, 200] # upper bounds, inclusive
+PRICE_BANDS = ['free', '0-50', '50-100', '100-200', '200+']
+DURATION_BAND_EDGES = [4, 12, 26] # weeks, upper bounds, inclusive
+DURATION_BANDS = ['0-4', '4-12', '12-26', '26+']
+FACETS = ['difficulty', 'course_type', 'price', 'duration', 'skills']
+
+def _bands(values, edges):
+    """ Band codes of numeric values, -1 where the value is unknown """
+    codes = np.searchsorted(edges, values, side='left').astype(np.int16)
+    codes[np.isnan(values)] = -1
+    return codes
+
+class ChannelFacetIndex:
+    def __init__(self, rows, skill_rows=()):
+        """
+        Index (id, created, difficulty, course_type, price, duration) rows
+        and their (course id, skill id, skill name) skill rows
+        """
+        rows = sorted(rows, key=lambda row: (row[1], row[0]), reverse=True)
+        self.course_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.created = np.array([row[1].timestamp() for row in rows], dtype=np.float64)
+
+        self.labels = {
+            'difficulty': DIFFICULTY.values(),
+            'course_type': COURSE.values(),
+            'price': PRICE_BANDS,
+            'duration': DURATION_BANDS,
+        }
+        self.codes = {}
+        for facet, position in (('difficulty', 2), ('course_type', 3)):
+            label_codes = {label: code for code, label in enumerate(self.labels[facet])}
+            self.codes[facet] = np.array(
+                [label_codes.get(str(row[position]), -1) if row[position] is not None else -1 for row in rows],
+                dtype=np.int16
+            )
+
+        self.prices = np.array([np.nan if row[4] is None else float(row[4]) for row in rows], dtype=np.float64)
+        self.durations = np.array([np.nan if row[5] is None else float(row[5]) for row in rows], dtype=np.float64)
+        self.codes['price'] = _bands(self.prices, PRICE_BAND_EDGES)
+        self.codes['duration'] = _bands(self.durations, DURATION_BAND_EDGES)
+
+        row_indexes = {course_id: row_index for row_index, course_id in enumerate(self.course_ids.tolist())}
+        skill_codes, skill_names = {}, []
+        course_skill_rows, course_skill_codes = [], []
+        for course_id, skill_id, name in skill_rows:
+            if course_id in row_indexes:
+                if skill_id not in skill_codes:
+                    skill_codes[skill_id] = len(skill_names)
+                    skill_names.append(name)
+                course_skill_rows.append(row_indexes[course_id])
+                course_skill_codes.append(skill_codes[skill_id])
+        self.labels['skills'] = skill_names
+        self.skill_codes = {normalize_skill(name): code for code, name in enumerate(skill_names)}
+        self.skill_rows = np.array(course_skill_rows, dtype=np.int64)
+        self.skill_row_codes = np.array(course_skill_codes, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.course_ids)
+
+    def _facet_mask(self, facet, filters):
+        """ Rows passing the filter of one facet, None if it is not filtered """
+        selected = filters.get(facet)
+        mask = None
+
+        if facet == 'skills':
+            if selected:
+                selected_codes = (self.skill_codes.get(normalize_skill(skill)) for skill in selected)
+                codes = [code for code in selected_codes if code is not None]
+                mask = np.zeros(len(self), dtype=bool)
+                mask[self.skill_rows[np.isin(self.skill_row_codes, codes)]] = True
+            return mask
+
+        if selected:
+            label_codes = [self.labels[facet].index(label) for label in selected]
+            mask = np.isin(self.codes[facet], label_codes)
+
+        # ranges narrow the same dimension as their bands
+        if facet in ('price', 'duration'):
+            values = self.prices if facet == 'price' else self.durations
+            minimum, maximum = filters.get(f'min_{facet}'), filters.get(f'max_{facet}')
+            if minimum is not None:
+                mask = (values >= minimum) if mask is None else mask & (values >= minimum)
+            if maximum is not None:
+                mask = (values <= maximum) if mask is None else mask & (values <= maximum)
+        return mask
+
+    def _count(self, facet, mask):
+        """ [{value, count}] of a facet over the rows in mask """
+        if facet == 'skills':
+            counts = np.bincount(self.skill_row_codes[mask[self.skill_rows]], minlength=len(self.labels['skills']))
+            top = np.argsort(-counts, kind='stable')[:SKILL_FACET_SIZE]
+            return [{'value': self.labels['skills'][code], 'count': int(counts[code])} for code in top if counts[code] > 0]
+
+        codes = self.codes[facet][mask]
+        counts = np.bincount(codes[codes >= 0], minlength=len(self.labels[facet]))
+        return [{'value': label, 'count': int(count)} for label, count in zip(self.labels[facet], counts)]
+
+    def browse(self, filters, limit, offset=0, after=None):
+        """
+        Filter the channel's courses
+        Returns (course ids of the page, total matches, facet counts, next position)
+        after continues after a (created, id) position instead of skipping offset courses,
+        next position is the (created, id) of the page's last course, None on the last page
+        """
+        facet_masks = {facet: self._facet_mask(facet, filters) for facet in FACETS}
+        everything = np.ones(len(self), dtype=bool)
+
+        facets = {}
+        for facet in FACETS:
+            mask = everything.copy()
+            for other, other_mask in facet_masks.items():
+                if other != facet and other_mask is not None:
+                    mask &= other_mask
+            facets[facet] = self._count(facet, mask)
+
+        matched = everything
+        for mask in facet_masks.values():
+            if mask is not None:
+                matched = matched & mask
+        total = int(matched.sum())
+
+        rows = np.flatnonzero(matched)
+        if after is not None:
+            created, course_id = after
+            # rows are sorted newest first, so the continuation is a suffix of the matches
+            rows = rows[(self.created[rows] < created) | ((self.created[rows] == created) & (self.course_ids[rows] < course_id))]
+        else:
+            rows = rows[offset:]
+
+        following = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            following = (float(self.created[rows[-1]]), int(self.course_ids[rows[-1]]))
+        return self.course_ids[rows].tolist(), total, facets, following
+
+class CourseFacets:
+    def __init__(self, ttl=FACET_CACHE_TTL):
+        self.ttl = ttl
+        self._channels = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_channel_index(self, session, channel_id):
+        """ Facet index of the active courses offered in a channel """
+        with self._lock:
+            cached = self._channels.get(channel_id)
+        if cached is not None and time.monotonic() - cached[0] < self.ttl:
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+
+        index = ChannelFacetIndex(
+            session.query(
+                Course.id,
+                Course.created,
+                Course.difficulty,
+                Course.course_type,
+                Course.price,
+                Course.duration
+            )
+            .join(ChannelCourse)
+            .filter(
+                ChannelCourse.channel_id == channel_id,
+                Course.instructors.any()
+            )
+            .all(),
+            session.query(CourseSkill.course_id, Skill.id, Skill.name)
+            .join(Skill)
+            .join(ChannelCourse, ChannelCourse.course_id == CourseSkill.course_id)
+            .filter(ChannelCourse.channel_id == channel_id)
+            .all()
+        )
+
+        with self._lock:
+            self._channels[channel_id] = (time.monotonic(), index)
+        return index
+
+    def invalidate_channel(self, channel_id=None):
+        """ Drop the facet index of a channel, or of every channel """
+        with self._lock:
+            if channel_id is None:
+                self._channels.clear()
+            else:
+                self._channels.pop(channel_id, None)
+
+_course_facets = CourseFacets()
+
+def get_course_facets():
+    return _course_facets
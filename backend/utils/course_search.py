@@ -0,0 +1,157 @@
+# Course keyword search
+# On PostgreSQL courses are matched against their maintained search documents
+# (see models/course_search_document.py), with GIN indexes serving all three predicates:
+# - full-text: websearch syntax query against the weighted tsvector, ranked with ts_rank_cd
+# - fuzzy: pg_trgm word similarity of the term against the keywords, tolerates typos
+# - substring: the term inside the keywords, what the former ILIKE search matched
+# Results are ordered by text rank plus word similarity, newest first among equals
+# Other databases (tests) search an in-process index built from the same fields,
+# with skills read from the course_skills posting lists, rebuilt lazily after the flush listener invalidates it
+
+import re
+from collections import defaultdict
+from sqlalchemy import func, or_
+
+from models.course import Course
+from models.community import Community
+from models.instructor import Instructor
+from models.offer import Offer
+from models.skill import Skill
+from models.course_skill import CourseSkill
+from models.course_search_document import CourseSearchDocument, SEARCH_CONFIGURATION
+
+FIELD_WEIGHTS = {'name': 1.0, 'keywords': 0.4, 'description': 0.2} # ts_rank_cd weights of labels A, B and C
+TRIGRAM_SIMILARITY_THRESHOLD = 0.5 # in-process index, minimum trigram similarity of a misspelled token
+
+_TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+def tokenize(text):
+    return _TOKEN_PATTERN.findall(text.lower()) if text else []
+
+def trigrams(token):
+    """ Trigrams of a token padded like pg_trgm """
+    padded = f'  {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class CourseSearchIndex:
+    def __init__(self):
+        """ In-process stand-in for the PostgreSQL search documents """
+        # (token -> {course id: field weight}, course id -> lowercased keywords, trigram -> tokens),
+        # replaced as a whole so searches never see a partially built index
+        self._index = None
+
+    def invalidate(self):
+        """ Drop the index, the next search rebuilds it """
+        self._index = None
+
+    def build(self, session):
+        """ Index every course with the fields of the search documents """
+        instructor_names = defaultdict(list)
+        for course_id, name in session.query(Offer.course_id, Instructor.name).join(Instructor):
+            instructor_names[course_id].append(name)
+
+        skill_names = dict(session.query(Skill.id, Skill.name))
+        course_skills = defaultdict(list)
+        for skill_id, course_ids in CourseSkill.get_postings(session).items():
+            for course_id in course_ids:
+                course_skills[course_id].append(skill_names[skill_id])
+
+        postings = defaultdict(dict)
+        keywords = {}
+        courses = (
+            session.query(Course.id, Course.name, Course.description, Community.name)
+            .outerjoin(Community, Community.id == Course.community_id)
+        )
+        for course_id, name, description, community_name in courses:
+            keyword_text = ' '.join(filter(None, [name, *course_skills[course_id], community_name, *instructor_names[course_id]]))
+            keywords[course_id] = keyword_text.lower()
+            for field, field_text in (('description', description), ('keywords', keyword_text), ('name', name)):
+                for token in tokenize(field_text):
+                    postings[token][course_id] = max(postings[token].get(course_id, 0), FIELD_WEIGHTS[field])
+
+        token_trigrams = defaultdict(set)
+        for token in postings:
+            for trigram in trigrams(token):
+                token_trigrams[trigram].add(token)
+
+        self._index = (postings, keywords, token_trigrams)
+        return self._index
+
+    @staticmethod
+    def _expand(token, postings, token_trigrams):
+        """ Indexed tokens matching a query token with their similarity, typos included """
+        if token in postings:
+            return {token: 1.0}
+
+        query_trigrams = trigrams(token)
+        shared = defaultdict(int)
+        for trigram in query_trigrams:
+            for candidate in token_trigrams.get(trigram, ()):
+                shared[candidate] += 1
+
+        matches = {}
+        for candidate, count in shared.items():
+            similarity = count / (len(query_trigrams) + len(trigrams(candidate)) - count)
+            if similarity >= TRIGRAM_SIMILARITY_THRESHOLD:
+                matches[candidate] = similarity
+        return matches
+
+    def search(self, session, search_term, course_ids):
+        """ Matching course ids among course_ids, best first, ties kept in course_ids order """
+        postings, keywords, token_trigrams = self._index or self.build(session)
+
+        scores = defaultdict(float)
+        for token in tokenize(search_term):
+            token_scores = defaultdict(float)
+            for match, similarity in self._expand(token, postings, token_trigrams).items():
+                for course_id, weight in postings[match].items():
+                    token_scores[course_id] = max(token_scores[course_id], similarity * weight)
+            for course_id, score in token_scores.items():
+                scores[course_id] += score
+
+        # substring matches, like the former ILIKE search
+        term = search_term.lower()
+        for course_id in course_ids:
+            if term in keywords.get(course_id, ''):
+                scores[course_id] += 1.0
+
+        order = {course_id: position for position, course_id in enumerate(course_ids)}
+        matched_course_ids = [course_id for course_id in course_ids if scores.get(course_id, 0) > 0]
+        return sorted(matched_course_ids, key=lambda course_id: (-scores[course_id], order[course_id]))
+
+_course_search_index = CourseSearchIndex()
+
+def get_course_search_index():
+    return _course_search_index
+
+def search_courses(session, courses, search_term, offset, limit):
+    """
+    Page of the courses of a Course query that match search_term, best matches first
+    The query should not fan out, ranking happens per course row
+    """
+    if session.get_bind().dialect.name != 'postgresql':
+        course_ids = [course_id for course_id, in courses.with_entities(Course.id).order_by(Course.created.desc())]
+        page_course_ids = get_course_search_index().search(session, search_term, course_ids)[offset:offset + limit]
+        page_courses = {course.id: course for course in courses.filter(Course.id.in_(page_course_ids))}
+        return [page_courses[course_id] for course_id in page_course_ids]
+
+    query = func.websearch_to_tsquery(SEARCH_CONFIGURATION, search_term)
+    term = search_term.lower()
+    rank = (
+        func.ts_rank_cd(CourseSearchDocument.search_vector, query)
+        + func.word_similarity(term, CourseSearchDocument.keywords)
+    )
+
+    return (
+        courses
+        .join(CourseSearchDocument, CourseSearchDocument.course_id == Course.id)
+        .filter(or_(
+            CourseSearchDocument.search_vector.op('@@')(query),
+            CourseSearchDocument.keywords.op('%>')(term),
+            CourseSearchDocument.keywords.contains(term, autoescape=True),
+        ))
+        .order_by(rank.desc(), Course.created.desc())
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
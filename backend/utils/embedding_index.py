@@ -0,0 +1,153 @@
+# In-memory vector index for semantic course search
+# Small catalogs are searched exactly with one float32 matrix-vector product
+# Catalogs above APPROXIMATE_SEARCH_THRESHOLD use a FAISS HNSW graph when faiss is installed,
+# and its candidates are re-scored exactly so results stay consistent with the exact path
+# Vectors are inner-product comparable (the recommender stores L2-normalized, weighted field groups)
+
+import os
+import numpy as np
+
+from utils.neighbor_index import top_k_rows
+
+try:
+    import faiss
+except ImportError: # optional, exact search is used without it
+    faiss = None
+
+APPROXIMATE_SEARCH_THRESHOLD = int(os.getenv('APPROXIMATE_SEARCH_THRESHOLD', 50000)) # rows
+HNSW_NEIGHBORS = 32
+HNSW_EF_SEARCH = 128
+CANDIDATE_OVERSAMPLING = 4 # approximate candidates fetched per requested result
+
+class EmbeddingIndex:
+    def __init__(self, row_ids, vectors, approximate_threshold=APPROXIMATE_SEARCH_THRESHOLD, ann_index=None):
+        """ Initialize the index over row ids and their vectors, in the same order """
+        self.row_ids = np.asarray(row_ids)
+        self.vectors = vectors
+        self.id_to_row = {
+            (row_id.item() if isinstance(row_id, np.generic) else row_id): row
+            for row, row_id in enumerate(self.row_ids)
+        }
+
+        self.ann_index = ann_index
+        if self.ann_index is None and faiss is not None and len(self.row_ids) >= approximate_threshold:
+            self.ann_index = self._build_ann_index(vectors)
+
+    def __len__(self):
+        return len(self.row_ids)
+
+    @property
+    def is_approximate(self):
+        return self.ann_index is not None
+
+    @staticmethod
+    def _build_ann_index(vectors):
+        """ Build an inner-product HNSW graph over the vectors """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        ann_index = faiss.IndexHNSWFlat(vectors.shape[1], HNSW_NEIGHBORS, faiss.METRIC_INNER_PRODUCT)
+        ann_index.hnsw.efSearch = HNSW_EF_SEARCH
+        ann_index.add(vectors)
+        return ann_index
+
+    def search(self, query_vector, top_k=10, candidate_ids=None, min_score=None):
+        """
+        Get (row_ids, scores) of the rows closest to the query vector
+        candidate_ids restricts results to a subset of rows, e.g. the courses in a channel
+        """
+        query_vector = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+
+        candidate_rows = None
+        if candidate_ids is not None:
+            candidate_rows = np.fromiter(
+                (self.id_to_row[row_id] for row_id in candidate_ids if row_id in self.id_to_row),
+                dtype=np.int64
+            )
+
+        rows = None
+        if self.ann_index is not None:
+            rows = self._search_approximate(query_vector, top_k, candidate_rows)
+        if rows is None and candidate_rows is not None:
+            rows = candidate_rows
+
+        if rows is None:
+            # exact: score the whole catalog in one product
+            rows = np.arange(len(self.row_ids))
+            scores = np.asarray(self.vectors @ query_vector, dtype=np.float32)
+        else:
+            scores = np.asarray(self.vectors[rows] @ query_vector, dtype=np.float32)
+
+        if not len(rows):
+            return self.row_ids[:0], np.empty(0, dtype=np.float32)
+
+        top_positions, top_scores = top_k_rows(scores[np.newaxis], top_k)
+        top_rows = rows[top_positions[0]]
+        top_scores = top_scores[0]
+
+        if min_score is not None:
+            keep = top_scores >= min_score
+            top_rows, top_scores = top_rows[keep], top_scores[keep]
+
+        return self.row_ids[top_rows], top_scores
+
+    def _search_approximate(self, query_vector, top_k, candidate_rows):
+        """
+        Candidate rows from the HNSW graph, None when the graph cannot supply enough of them
+        (small candidate sets are cheaper to score exactly)
+        """
+        if candidate_rows is not None and len(candidate_rows) < APPROXIMATE_SEARCH_THRESHOLD:
+            return None
+
+        n_candidates = top_k * CANDIDATE_OVERSAMPLING
+        if candidate_rows is not None:
+            # widen the search by how selective the filter is
+            n_candidates = int(n_candidates * len(self.row_ids) / max(len(candidate_rows), 1))
+        n_candidates = min(n_candidates, len(self.row_ids))
+
+        _, found = self.ann_index.search(query_vector[np.newaxis], n_candidates)
+        found = found[0]
+        # faiss pads missing results with -1
+        found = found[(found >= 0) & (found < len(self.row_ids))]
+        if candidate_rows is not None:
+            found = found[np.isin(found, candidate_rows)]
+
+        if len(found) < min(top_k, len(self.row_ids) if candidate_rows is None else len(candidate_rows)):
+            return None
+        return found
+
+    def with_row(self, row_id, vector, vectors=None):
+        """ Return a new index with one row added or refreshed, see with_rows """
+        return self.with_rows([row_id], np.asarray(vector).reshape(1, -1), vectors=vectors)
+
+    def with_rows(self, row_ids, rows_vectors, vectors=None):
+        """
+        Return a new index with rows added or refreshed
+        vectors, if given, is the already updated full vector matrix, new rows at the end in the order given
+        The approximate graph only gains new rows, an edited row keeps its old graph position
+        until the next rebuild but is always re-scored with its new vector
+        New rows are added to one copy of the graph per batch, requests may still be searching this one
+        """
+        rows_vectors = np.asarray(rows_vectors, dtype=np.float32).reshape(len(row_ids), -1)
+        new_rows = {}
+        for position, row_id in enumerate(row_ids):
+            if row_id not in self.id_to_row:
+                # a row id repeated in the batch keeps its last vector
+                new_rows[row_id] = position
+        new_rows_vectors = rows_vectors[list(new_rows.values())]
+
+        if vectors is None:
+            vectors = np.array(self.vectors)
+            for row_id, row_vector in zip(row_ids, rows_vectors):
+                if row_id in self.id_to_row:
+                    vectors[self.id_to_row[row_id]] = row_vector
+            if new_rows:
+                vectors = np.vstack([vectors, new_rows_vectors])
+
+        row_ids = self.row_ids
+        ann_index = self.ann_index
+        if new_rows:
+            row_ids = np.append(row_ids, list(new_rows))
+            if ann_index is not None:
+                ann_index = faiss.clone_index(ann_index)
+                ann_index.add(np.ascontiguousarray(new_rows_vectors))
+
+        return EmbeddingIndex(row_ids, vectors, ann_index=ann_index, approximate_threshold=np.inf)
@@ -10,27 +10,99 @@
 # 3. Tokenize phrases
 # 4. Use of word embeddings
 
+import os
 import re
 import nltk
+import joblib
+import hashlib
+import threading
+import multiprocessing
+import numpy as np
 import pandas as pd
-from collections import defaultdict
-from gensim.models import Word2Vec
+from functools import lru_cache
+from itertools import repeat
+from collections import defaultdict, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from scipy.sparse import csr_matrix
+from gensim.models import Word2Vec, KeyedVectors
 from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize
 from nltk.stem import WordNetLemmatizer
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 
+LEMMA_CACHE_SIZE = 200000 # distinct tokens, the vocabulary is far smaller than the token count
+TEXT_CACHE_SIZE = int(os.getenv('TEXT_PREPROCESSING_CACHE_SIZE', 500000)) # distinct (field, text) pairs
+TEXT_PREPROCESSING_WORKERS = int(os.getenv('TEXT_PREPROCESSING_WORKERS', 0)) # 0 uses every core
+PARALLEL_MIN_TEXTS = 2000 # below this a process pool costs more than it saves
+PARALLEL_CHUNK_SIZE = 1000
+
+NLTK_DATA_PATH = os.getenv('NLTK_DATA_PATH', './data/nltk_data') # bundled corpora, searched before NLTK's default locations
+NLTK_RESOURCES = {
+    'punkt_tab': 'tokenizers/punkt_tab/english/', # word_tokenize
+    'stopwords': 'corpora/stopwords',
+    'wordnet': 'corpora/wordnet', # WordNetLemmatizer
+}
+
+_SPECIAL_CHARACTERS = re.compile(r'[^a-zA-Z0-9\s]')
+_nltk_data_ready = False
+
+# preprocessed text shared by every FieldProcessor in the process, so a retrain
+# only preprocesses courses whose text changed since the previous one
+# Training processes start empty and seed it from the previous artifacts, see save_text_cache
+_text_cache = OrderedDict()
+_text_cache_lock = threading.Lock()
+
+# per worker process processor for pooled preprocessing
+_worker_processor = None
+
+def _init_preprocessing_worker():
+    """ Resolve the NLTK corpora and build the processor once per pool worker, before any chunk """
+    global _worker_processor
+    ensure_nltk_data()
+    _worker_processor = FieldProcessor()
+
+def _preprocess_chunk(kind, texts):
+    """ Preprocess a chunk of texts inside a pool worker """
+    preprocess = _worker_processor.get_text_preprocessor(kind)
+    return [preprocess(text) for text in texts]
+
+def ensure_nltk_data(path=NLTK_DATA_PATH):
+    """ 
+    Resolve the NLTK corpora from the bundled data path, never from the network
+    Checked once per process; spawned pool workers inherit nothing and check in their initializer
+    """
+    global _nltk_data_ready
+    if _nltk_data_ready:
+        return
+
+    if path not in nltk.data.path:
+        nltk.data.path.insert(0, path)
+
+    missing = []
+    for name, resource in NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            missing.append(name)
+    if missing:
+        raise LookupError(
+            f"Missing NLTK data: {', '.join(missing)}. "
+            f"Bundle it with: python -m nltk.downloader -d {path} {' '.join(missing)}"
+        )
+
+    _nltk_data_ready = True
+
 class FieldProcessor:
     def __init__(self):
-        # Download required NLTK data
-        nltk.download('punkt')
-        nltk.download('punkt_tab')
-        nltk.download('averaged_perceptron_tagger')
-        nltk.download('wordnet')
+        # NLTK data is bundled with the deployment, see NLTK_DATA_PATH
+        ensure_nltk_data()
 
         # Initialize lemmatizer
         self.lemmatizer = WordNetLemmatizer()
         self.stop_words = set(stopwords.words('english'))
+        # the same few thousand words make up every course, lemmatize each once
+        self.lemmatize = lru_cache(maxsize=LEMMA_CACHE_SIZE)(self.lemmatizer.lemmatize)
+        self.preprocessing_workers = TEXT_PREPROCESSING_WORKERS or os.cpu_count() or 1
 
         # embedding models
         self.vector_size = 100
@@ -45,13 +117,20 @@ class FieldProcessor:
         self.numerical_scaler = None
         self.categorical_encoder = None
     
-    def scale_numerical_fields(self, df, columns):
-        """ Scale numerical fields using StandardScaler """
-        # create scaler
-        scaler = StandardScaler()
+    def scale_numerical_fields(self, df, columns, fit=True):
+        """ 
+        Scale numerical fields using StandardScaler
+        With fit=False the stored scaler is reused, e.g. for a single new course
+        """
+        if fit:
+            # create scaler
+            scaler = StandardScaler()
 
-        # fit and transform data
-        scaled_data = scaler.fit_transform(df[columns])
+            # fit and transform data
+            scaled_data = scaler.fit_transform(df[columns])
+        else:
+            scaler = self.numerical_scaler
+            scaled_data = scaler.transform(df[columns])
         
         # create new dataframe with scaled data
         scaled_df = df.copy()
@@ -62,13 +141,21 @@ class FieldProcessor:
 
         return scaled_df
     
-    def encode_categorical_fields(self, df, columns):
-        """ Encode categorical fields using OneHotEncoder """
-        # create one-hot encoder
-        encoder = OneHotEncoder(handle_unknown='ignore')
+    def encode_categorical_fields(self, df, columns, fit=True):
+        """ 
+        Encode categorical fields using OneHotEncoder
+        With fit=False the stored encoder is reused, unseen categories encode to zeros
+        The one-hot columns stay sparse, get_categorical_matrix reads them back without densifying
+        """
+        if fit:
+            # create one-hot encoder
+            encoder = OneHotEncoder(handle_unknown='ignore')
 
-        # fit and transform data
-        encoded_data = encoder.fit_transform(df[columns])
+            # fit and transform data
+            encoded_data = encoder.fit_transform(df[columns])
+        else:
+            encoder = self.categorical_encoder
+            encoded_data = encoder.transform(df[columns])
 
         # get feature names
         feature_names = encoder.get_feature_names_out(columns)
@@ -80,8 +167,9 @@ class FieldProcessor:
         # add one-hot encoded columns
         encoded_df = pd.concat([
             encoded_df,
-            pd.DataFrame(
-                encoded_data.toarray(),
+            pd.DataFrame.sparse.from_spmatrix(
+                encoded_data,
+                index=encoded_df.index,
                 columns=feature_names
             )
         ], axis=1)
@@ -91,6 +179,13 @@ class FieldProcessor:
 
         return encoded_df
     
+    @staticmethod
+    def get_categorical_matrix(df, columns):
+        """ Encoded categorical columns of a DataFrame as a float32 CSR matrix """
+        if not columns:
+            return csr_matrix((len(df), 0), dtype=np.float32)
+        return csr_matrix(df[columns].sparse.to_coo(), dtype=np.float32)
+
     def preprocess_name(self, name):
         """ 
         Preprocess course names
@@ -98,14 +193,14 @@ class FieldProcessor:
         - Keep technical terms
         """
         # lowercase and remove special characters
-        name = re.sub(r'[^a-zA-Z0-9\s]', '', name.lower())
+        name = _SPECIAL_CHARACTERS.sub('', name.lower())
 
         # tokenize
         tokens = word_tokenize(name)
 
         # lemmatize but keep technical terms
         lemmatized_tokens = [
-            self.lemmatizer.lemmatize(token)
+            self.lemmatize(token)
             for token in tokens
             if len(token) > 1 # remove very short tokens
         ]
@@ -120,7 +215,7 @@ class FieldProcessor:
         - Tokenize
         """
         # lowercase and remove special characters
-        description = re.sub(r'[^a-zA-Z0-9\s]', '', description.lower())
+        description = _SPECIAL_CHARACTERS.sub('', description.lower())
 
         # tokenize
         tokens = word_tokenize(description)
@@ -132,7 +227,7 @@ class FieldProcessor:
                 token not in self.stop_words and
                 token.isalpha()
             ):
-                lemmatized_tokens.append(self.lemmatizer.lemmatize(token))
+                lemmatized_tokens.append(self.lemmatize(token))
 
         return ' '.join(lemmatized_tokens)
 
@@ -152,7 +247,7 @@ class FieldProcessor:
             tokens = word_tokenize(skill)
 
             # lemmatize each token
-            lemmatized_skill = [self.lemmatizer.lemmatize(token) for token in tokens]
+            lemmatized_skill = [self.lemmatize(token) for token in tokens]
 
             # rejoin multi-word skills
             processed_skill = ' '.join(lemmatized_skill)
@@ -162,19 +257,97 @@ class FieldProcessor:
 
         return processed_skills
     
-    def preprocess_text_fields(self, df, columns):
+    def get_text_preprocessor(self, kind):
+        """ Get the preprocessing function for a text kind (name, description or skills) """
+        return {
+            'name': self.preprocess_name,
+            'description': self.preprocess_description,
+            'skills': self.preprocess_skills,
+        }[kind]
+
+    @staticmethod
+    def _get_text_kind(column):
+        """ Pick the preprocessing kind from the column name """
+        for kind in ('name', 'description', 'skills'):
+            if kind in column.lower():
+                return kind
+        return 'description' # default to description preprocessing
+
+    @staticmethod
+    def _text_key(kind, text):
+        return hashlib.blake2b(f"{kind}\0{text}".encode('utf-8'), digest_size=16).digest()
+
+    def preprocess_texts(self, texts, kind, workers=None):
+        """
+        Preprocess a sequence of texts of one kind
+        - Texts seen before (by content hash) come from the cache
+        - Each distinct new text is preprocessed once
+        - Large batches are split into chunks over a process pool
+        """
+        workers = self.preprocessing_workers if workers is None else workers
+        keys = [self._text_key(kind, text) if isinstance(text, str) else None for text in texts]
+
+        results = {}
+        pending = {}
+        with _text_cache_lock:
+            for key, text in zip(keys, texts):
+                if key is None or key in results or key in pending:
+                    continue
+                cached = _text_cache.get(key)
+                if cached is not None:
+                    _text_cache.move_to_end(key)
+                    results[key] = cached
+                else:
+                    pending[key] = text
+
+        if pending:
+            pending_keys = list(pending)
+            pending_texts = list(pending.values())
+
+            if workers > 1 and len(pending_texts) >= PARALLEL_MIN_TEXTS:
+                chunks = [
+                    pending_texts[start:start + PARALLEL_CHUNK_SIZE]
+                    for start in range(0, len(pending_texts), PARALLEL_CHUNK_SIZE)
+                ]
+                # spawn so workers never inherit locks held by the web server threads
+                with ProcessPoolExecutor(
+                    max_workers=min(workers, len(chunks)),
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_preprocessing_worker
+                ) as executor:
+                    processed = [
+                        text
+                        for chunk in executor.map(_preprocess_chunk, repeat(kind), chunks)
+                        for text in chunk
+                    ]
+            else:
+                preprocess = self.get_text_preprocessor(kind)
+                processed = [preprocess(text) for text in pending_texts]
+
+            results.update(zip(pending_keys, processed))
+            with _text_cache_lock:
+                for key, value in zip(pending_keys, processed):
+                    _text_cache[key] = value
+                while len(_text_cache) > TEXT_CACHE_SIZE:
+                    _text_cache.popitem(last=False)
+
+        # non-string values go through the preprocessor as before
+        preprocess = self.get_text_preprocessor(kind)
+        return [
+            results[key] if key is not None else preprocess(text)
+            for key, text in zip(keys, texts)
+        ]
+
+    def preprocess_text_fields(self, df, columns, workers=None):
         """ Preprocess text fields """
         preprocessed_df = df.copy()
 
         for column in columns:
-            if 'name' in column.lower():
-                preprocessed_df[column] = preprocessed_df[column].apply(self.preprocess_name)
-            elif 'description' in column.lower():
-                preprocessed_df[column] = preprocessed_df[column].apply(self.preprocess_description)
-            elif 'skills' in column.lower():
-                preprocessed_df[column] = preprocessed_df[column].apply(self.preprocess_skills)
-            else: # default to description preprocessing
-                preprocessed_df[column] = preprocessed_df[column].apply(self.preprocess_description)
+            preprocessed_df[column] = pd.Series(
+                self.preprocess_texts(preprocessed_df[column].tolist(), self._get_text_kind(column), workers=workers),
+                index=preprocessed_df.index,
+                dtype=object
+            )
 
         return preprocessed_df
 
@@ -183,16 +356,20 @@ class FieldProcessor:
         df,
         numerical_columns=None,
         categorical_columns=None,
-        text_columns=None
+        text_columns=None,
+        fit=True
     ):
-        """ Create a preprocessing pipeline for all fields """
+        """ 
+        Create a preprocessing pipeline for all fields
+        Use fit=False to transform new rows with the already fitted scaler and encoder
+        """
         # scale numerical fields
         if numerical_columns:
-            df = self.scale_numerical_fields(df, numerical_columns)
+            df = self.scale_numerical_fields(df, numerical_columns, fit=fit)
 
         # encode categorical fields
         if categorical_columns:
-            df = self.encode_categorical_fields(df, categorical_columns)
+            df = self.encode_categorical_fields(df, categorical_columns, fit=fit)
         
         # preprocess text fields
         if text_columns:
@@ -288,4 +465,69 @@ class FieldProcessor:
             return embeddings.most_similar(word, topn=top_n)
         except KeyError:
             return []
-    
\ No newline at end of file
+
+    def save_state(self, directory):
+        """ 
+        Save fitted scaler, encoder and word embeddings to a directory
+        Word embeddings are saved in gensim's native format so they can be memory-mapped on load
+        """
+        joblib.dump({
+            'vector_size': self.vector_size,
+            'window': self.window,
+            'min_count': self.min_count,
+            'numerical_scaler': self.numerical_scaler,
+            'categorical_encoder': self.categorical_encoder,
+        }, os.path.join(directory, 'field_processor.joblib'))
+
+        # sparse text features train no word embeddings
+        if self.name_embeddings is not None:
+            self.name_embeddings.save(os.path.join(directory, 'name_embeddings.kv'))
+            self.description_embeddings.save(os.path.join(directory, 'description_embeddings.kv'))
+            self.skill_embeddings.save(os.path.join(directory, 'skill_embeddings.kv'))
+
+    def save_text_cache(self, directory, df, columns):
+        """ 
+        Save the preprocessed texts of the given columns by content hash to a directory,
+        so that the next training process only preprocesses texts that changed
+        """
+        entries = {}
+        with _text_cache_lock:
+            for column in columns:
+                kind = self._get_text_kind(column)
+                for text in df[column]:
+                    if not isinstance(text, str):
+                        continue
+                    key = self._text_key(kind, text)
+                    if key in _text_cache:
+                        entries[key] = _text_cache[key]
+        joblib.dump(entries, os.path.join(directory, 'text_cache.joblib'))
+
+    @staticmethod
+    def load_text_cache(directory):
+        """ Seed the preprocessed text cache from a directory written by save_text_cache, returns the number of texts """
+        path = os.path.join(directory, 'text_cache.joblib')
+        if not os.path.exists(path):
+            return 0
+
+        entries = joblib.load(path)
+        with _text_cache_lock:
+            for key, value in entries.items():
+                # texts preprocessed in this process are as current
+                _text_cache.setdefault(key, value)
+            while len(_text_cache) > TEXT_CACHE_SIZE:
+                _text_cache.popitem(last=False)
+        return len(entries)
+
+    def load_state(self, directory, mmap='r'):
+        """ Load scaler, encoder and word embeddings saved by save_state """
+        state = joblib.load(os.path.join(directory, 'field_processor.joblib'))
+        self.vector_size = state['vector_size']
+        self.window = state['window']
+        self.min_count = state['min_count']
+        self.numerical_scaler = state['numerical_scaler']
+        self.categorical_encoder = state['categorical_encoder']
+
+        if os.path.exists(os.path.join(directory, 'name_embeddings.kv')):
+            self.name_embeddings = KeyedVectors.load(os.path.join(directory, 'name_embeddings.kv'), mmap=mmap)
+            self.description_embeddings = KeyedVectors.load(os.path.join(directory, 'description_embeddings.kv'), mmap=mmap)
+            self.skill_embeddings = KeyedVectors.load(os.path.join(directory, 'skill_embeddings.kv'), mmap=mmap)
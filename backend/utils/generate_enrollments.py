@@ -1,98 +1,174 @@
-import csv
-import random
+# Synthetic user-course interactions for training without user data and for load testing
+# Users follow skill-correlated random walks over the catalog:
+# - the first course is drawn from a Zipf-like popularity distribution
+# - with probability monte the next course shares a random skill with the previous one,
+#   otherwise it is another popularity draw
+# Course <-> skill relations are two sparse matrices, every step is vectorized over all users
+# and the whole run is reproducible from its seed
+# Interactions are saved as compressed int32 arrays (.npz) that training and benchmarks load directly
+# Courses come from the database, or from a CSV with course_id and skills columns
+
+import ast
+import argparse
+import numpy as np
 import pandas as pd
-from collections import defaultdict
+from scipy.sparse import csr_matrix
 
-def _load_preprocessed_course_data() -> pd.DataFrame:
-    """
-    Load preprocessed course data
-    Extract only the course_id and skills
-    """
-    with open("data/preprocessed_courses.csv", "r", newline="", encoding="utf-8") as file:
-        courses = []
-        
-        reader = csv.DictReader(file)
-        for row in reader:
-            course_id = row['course_id']
-            skills = row['skills']
-            courses.append({
-                'course_id': course_id,
-                'skills': skills
-            })
-
-    return pd.DataFrame(courses)
-
-def _map_course_relationships(course_data) -> dict:
-    """ Map course relationships """
-    course_relationships = defaultdict(set)
-    skill_to_courses = defaultdict(set)
-
-    # create course to skill mapping
-    for _, course in course_data.iterrows():
-        for skills in course['skills']:
-            skill_to_courses[skills].add(course['course_id'])
-    
-    # create course relationships based on shared skills
-    for skill, courses in skill_to_courses.items():
-        for course1 in courses:
-            for course2 in courses:
-                if course1 != course2:
-                    course_relationships[course1].add(course2)
-
-    return course_relationships
+GENERATED_ENROLLMENTS_PATH = "data/generated_enrollments.npz"
+
+def _split_skills(skills):
+    """ Skills as a list, from a list, a list literal or a comma-separated string """
+    if isinstance(skills, (list, tuple, np.ndarray)):
+        return [str(skill).strip().lower() for skill in skills if str(skill).strip()]
+    if not isinstance(skills, str):
+        return []
+    if skills.startswith('['):
+        return _split_skills(ast.literal_eval(skills))
+    return [skill.strip().lower() for skill in skills.split(',') if skill.strip()]
+
+def load_course_skills(session) -> pd.DataFrame:
+    """ Load the course_id and skills of every course from the database """
+    from sqlalchemy.orm import selectinload
+    from models.course import Course
+
+    courses = session.query(Course).options(selectinload(Course.skill_tags)).order_by(Course.id).all()
+    return pd.DataFrame({
+        'course_id': [course.id for course in courses],
+        'skills': [[skill.name for skill in course.skill_tags] for course in courses],
+    }, columns=['course_id', 'skills'])
+
+def load_course_skills_csv(path) -> pd.DataFrame:
+    """ Load the course_id and skills columns of a course CSV """
+    return pd.read_csv(path, usecols=['course_id', 'skills'])
+
+def _build_skill_matrix(course_data):
+    """ Sparse course x skill incidence matrix, rows in course_data order """
+    skills = course_data['skills'].map(_split_skills)
+    lengths = skills.map(len).to_numpy()
+    skill_codes, _ = pd.factorize(pd.Series([skill for course_skills in skills for skill in course_skills], dtype=object))
+
+    course_skills = csr_matrix(
+        (np.ones(len(skill_codes), dtype=np.int8), (np.repeat(np.arange(len(course_data)), lengths), skill_codes)),
+        shape=(len(course_data), skill_codes.max() + 1 if len(skill_codes) else 0)
+    )
+    course_skills.sum_duplicates()
+    return course_skills
+
+def _sample_rows(matrix, rows, rng):
+    """ Pick one random column per row of a CSR matrix, -1 for empty rows """
+    starts = matrix.indptr[rows]
+    degrees = matrix.indptr[rows + 1] - starts
+    offsets = np.floor(rng.random(len(rows)) * degrees).astype(np.int64)
+    picks = np.full(len(rows), -1, dtype=np.int64)
+    has_columns = degrees > 0
+    picks[has_columns] = matrix.indices[starts[has_columns] + offsets[has_columns]]
+    return picks
 
 # consider generating a skill graph to show relationships
 def generate_enrollments(
         n_users=50,
         max_enrollments_per_user=20,
-        monte=0.6
+        monte=0.6,
+        courses_df=None,
+        popularity_skew=1.0,
+        seed=None
     ) -> pd.DataFrame:
-    """ Generate realistic enrollments """
-    course_data = _load_preprocessed_course_data()
-    course_relationships = _map_course_relationships(course_data)
-
-    enrollments = []
-
-    for user_id in range(1, n_users+1):
-        n_enrollments = random.randint(2, max_enrollments_per_user)
-        user_enrollments = set()
-
-        # start with a random course
-        first_course = random.choice(course_data['course_id'].values)
-        enrollments.append({
-            'user_id': user_id,
-            'course_id': first_course
-        })
-        user_enrollments.add(first_course)
-
-        for _ in range(n_enrollments - 1):
-            possible_related_courses = set()
-            for course in user_enrollments:
-                possible_related_courses.update(course_relationships[course])
-            
-            possible_related_courses -= user_enrollments
-
-            next_course = None
-            if possible_related_courses and random.random() < monte:
-                # select a related course
-                next_course = random.choice(list(possible_related_courses))
-            else:
-                # select a random course
-                available_courses = set(course_data['course_id'].values) - user_enrollments
-                if available_courses:
-                    next_course = random.choice(list(available_courses))
-            
-            if next_course:
-                enrollments.append({
-                    'user_id': user_id,
-                    'course_id': next_course
-                })
-                user_enrollments.add(next_course)
-        
-    enrollments_df = pd.DataFrame(enrollments)
-    enrollments_df.to_csv("data/generated_enrollments.csv", index=False)
-    return enrollments_df
+    """
+    Generate realistic enrollments
+    courses_df needs course_id and skills columns, see load_course_skills
+    """
+    if courses_df is None:
+        raise ValueError("Courses are required to generate enrollments")
+    course_data = courses_df[['course_id', 'skills']]
+    course_ids = course_data['course_id'].to_numpy(dtype=np.int64)
+    n_courses = len(course_ids)
+    rng = np.random.default_rng(seed)
+    if not n_courses or n_users <= 0:
+        return pd.DataFrame({'user_id': np.empty(0, dtype=np.int32), 'course_id': np.empty(0, dtype=np.int32)})
+
+    course_skills = _build_skill_matrix(course_data)
+    skill_courses = course_skills.T.tocsr()
+
+    # Zipf-like popularity over a random ranking of the courses
+    popularity = 1.0 / np.power(rng.permutation(n_courses) + 1.0, popularity_skew)
+    popularity /= popularity.sum()
+
+    n_enrollments = rng.integers(2, max(max_enrollments_per_user, 2) + 1, size=n_users)
+    n_enrollments = np.minimum(n_enrollments, n_courses)
+
+    # one random walk step per column, all users at once
+    walks = np.full((n_users, n_enrollments.max()), -1, dtype=np.int32)
+    walks[:, 0] = rng.choice(n_courses, size=n_users, p=popularity)
+    for step in range(1, walks.shape[1]):
+        users = np.flatnonzero(n_enrollments > step)
+        previous = walks[users, step - 1]
+
+        # select a related course through a shared skill, a catalog without skills has none
+        follow = None
+        if course_skills.nnz:
+            related = _sample_rows(skill_courses, _sample_rows(course_skills, previous, rng).clip(min=0), rng)
+            has_skill = np.diff(course_skills.indptr)[previous] > 0
+            follow = (rng.random(len(users)) < monte) & has_skill & (related >= 0)
+
+        # select a random course
+        next_courses = rng.choice(n_courses, size=len(users), p=popularity)
+        if follow is not None:
+            next_courses[follow] = related[follow]
+        walks[users, step] = next_courses
+
+    user_index, step_index = np.nonzero(walks >= 0)
+    enrollments_df = pd.DataFrame({
+        'user_id': (user_index + 1).astype(np.int32),
+        'course_id': course_ids[walks[user_index, step_index]].astype(np.int32),
+    })
+    # revisits along a walk are a single enrollment
+    return enrollments_df.drop_duplicates(ignore_index=True)
+
+def save_enrollments(enrollments_df, path=GENERATED_ENROLLMENTS_PATH):
+    """ Save enrollments as compressed int32 arrays """
+    np.savez_compressed(
+        path,
+        user_id=enrollments_df['user_id'].to_numpy(dtype=np.int32),
+        course_id=enrollments_df['course_id'].to_numpy(dtype=np.int32)
+    )
+
+def load_enrollments(path=GENERATED_ENROLLMENTS_PATH) -> pd.DataFrame:
+    """ Load enrollments saved by save_enrollments """
+    with np.load(path) as enrollments:
+        return pd.DataFrame({'user_id': enrollments['user_id'], 'course_id': enrollments['course_id']})
 
 
 if __name__ == "__main__":
-    generate_enrollments()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate synthetic enrollments")
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--max-enrollments', type=int, default=20)
+    parser.add_argument('--monte', type=float, default=0.6, help="probability of following a shared skill")
+    parser.add_argument('--popularity-skew', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--courses', default=None, help="CSV with course_id and skills columns, the database courses if omitted")
+    parser.add_argument('--output', default=GENERATED_ENROLLMENTS_PATH)
+    args = parser.parse_args()
+
+    if args.courses:
+        courses_df = load_course_skills_csv(args.courses)
+    else:
+        from app import app
+        from database import create_session
+
+        with app.app_context():
+            session = create_session()
+            try:
+                courses_df = load_course_skills(session)
+            finally:
+                session.close()
+
+    enrollments_df = generate_enrollments(
+        n_users=args.users,
+        max_enrollments_per_user=args.max_enrollments,
+        monte=args.monte,
+        courses_df=courses_df,
+        popularity_skew=args.popularity_skew,
+        seed=args.seed
+    )
+    save_enrollments(enrollments_df, args.output)
+    print(f"Saved {len(enrollments_df)} enrollments of {args.users} users to {args.output}")
@@ -0,0 +1,100 @@
+# Implicit feedback for collaborative filtering
+# Streams user-course interactions from the database with server-side cursors (yield_per),
+# one signal at a time, into compact NumPy chunks:
+# - enrollments and favourites count once
+# - every completed lesson counts towards its course
+# - reviews count in proportion to their rating
+# Chunks are periodically summed per (user, course), so memory stays bounded by the number of
+# distinct pairs rather than the number of rows, and the result feeds a vectorized CSR build
+
+from itertools import islice
+import numpy as np
+import pandas as pd
+
+from models.enrollment import Enrollment
+from models.favourite import Favourite
+from models.lesson_completion import LessonCompletion
+from models.chapter_lesson import ChapterLesson
+from models.chapter import Chapter
+from models.review import Review
+
+INTERACTION_CONFIDENCE = {
+    'enrollment': 1.0,
+    'favourite': 0.5,
+    'lesson_completion': 0.1, # per completed lesson
+    'review': 0.5, # at a 5 star rating
+}
+INTERACTION_BATCH_SIZE = 50000 # rows fetched per round trip
+INTERACTION_COMPACT_SIZE = 5000000 # pending rows before they are summed per (user, course)
+MAX_RATING = 5
+
+def _stream_rows(query, batch_size):
+    """ Yield (user_ids, course_ids, values) arrays per batch of a (user_id, course_id[, value]) query """
+    rows = iter(query.yield_per(batch_size))
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+
+        user_ids = np.fromiter((row[0] for row in batch), dtype=np.int64, count=len(batch))
+        course_ids = np.fromiter((row[1] for row in batch), dtype=np.int64, count=len(batch))
+        if len(batch[0]) > 2:
+            values = np.fromiter((float(row[2]) for row in batch), dtype=np.float32, count=len(batch))
+        else:
+            values = np.ones(len(batch), dtype=np.float32)
+        yield user_ids, course_ids, values
+
+def stream_interactions(session, batch_size=INTERACTION_BATCH_SIZE):
+    """ Yield (user_ids, course_ids, weights) chunks for every interaction signal """
+    signals = [
+        ('enrollment', session.query(Enrollment.user_id, Enrollment.course_id)),
+        ('favourite', session.query(Favourite.user_id, Favourite.course_id)),
+        ('lesson_completion', (
+            session.query(LessonCompletion.user_id, Chapter.course_id)
+            .join(ChapterLesson, ChapterLesson.lesson_id == LessonCompletion.lesson_id)
+            .join(Chapter, Chapter.id == ChapterLesson.chapter_id)
+        )),
+        ('review', session.query(Review.user_id, Review.course_id, Review.rating)),
+    ]
+
+    for signal, query in signals:
+        confidence = INTERACTION_CONFIDENCE[signal]
+        for user_ids, course_ids, values in _stream_rows(query, batch_size):
+            if signal == 'review':
+                values = values / MAX_RATING
+            yield user_ids, course_ids, confidence * values
+
+def _compact(chunks):
+    """ Sum chunk weights per (user, course), keeping first-appearance order """
+    interactions_df = pd.DataFrame({
+        'user_id': np.concatenate([chunk[0] for chunk in chunks]),
+        'course_id': np.concatenate([chunk[1] for chunk in chunks]),
+        'weight': np.concatenate([chunk[2] for chunk in chunks]),
+    })
+    interactions_df = interactions_df.groupby(['user_id', 'course_id'], sort=False, as_index=False)['weight'].sum()
+    return (
+        interactions_df['user_id'].to_numpy(),
+        interactions_df['course_id'].to_numpy(),
+        interactions_df['weight'].to_numpy(dtype=np.float32)
+    )
+
+def load_interactions(session, batch_size=INTERACTION_BATCH_SIZE, compact_size=INTERACTION_COMPACT_SIZE):
+    """ Load every interaction as a DataFrame of user_id, course_id and summed confidence weight """
+    chunks = []
+    pending_rows = 0 # rows added since the last compaction
+    for chunk in stream_interactions(session, batch_size=batch_size):
+        chunks.append(chunk)
+        pending_rows += len(chunk[0])
+        if pending_rows >= compact_size:
+            chunks = [_compact(chunks)]
+            pending_rows = 0
+
+    if not chunks:
+        return pd.DataFrame({
+            'user_id': np.empty(0, dtype=np.int64),
+            'course_id': np.empty(0, dtype=np.int64),
+            'weight': np.empty(0, dtype=np.float32),
+        })
+
+    user_ids, course_ids, weights = _compact(chunks)
+    return pd.DataFrame({'user_id': user_ids, 'course_id': course_ids, 'weight': weights})
@@ -0,0 +1,256 @@
+# Top-K item neighbor index
+# Keeps only the K most similar courses per course instead of the dense N x N similarity matrix
+# Memory is O(N * K) and a lookup is O(K), independent of the catalog size
+# neighbors[i] holds row positions of the K most similar courses of row i, sorted by descending score
+
+import os
+import numpy as np
+from scipy.sparse import csr_matrix
+
+DEFAULT_NEIGHBORS = 100
+DEFAULT_BLOCK_SIZE = 1024
+DENSE_COLUMN_THRESHOLD = 0.5 # sparse feature columns set for a larger share of rows are scored densely
+
+def top_k_rows(scores, k, exclude_rows=None):
+    """
+    Select the top k columns per row of a score block with argpartition
+    exclude_rows gives, per block row, a column to drop (the course itself)
+    Returns (indices, scores) sorted by descending score
+    """
+    n_rows, n_cols = scores.shape
+    k = min(k, n_cols)
+    if k <= 0:
+        return (
+            np.empty((n_rows, 0), dtype=np.int32),
+            np.empty((n_rows, 0), dtype=np.float32)
+        )
+
+    if exclude_rows is not None:
+        scores[np.arange(n_rows), exclude_rows] = -np.inf
+
+    top_indices = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top_indices, axis=1)
+
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    top_indices = np.take_along_axis(top_indices, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+    return top_indices.astype(np.int32), top_scores.astype(np.float32)
+
+class NeighborIndex:
+    def __init__(self, row_ids, neighbors, scores):
+        """ Initialize the index from row ids and precomputed neighbor arrays """
+        self.row_ids = np.asarray(row_ids)
+        self.neighbors = neighbors
+        self.scores = scores
+        self.id_to_row = {self._to_builtin(row_id): row for row, row_id in enumerate(self.row_ids)}
+
+    @property
+    def k(self):
+        return self.neighbors.shape[1]
+
+    def __len__(self):
+        return len(self.row_ids)
+
+    def __contains__(self, row_id):
+        return row_id in self.id_to_row
+
+    @classmethod
+    def from_similarity_matrix(cls, similarity_matrix, row_ids, k=DEFAULT_NEIGHBORS, block_size=DEFAULT_BLOCK_SIZE):
+        """ Build the index from a (possibly memory-mapped) similarity matrix, one row block at a time """
+        n_rows = similarity_matrix.shape[0]
+        k = max(min(k, n_rows - 1), 0)
+
+        neighbors = np.empty((n_rows, k), dtype=np.int32)
+        scores = np.empty((n_rows, k), dtype=np.float32)
+
+        for start in range(0, n_rows, block_size):
+            end = min(start + block_size, n_rows)
+            block = np.array(similarity_matrix[start:end], dtype=np.float32)
+            neighbors[start:end], scores[start:end] = top_k_rows(
+                block, k, exclude_rows=np.arange(start, end)
+            )
+
+        return cls(row_ids, neighbors, scores)
+
+    @classmethod
+    def from_features(cls, features, row_ids, k=DEFAULT_NEIGHBORS, block_size=DEFAULT_BLOCK_SIZE):
+        """ 
+        Build the index from row-normalized feature vectors, where similarity is the dot product
+        Only one block_size x N float32 score block is alive at a time
+        """
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        n_rows = features.shape[0]
+        k = max(min(k, n_rows - 1), 0)
+
+        neighbors = np.empty((n_rows, k), dtype=np.int32)
+        scores = np.empty((n_rows, k), dtype=np.float32)
+        block = np.empty((min(block_size, n_rows), n_rows), dtype=np.float32)
+
+        for start in range(0, n_rows, block_size):
+            end = min(start + block_size, n_rows)
+            block_scores = block[:end - start]
+            np.matmul(features[start:end], features.T, out=block_scores)
+            neighbors[start:end], scores[start:end] = top_k_rows(
+                block_scores, k, exclude_rows=np.arange(start, end)
+            )
+
+        return cls(row_ids, neighbors, scores)
+
+    @classmethod
+    def from_sparse_features(
+        cls,
+        features,
+        row_ids,
+        k=DEFAULT_NEIGHBORS,
+        block_size=DEFAULT_BLOCK_SIZE,
+        dense_column_threshold=DENSE_COLUMN_THRESHOLD
+    ):
+        """
+        Build the index from row-normalized sparse feature vectors, where similarity is the dot product
+        Each row block is scored with one sparse-sparse product, so the cost follows the shared
+        non-zero terms rather than the vocabulary size; columns set for most rows (e.g. numerical
+        features) would make that product dense and are scored with a small dense matmul instead
+        Only one block_size x N float32 score block is alive at a time
+        """
+        features = csr_matrix(features, dtype=np.float32)
+        n_rows = features.shape[0]
+        k = max(min(k, n_rows - 1), 0)
+
+        column_density = np.bincount(features.indices, minlength=features.shape[1]) / max(n_rows, 1)
+        dense_columns = np.flatnonzero(column_density > dense_column_threshold)
+        sparse_columns = np.flatnonzero(column_density <= dense_column_threshold)
+        dense_features = np.ascontiguousarray(features[:, dense_columns].toarray())
+        sparse_features = features[:, sparse_columns].tocsr()
+        sparse_features_t = sparse_features.T.tocsr()
+
+        neighbors = np.empty((n_rows, k), dtype=np.int32)
+        scores = np.empty((n_rows, k), dtype=np.float32)
+        block = np.empty((min(block_size, n_rows), n_rows), dtype=np.float32)
+
+        for start in range(0, n_rows, block_size):
+            end = min(start + block_size, n_rows)
+            block_scores = block[:end - start]
+            np.matmul(dense_features[start:end], dense_features.T, out=block_scores)
+            # entries of a CSR product are unique, so they are added in place without densifying it
+            product = (sparse_features[start:end] @ sparse_features_t).tocsr()
+            product_rows = np.repeat(np.arange(end - start), np.diff(product.indptr))
+            block_scores[product_rows, product.indices] += product.data
+            neighbors[start:end], scores[start:end] = top_k_rows(
+                block_scores, k, exclude_rows=np.arange(start, end)
+            )
+
+        return cls(row_ids, neighbors, scores)
+
+    def get_neighbors(self, row_id, top_n=None, min_similarity=None):
+        """ Get (row_ids, scores) of the nearest neighbors of a row id """
+        row = self.id_to_row.get(row_id)
+        if row is None:
+            raise ValueError(f"Course ID {row_id} not found in the dataset.")
+
+        neighbor_rows = self.neighbors[row]
+        neighbor_scores = self.scores[row]
+
+        if min_similarity is not None:
+            # scores are sorted, so the cutoff is a single binary search
+            cutoff = np.searchsorted(-neighbor_scores, -min_similarity, side='left')
+            neighbor_rows = neighbor_rows[:cutoff]
+            neighbor_scores = neighbor_scores[:cutoff]
+
+        if top_n is not None:
+            neighbor_rows = neighbor_rows[:top_n]
+            neighbor_scores = neighbor_scores[:top_n]
+
+        return self.row_ids[neighbor_rows], neighbor_scores
+
+    def with_row(self, row_id, row_scores):
+        """ Return a new index with one row added or refreshed, see with_rows """
+        return self.with_rows([row_id], [row_scores])
+
+    def with_rows(self, row_ids, rows_scores, max_k=DEFAULT_NEIGHBORS):
+        """
+        Return a new index with rows added or refreshed, copying the index arrays once for the batch
+        rows_scores holds, per row id, its similarity against every row in row order,
+        with new row ids expected at the end in the order given
+        Rows whose score for an updated row dropped keep it until the next rebuild,
+        since their next best neighbor outside the top K is not stored
+        An index smaller than max_k holds complete neighbor lists, which grow up to max_k with the catalog
+        """
+        row_ids = [self._to_builtin(row_id) for row_id in row_ids]
+        new_rows = {}
+        for row_id in row_ids:
+            if row_id not in self.id_to_row and row_id not in new_rows:
+                new_rows[row_id] = len(self) + len(new_rows)
+        rows = [self.id_to_row.get(row_id, new_rows.get(row_id)) for row_id in row_ids]
+        all_row_ids = np.append(self.row_ids, list(new_rows)) if new_rows else self.row_ids
+        n_rows = len(all_row_ids)
+
+        rows_scores = np.asarray(rows_scores, dtype=np.float32).reshape(len(row_ids), -1)
+        if rows_scores.shape[1] != n_rows:
+            raise ValueError("Row scores do not match the number of rows in the index")
+
+        if self.k >= len(self) - 1 and self.k < max_k:
+            # complete lists of a small catalog, rebuilt from the known similarities
+            similarity_matrix = np.full((n_rows, n_rows), -np.inf, dtype=np.float32)
+            for row in range(len(self)):
+                similarity_matrix[row, self.neighbors[row]] = self.scores[row]
+            for row, row_scores in zip(rows, rows_scores):
+                similarity_matrix[row] = row_scores
+                similarity_matrix[:, row] = row_scores
+            return NeighborIndex.from_similarity_matrix(similarity_matrix, all_row_ids, k=max_k)
+
+        neighbors = np.zeros((n_rows, self.k), dtype=np.int32)
+        scores = np.zeros((n_rows, self.k), dtype=np.float32)
+        neighbors[:len(self)] = self.neighbors
+        scores[:len(self)] = self.scores
+        if self.k:
+            for row, row_scores in zip(rows, rows_scores):
+                self._patch_row(neighbors, scores, row, row_scores)
+        return NeighborIndex(all_row_ids, neighbors, scores)
+
+    @staticmethod
+    def _patch_row(neighbors, scores, row, row_scores):
+        """ Patch the similarities of one row into neighbor arrays in place """
+        # neighbors of the row itself
+        row_neighbors, row_neighbor_scores = top_k_rows(row_scores[np.newaxis].copy(), neighbors.shape[1], exclude_rows=[row])
+        neighbors[row] = row_neighbors[0]
+        scores[row] = row_neighbor_scores[0]
+
+        # rows that already list this row get its refreshed score
+        contains = neighbors == row
+        contains[row] = False
+        listed = contains.any(axis=1)
+        scores[contains] = row_scores[np.nonzero(contains)[0]]
+
+        # rows where this row now beats the weakest neighbor replace that neighbor
+        beats = (row_scores > scores[:, -1]) & ~listed
+        beats[row] = False
+        neighbors[beats, -1] = row
+        scores[beats, -1] = row_scores[beats]
+
+        # restore descending order for patched rows
+        affected = np.nonzero(listed | beats)[0]
+        if len(affected):
+            order = np.argsort(-scores[affected], axis=1, kind='stable')
+            neighbors[affected] = np.take_along_axis(neighbors[affected], order, axis=1)
+            scores[affected] = np.take_along_axis(scores[affected], order, axis=1)
+
+    def save(self, directory):
+        """ Save index arrays to a directory """
+        np.save(os.path.join(directory, 'neighbor_row_ids.npy'), self.row_ids)
+        np.save(os.path.join(directory, 'neighbors.npy'), self.neighbors)
+        np.save(os.path.join(directory, 'neighbor_scores.npy'), self.scores)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """ Load index arrays saved by save, memory-mapped by default """
+        return cls(
+            np.load(os.path.join(directory, 'neighbor_row_ids.npy')),
+            np.load(os.path.join(directory, 'neighbors.npy'), mmap_mode=mmap_mode),
+            np.load(os.path.join(directory, 'neighbor_scores.npy'), mmap_mode=mmap_mode)
+        )
+
+    @staticmethod
+    def _to_builtin(value):
+        """ Convert numpy scalars to python values so dict lookups work with plain ints """
+        return value.item() if isinstance(value, np.generic) else value
@@ -0,0 +1,111 @@
+# Keyset (cursor) pagination
+# An OFFSET page makes the database walk and discard every earlier row, so deep pages get linearly
+# slower, and rows inserted meanwhile shift later pages (skipped or repeated courses)
+# A cursor instead carries the sort key of the last row served; the next page is the rows strictly
+# after it in sort order, which an index on the sort keys serves as a range scan
+# Cursors are opaque urlsafe base64 JSON: the listing they belong to and the last row's sort key,
+# which always ends with a unique column so that ties are never split or repeated
+# Offset pages keep working for old clients and also return a cursor to continue from
+# Ranked listings without a stable sort key (search relevance) hand out offset tokens instead:
+# the same opaque format holding the position of the next row, so they page by offset
+# and courses added or re-ranked between requests can still shift their later pages
+
+import json
+import base64
+import binascii
+from decimal import Decimal
+from datetime import datetime
+from sqlalchemy import and_, or_, tuple_
+
+def encode_cursor(scope, values):
+    """ Opaque cursor for the position after a row with the given sort key values """
+    payload = json.dumps([scope, [value.isoformat() if isinstance(value, datetime) else value for value in values]], default=str)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """ (scope, raw sort key values) of a cursor """
+    try:
+        scope, values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return scope, values
+
+def _parse_value(expression, value):
+    """ Restore a sort key value decoded from JSON to the type of its expression """
+    python_type = expression.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is Decimal:
+        return Decimal(value)
+    return python_type(value)
+
+def keyset_condition(sort_keys, values):
+    """
+    Rows strictly after the given sort key values, for sort_keys of (expression, descending)
+    Keys sorted in one direction compare as a row value, which a composite index can serve
+    """
+    expressions = [expression for expression, _ in sort_keys]
+    if len({descending for _, descending in sort_keys}) == 1:
+        if sort_keys[0][1]:
+            return tuple_(*expressions) < tuple_(*values)
+        return tuple_(*expressions) > tuple_(*values)
+
+    conditions = []
+    for i, (expression, descending) in enumerate(sort_keys):
+        after = expression < values[i] if descending else expression > values[i]
+        conditions.append(and_(*[expressions[j] == values[j] for j in range(i)], after))
+    return or_(*conditions)
+
+def encode_offset_token(scope, offset):
+    """ Opaque token for the page of a ranked listing starting at offset, passed back like a cursor """
+    return encode_cursor(scope, [offset])
+
+def get_offset(scope, page, per_page, cursor=None):
+    """
+    Offset of a page of a ranked listing (e.g. search relevance) from its offset token or page number
+    Rankings have no stable sort key to seek on, see encode_offset_token
+    """
+    if not cursor:
+        return (page - 1) * per_page
+
+    cursor_scope, values = decode_cursor(cursor)
+    if cursor_scope != scope or len(values) != 1 or not isinstance(values[0], int) or values[0] < 0:
+        raise ValueError("Invalid cursor")
+    return values[0]
+
+def paginate(query, sort_keys, scope, per_page, page=1, cursor=None, having=False):
+    """
+    Page of a query ordered by sort_keys, a list of (expression, descending) ending with a unique key
+    With a cursor the page starts after the cursor's row, otherwise at the offset of page
+    having=True filters aggregated sort keys of a grouped query
+    Returns (rows, next_cursor), next_cursor is None on the last page
+    """
+    if cursor:
+        cursor_scope, raw_values = decode_cursor(cursor)
+        if cursor_scope != scope or len(raw_values) != len(sort_keys):
+            raise ValueError("Invalid cursor")
+        try:
+            values = [_parse_value(expression, value) for (expression, _), value in zip(sort_keys, raw_values)]
+        except (TypeError, ValueError, ArithmeticError):
+            raise ValueError("Invalid cursor")
+        condition = keyset_condition(sort_keys, values)
+        query = query.having(condition) if having else query.filter(condition)
+
+    query = (
+        query
+        .add_columns(*[expression for expression, _ in sort_keys])
+        .order_by(*[expression.desc() if descending else expression.asc() for expression, descending in sort_keys])
+    )
+    if not cursor:
+        query = query.offset((page - 1) * per_page)
+
+    # one extra row tells whether a next page exists
+    rows = query.limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(scope, list(rows[-1][1:]))
+    return [row[0] for row in rows], next_cursor
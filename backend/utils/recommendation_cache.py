@@ -0,0 +1,77 @@
+# Recommendation result cache
+# Ranking the catalog for a user is the expensive part of a recommendation request and its result
+# does not change between the pages of one listing, so the ranked course ids (already filtered to
+# the channel's active courses the user is not enrolled in) are kept per user under
+# (channel, recommendation type, model version, options) and later pages are sliced from them
+# Entries are dropped when the user's enrollments or interactions change, when a channel's courses
+# change and when another model is swapped in, and expire after a TTL so that other workers
+# pick up changes too
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+RECOMMENDATION_CACHE_TTL = int(os.getenv('RECOMMENDATION_CACHE_TTL', 300)) # seconds
+RECOMMENDATION_CACHE_SIZE = int(os.getenv('RECOMMENDATION_CACHE_SIZE', 10000)) # users
+
+class RecommendationCache:
+    def __init__(self, ttl=RECOMMENDATION_CACHE_TTL, max_users=RECOMMENDATION_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_users = max_users
+        # user id -> {(channel id, recommendation type, model version, options): (created, course ids)}
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id, key):
+        """ Cached ranked course ids of a user under key, None if missing or expired """
+        with self._lock:
+            entries = self._users.get(user_id)
+            cached = entries.get(key) if entries is not None else None
+            if cached is None or time.monotonic() - cached[0] >= self.ttl:
+                self.misses += 1
+                return None
+
+            self._users.move_to_end(user_id)
+            self.hits += 1
+            return cached[1]
+
+    def set(self, user_id, key, course_ids):
+        """ Cache ranked course ids of a user under key, evicting the least recently used users """
+        with self._lock:
+            entries = self._users.setdefault(user_id, {})
+            # a newer model version makes the user's other entries unreachable
+            for stale_key in [cached_key for cached_key in entries if cached_key[:2] == key[:2]]:
+                del entries[stale_key]
+            entries[key] = (time.monotonic(), course_ids)
+
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+    def invalidate_user(self, user_id):
+        """ Drop the cached recommendations of a user """
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def invalidate_channel(self, channel_id=None):
+        """ Drop the cached recommendations in a channel, or in every channel """
+        with self._lock:
+            if channel_id is None:
+                self._users.clear()
+                return
+            for entries in self._users.values():
+                for key in [key for key in entries if key[0] == channel_id]:
+                    del entries[key]
+
+    def clear(self):
+        """ Drop every cached recommendation, e.g. after a model swap """
+        with self._lock:
+            self._users.clear()
+
+_recommendation_cache = RecommendationCache()
+
+def get_recommendation_cache():
+    return _recommendation_cache
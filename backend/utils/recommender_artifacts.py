@@ -0,0 +1,31 @@
+# Recommender artifacts layout
+# Trained recommender state is persisted as versioned artifacts:
+# <RECOMMENDER_ARTIFACTS_PATH>/<version>/ holds one trained model,
+# <RECOMMENDER_ARTIFACTS_PATH>/LATEST names the version workers should load
+# Kept apart from the recommender so that startup can check for published artifacts
+# without importing the ML stack
+
+import os
+import json
+
+RECOMMENDER_ARTIFACTS_PATH = os.getenv('RECOMMENDER_ARTIFACTS_PATH', './data/recommender')
+RECOMMENDER_ARTIFACTS_FORMAT = 3
+
+def get_latest_artifacts_version(artifacts_path=RECOMMENDER_ARTIFACTS_PATH):
+    """ Get the version named by the LATEST pointer, None if nothing has been published """
+    latest_path = os.path.join(artifacts_path, 'LATEST')
+    if not os.path.exists(latest_path):
+        return None
+
+    with open(latest_path, 'r') as file:
+        version = file.read().strip()
+
+    manifest_path = os.path.join(artifacts_path, version, 'manifest.json')
+    if not version or not os.path.exists(manifest_path):
+        return None
+
+    # artifacts written by an older format have to be retrained
+    with open(manifest_path, 'r') as file:
+        if json.load(file).get('format') != RECOMMENDER_ARTIFACTS_FORMAT:
+            return None
+    return version
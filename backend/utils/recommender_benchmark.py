@@ -0,0 +1,392 @@
+# Offline benchmark for the course recommender
+# Splits user-course interactions into train and test sets and compares recommendation modes on
+# - ranking quality: NDCG@k, MRR, MAP@k, hit rate@k and AUC, vectorized over blocks of users
+# - cost: training wall time and peak memory, p50/p99 per-request latency
+# Results are written as JSON so runs can be diffed
+#
+# Usage (from backend/, with the database reachable):
+# python -m utils.recommender_benchmark --source generated --k 10 --output data/benchmark.json
+
+import sys
+import json
+import time
+import argparse
+import resource
+import tracemalloc
+import numpy as np
+import pandas as pd
+from datetime import datetime, timezone
+from scipy.sparse import csr_matrix
+from scipy.stats import rankdata
+
+from utils.neighbor_index import top_k_rows
+
+BENCHMARK_MODES = ('random', 'content', 'collaborative', 'two_tower') # two_tower requires torch
+BENCHMARK_BLOCK_SIZE = 1024 # users scored at a time
+
+def split_interactions(interactions_df, test_fraction=0.2, seed=42):
+    """
+    Hold out a random fraction of each user's interactions as the test set
+    Users keep at least one training interaction, users with a single interaction are train only
+    """
+    interactions_df = interactions_df[['user_id', 'course_id']].drop_duplicates().reset_index(drop=True)
+    rng = np.random.default_rng(seed)
+
+    counts = interactions_df.groupby('user_id')['course_id'].transform('size').to_numpy()
+    n_test = np.minimum(np.maximum(np.floor(counts * test_fraction), 1), counts - 1)
+
+    # a random rank within each user decides which rows are held out
+    order = (
+        pd.Series(rng.random(len(interactions_df)), index=interactions_df.index)
+        .groupby(interactions_df['user_id'])
+        .rank(method='first')
+        .to_numpy()
+    )
+    is_test = order <= n_test
+
+    return interactions_df[~is_test].reset_index(drop=True), interactions_df[is_test].reset_index(drop=True)
+
+def build_interaction_matrices(train_df, test_df, course_ids=None):
+    """
+    Build binary users x items train and test matrices over one shared index
+    course_ids extends the item universe with catalog courses nobody interacted with
+    """
+    user_ids = np.unique(np.concatenate([train_df['user_id'].to_numpy(), test_df['user_id'].to_numpy()]))
+    item_ids = np.unique(np.concatenate([
+        train_df['course_id'].to_numpy(),
+        test_df['course_id'].to_numpy(),
+        np.asarray(course_ids if course_ids is not None else [], dtype=train_df['course_id'].dtype)
+    ]))
+
+    def to_matrix(df):
+        rows = np.searchsorted(user_ids, df['user_id'].to_numpy())
+        cols = np.searchsorted(item_ids, df['course_id'].to_numpy())
+        return csr_matrix(
+            (np.ones(len(df), dtype=np.float32), (rows, cols)),
+            shape=(len(user_ids), len(item_ids))
+        )
+
+    return to_matrix(train_df), to_matrix(test_df), user_ids, item_ids
+
+def ranking_metrics(score_users, train_matrix, test_matrix, k=10, block_size=BENCHMARK_BLOCK_SIZE):
+    """
+    Compute mean ranking metrics over every user with test interactions
+    score_users(user_rows) returns a dense len(user_rows) x n_items score block
+    Training items are excluded from the ranking, as they are when serving
+    """
+    test_users = np.flatnonzero(np.diff(test_matrix.indptr))
+    n_items = train_matrix.shape[1]
+    k = min(k, n_items)
+
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    ideal_dcg = np.cumsum(discounts)
+    positions = np.arange(1, k + 1)
+
+    totals = {'ndcg': 0.0, 'mrr': 0.0, 'map': 0.0, 'hit_rate': 0.0, 'auc': 0.0}
+    n_auc_users = 0
+
+    for start in range(0, len(test_users), block_size):
+        user_rows = test_users[start:start + block_size]
+        scores = np.array(score_users(user_rows), dtype=np.float64)
+        train_mask = train_matrix[user_rows].toarray() > 0
+        relevant = test_matrix[user_rows].toarray() > 0
+        scores[train_mask] = -np.inf
+
+        top_items, _ = top_k_rows(scores.astype(np.float32), k)
+        hits = np.take_along_axis(relevant, top_items.astype(np.intp), axis=1)
+
+        n_relevant = relevant.sum(axis=1)
+        n_ideal = np.minimum(n_relevant, k)
+        has_hit = hits.any(axis=1)
+
+        totals['ndcg'] += ((hits * discounts).sum(axis=1) / ideal_dcg[n_ideal - 1]).sum()
+        totals['mrr'] += np.where(has_hit, 1.0 / (hits.argmax(axis=1) + 1), 0.0).sum()
+        totals['map'] += ((np.cumsum(hits, axis=1) / positions * hits).sum(axis=1) / n_ideal).sum()
+        totals['hit_rate'] += has_hit.sum()
+
+        # AUC from ranks among candidates, training items rank below every candidate
+        ranks = rankdata(scores, axis=1)
+        n_excluded = train_mask.sum(axis=1)
+        n_negative = n_items - n_excluded - n_relevant
+        positive_rank_sum = np.where(relevant, ranks, 0).sum(axis=1) - n_relevant * n_excluded
+        auc_users = n_negative > 0
+        totals['auc'] += (
+            (positive_rank_sum[auc_users] - n_relevant[auc_users] * (n_relevant[auc_users] + 1) / 2)
+            / (n_relevant[auc_users] * n_negative[auc_users])
+        ).sum()
+        n_auc_users += auc_users.sum()
+
+    n_users = max(len(test_users), 1)
+    metrics = {name: float(total / n_users) for name, total in totals.items() if name != 'auc'}
+    metrics['auc'] = float(totals['auc'] / n_auc_users) if n_auc_users else None
+    metrics['k'] = k
+    metrics['n_users'] = int(len(test_users))
+    return metrics
+
+def random_scorer(n_items, seed=42):
+    """ Uniform random scores, the baseline every other mode has to beat """
+    rng = np.random.default_rng(seed)
+    return lambda user_rows: rng.random((len(user_rows), n_items))
+
+def content_scorer(recommender, train_matrix, item_ids):
+    """
+    Item-kNN scores from the neighbor index: a user's score for a course is the
+    summed similarity between the course and the user's training courses
+    """
+    index = recommender.neighbor_index
+    rows = np.searchsorted(item_ids, index.row_ids)
+    known = (rows < len(item_ids)) & (item_ids[np.minimum(rows, len(item_ids) - 1)] == index.row_ids)
+
+    neighbor_rows = rows[np.asarray(index.neighbors)]
+    neighbor_known = known[np.asarray(index.neighbors)] & known[:, np.newaxis]
+    source_rows = np.broadcast_to(rows[:, np.newaxis], neighbor_rows.shape)
+
+    similarity = csr_matrix(
+        (np.asarray(index.scores)[neighbor_known], (source_rows[neighbor_known], neighbor_rows[neighbor_known])),
+        shape=(len(item_ids), len(item_ids))
+    )
+    return lambda user_rows: (train_matrix[user_rows] @ similarity).toarray()
+
+def collaborative_scorer(recommender, user_ids, item_ids):
+    """ ALS dot-product scores, items unknown to the model rank last """
+    user_factors = recommender._to_numpy(recommender.model.user_factors)
+    item_factors = recommender._to_numpy(recommender.model.item_factors)
+
+    model_users = np.array([recommender.user_mapping.get(user_id, 0) for user_id in user_ids.tolist()])
+    model_items = np.array([recommender.course_mapping.get(course_id, 0) for course_id in item_ids.tolist()])
+    unknown_items = model_items == 0
+
+    def score(user_rows):
+        scores = user_factors[model_users[user_rows]] @ item_factors[model_items].T
+        scores[:, unknown_items] = np.finfo(np.float32).min
+        return scores
+
+    return score
+
+def two_tower_scorer(recommender, train_matrix, item_ids):
+    """ Two-tower dot-product scores from the training histories, items outside the catalog rank last """
+    engine = recommender.two_tower
+    item_rows = np.array([engine.course_index.id_to_row.get(item_id, -1) for item_id in item_ids.tolist()])
+    unknown_items = item_rows < 0
+    course_vectors = np.asarray(engine.course_index.vectors)[np.maximum(item_rows, 0)]
+
+    def score(user_rows):
+        user_items = train_matrix[user_rows]
+        histories = [
+            (item_ids[user_items.indices[start:end]].tolist(), user_items.data[start:end])
+            for start, end in zip(user_items.indptr[:-1], user_items.indptr[1:])
+        ]
+        scores = engine.encode_users(histories) @ course_vectors.T
+        scores[:, unknown_items] = np.finfo(np.float32).min
+        return scores
+
+    return score
+
+def measure(fn, trace_memory=True):
+    """ Run fn and return (result, wall seconds, peak traced memory in MB) """
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = fn()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] / 2**20 if trace_memory else None
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    return result, elapsed, peak
+
+def measure_latency(request, arguments):
+    """ Time request(*args) for every args tuple, in milliseconds """
+    latencies = np.empty(len(arguments))
+    errors = 0
+    for i, args in enumerate(arguments):
+        start = time.perf_counter()
+        try:
+            request(*args)
+        except ValueError:
+            errors += 1
+        latencies[i] = (time.perf_counter() - start) * 1000
+
+    if not len(latencies):
+        return None
+    return {
+        'n_requests': len(latencies),
+        'errors': errors,
+        'mean': float(latencies.mean()),
+        'p50': float(np.percentile(latencies, 50)),
+        'p99': float(np.percentile(latencies, 99)),
+    }
+
+def load_benchmark_interactions(session, source='database', n_users=50, path=None, seed=42):
+    """ 
+    Load (user_id, course_id) interactions from the database, the enrollment generator or a generated file
+    Database interactions are every signal the recommender trains on (see utils/interactions.py)
+    """
+    if source == 'generated':
+        from utils.generate_enrollments import generate_enrollments, load_course_skills
+        return generate_enrollments(n_users=n_users, courses_df=load_course_skills(session), seed=seed)
+    if source == 'file':
+        from utils.generate_enrollments import load_enrollments
+        return load_enrollments(path)
+
+    from utils.interactions import load_interactions
+    return load_interactions(session)[['user_id', 'course_id']]
+
+def serve_profile_recommendations(recommender, course_ids, top_n):
+    """ Content recommendations as served: profile scores of the user's courses, ranked without them """
+    profile_scores = recommender.get_profile_scores(course_ids, np.ones(len(course_ids), dtype=np.float32))
+    if profile_scores is None:
+        return []
+    return recommender.get_profile_recommendations(profile_scores, top_n=top_n, exclude_course_ids=course_ids)
+
+def run_benchmark(
+    session,
+    interactions_df,
+    modes=BENCHMARK_MODES,
+    k=10,
+    test_fraction=0.2,
+    n_requests=1000,
+    seed=42,
+    trace_memory=True
+):
+    """ Train every mode on the train split, evaluate on the test split and return a JSON-ready report """
+    from utils.recommender_system import CourseRecommender
+
+    train_df, test_df = split_interactions(interactions_df, test_fraction=test_fraction, seed=seed)
+    rng = np.random.default_rng(seed)
+
+    recommender = CourseRecommender(session)
+    course_ids = None
+    if 'content' in modes or 'two_tower' in modes:
+        recommender.load_courses()
+        course_ids = recommender.courses_df['course_id'].to_numpy()
+    recommender.enrollments_df = train_df
+
+    train_matrix, test_matrix, user_ids, item_ids = build_interaction_matrices(train_df, test_df, course_ids)
+    test_users = np.flatnonzero(np.diff(test_matrix.indptr))
+    request_users = rng.choice(test_users, size=n_requests) if len(test_users) else []
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'config': {
+            'modes': list(modes),
+            'k': k,
+            'test_fraction': test_fraction,
+            'n_requests': n_requests,
+            'seed': seed,
+            'trace_memory': trace_memory,
+        },
+        'dataset': {
+            'n_users': len(user_ids),
+            'n_items': len(item_ids),
+            'n_train_interactions': int(train_matrix.nnz),
+            'n_test_interactions': int(test_matrix.nnz),
+        },
+        'modes': {},
+    }
+
+    for mode in modes:
+        if mode == 'random':
+            train_seconds, train_peak = 0.0, None
+            scorer = random_scorer(len(item_ids), seed=seed)
+            request = lambda: rng.choice(item_ids, size=min(k, len(item_ids)), replace=False)
+            arguments = [() for _ in request_users]
+        elif mode == 'content':
+            _, train_seconds, train_peak = measure(recommender.preprocess_courses, trace_memory)
+            scorer = content_scorer(recommender, train_matrix, item_ids)
+            # served from the profile of all the user's training courses
+            train_courses = train_df.groupby('user_id')['course_id'].agg(list)
+            request = lambda course_ids: serve_profile_recommendations(recommender, course_ids, top_n=k)
+            arguments = [(train_courses[user_ids[user_row]],) for user_row in request_users]
+        elif mode == 'collaborative':
+            def train_collaborative():
+                recommender.prepare_user_course_data()
+                recommender.train_implicit_recommendation_model()
+            _, train_seconds, train_peak = measure(train_collaborative, trace_memory)
+            scorer = collaborative_scorer(recommender, user_ids, item_ids)
+            request = lambda user_id: recommender.get_user_to_item_recommendations(user_id, top_n=k)
+            arguments = [(user_ids[user_row].item(),) for user_row in request_users]
+        elif mode == 'two_tower':
+            if recommender.item_features is None:
+                # the course tower is built on the content item vectors
+                recommender.preprocess_courses()
+            _, train_seconds, train_peak = measure(recommender.train_two_tower_model, trace_memory)
+            if recommender.two_tower is None:
+                report['modes'][mode] = {'skipped': 'torch is not installed'}
+                continue
+            scorer = two_tower_scorer(recommender, train_matrix, item_ids)
+            train_courses = train_df.groupby('user_id')['course_id'].agg(list)
+            request = lambda course_ids: recommender.get_two_tower_recommendations(course_ids, top_n=k)
+            arguments = [(train_courses[user_ids[user_row]],) for user_row in request_users]
+        else:
+            raise ValueError(f"Unknown benchmark mode: {mode}")
+
+        metrics, evaluate_seconds, _ = measure(
+            lambda: ranking_metrics(scorer, train_matrix, test_matrix, k=k),
+            trace_memory=False
+        )
+        report['modes'][mode] = {
+            'metrics': metrics,
+            'train_seconds': train_seconds,
+            'train_peak_memory_mb': train_peak,
+            'evaluate_seconds': evaluate_seconds,
+            'latency_ms': measure_latency(request, arguments),
+        }
+        if mode == 'two_tower':
+            report['modes'][mode]['train_interactions_per_second'] = recommender.two_tower.stats['train_interactions_per_second']
+
+    # ru_maxrss is in kilobytes on Linux
+    report['max_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark recommender ranking quality and latency")
+    parser.add_argument('--source', choices=['database', 'generated', 'file'], default='database', help="interaction source")
+    parser.add_argument('--interactions', default=None, help="enrollments .npz for --source file")
+    parser.add_argument('--users', type=int, default=50, help="number of users for generated interactions")
+    parser.add_argument('--modes', nargs='+', choices=BENCHMARK_MODES, default=list(BENCHMARK_MODES))
+    parser.add_argument('--k', type=int, default=10, help="ranking cutoff")
+    parser.add_argument('--test-fraction', type=float, default=0.2)
+    parser.add_argument('--requests', type=int, default=1000, help="timed requests per mode")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-trace-memory', action='store_true', help="skip tracemalloc, training times exclude its overhead")
+    parser.add_argument('--output', default=None, help="JSON output path, stdout if omitted")
+    args = parser.parse_args(argv)
+
+    from app import app
+    from database import create_session
+
+    with app.app_context():
+        session = create_session()
+        try:
+            interactions_df = load_benchmark_interactions(
+                session,
+                source=args.source,
+                n_users=args.users,
+                path=args.interactions,
+                seed=args.seed
+            )
+            report = run_benchmark(
+                session,
+                interactions_df,
+                modes=args.modes,
+                k=args.k,
+                test_fraction=args.test_fraction,
+                n_requests=args.requests,
+                seed=args.seed,
+                trace_memory=not args.no_trace_memory
+            )
+            report['config']['source'] = args.source
+        finally:
+            session.close()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,196 @@
+# Recommender instrumentation
+# - stages: wall time and memory of each training/loading step (load_data, Word2Vec, similarity, ALS, ...)
+#   as an RSS delta, plus the tracemalloc peak when RECOMMENDER_TRACE_MEMORY is set
+# - queries: latency histograms of every query path, with percentiles over the most recent requests
+#   and RSS deltas to spot paths that allocate per request
+# - caches: hit rates of the in-process recommendation caches
+# - gauges: the served model version and size
+# Everything is per process and exposed by the internal recommender health endpoint
+
+import os
+import time
+import bisect
+import resource
+import threading
+import functools
+import tracemalloc
+import numpy as np
+from collections import deque
+from contextlib import contextmanager
+
+from utils.candidate_filter import get_candidate_filter
+from utils.course_facets import get_course_facets
+from utils.user_profiles import get_user_profiles
+from utils.recommendation_cache import get_recommendation_cache
+
+RECOMMENDER_TRACE_MEMORY = os.getenv('RECOMMENDER_TRACE_MEMORY', '0') == '1' # tracemalloc during stages, slows them down
+LATENCY_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000) # milliseconds, upper bounds
+LATENCY_WINDOW = 1024 # most recent requests per query path used for percentiles
+
+def get_rss_mb():
+    """ Current resident set size of the process in MB, the peak if the current one is unavailable """
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            pages = int(file.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class RecommenderMetrics:
+    def __init__(self, trace_memory=RECOMMENDER_TRACE_MEMORY):
+        self.trace_memory = trace_memory
+        self._stages = {}
+        self._queries = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def stage(self, name):
+        """ Time a training or loading step and record its memory use """
+        # nested stages report their peaks to the enclosing one, since each resets the tracemalloc peak
+        stack = getattr(self._local, 'stages', None)
+        if stack is None:
+            stack = self._local.stages = []
+        frame = {'child_peak': 0}
+        tracing = self.trace_memory
+        if tracing:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            frame['traced'] = tracemalloc.get_traced_memory()[0]
+        stack.append(frame)
+
+        rss = get_rss_mb()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            rss_delta = get_rss_mb() - rss
+            stack.pop()
+
+            peak = None
+            if tracing and tracemalloc.is_tracing():
+                peak = max(tracemalloc.get_traced_memory()[1], frame['child_peak'])
+                if stack:
+                    stack[-1]['child_peak'] = max(stack[-1]['child_peak'], peak)
+                peak = (peak - frame['traced']) / 2**20
+
+            with self._lock:
+                record = self._stages.setdefault(name, {'count': 0, 'total_seconds': 0.0})
+                record['count'] += 1
+                record['total_seconds'] += seconds
+                record['last_seconds'] = seconds
+                record['last_rss_delta_mb'] = rss_delta
+                record['last_peak_traced_mb'] = peak
+                record['finished'] = time.time()
+
+    def observe_query(self, name, seconds, rss_delta=0.0, failed=False):
+        """ Record one request of a query path """
+        milliseconds = seconds * 1000
+        with self._lock:
+            record = self._queries.get(name)
+            if record is None:
+                record = self._queries[name] = {
+                    'count': 0,
+                    'errors': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+                    'recent_ms': deque(maxlen=LATENCY_WINDOW),
+                    'rss_delta_mb': 0.0,
+                    'max_rss_delta_mb': 0.0,
+                }
+            record['count'] += 1
+            record['errors'] += int(failed)
+            record['total_ms'] += milliseconds
+            record['max_ms'] = max(record['max_ms'], milliseconds)
+            record['buckets'][bisect.bisect_left(LATENCY_BUCKETS, milliseconds)] += 1
+            record['recent_ms'].append(milliseconds)
+            record['rss_delta_mb'] += rss_delta
+            record['max_rss_delta_mb'] = max(record['max_rss_delta_mb'], rss_delta)
+
+    @contextmanager
+    def query(self, name):
+        """ Time one request of a query path """
+        rss = get_rss_mb()
+        started = time.perf_counter()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            self.observe_query(name, time.perf_counter() - started, get_rss_mb() - rss, failed)
+
+    def timed_query(self, name):
+        """ Decorator timing every call of a function as a query path """
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.query(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    @staticmethod
+    def _hit_rate(hits, misses):
+        total = hits + misses
+        return {'hits': hits, 'misses': misses, 'hit_rate': hits / total if total else None}
+
+    def get_cache_stats(self):
+        """ Hit rates of the recommendation caches of this process """
+        candidate_filter = get_candidate_filter()
+        user_profiles = get_user_profiles()
+        recommendation_cache = get_recommendation_cache()
+        course_facets = get_course_facets()
+        return {
+            'recommendations': self._hit_rate(recommendation_cache.hits, recommendation_cache.misses),
+            'channel_courses': self._hit_rate(candidate_filter.channel_hits, candidate_filter.channel_misses),
+            'user_enrollments': self._hit_rate(candidate_filter.enrollment_hits, candidate_filter.enrollment_misses),
+            'user_profiles': self._hit_rate(user_profiles.hits, user_profiles.misses),
+            'course_facets': self._hit_rate(course_facets.hits, course_facets.misses),
+        }
+
+    def snapshot(self):
+        """ JSON-ready view of every counter """
+        with self._lock:
+            stages = {name: dict(record) for name, record in self._stages.items()}
+            queries = {}
+            for name, record in self._queries.items():
+                recent = np.asarray(record['recent_ms'])
+                cumulative = np.cumsum(record['buckets']).tolist()
+                queries[name] = {
+                    'count': record['count'],
+                    'errors': record['errors'],
+                    'mean_ms': record['total_ms'] / record['count'],
+                    'max_ms': record['max_ms'],
+                    'p50_ms': float(np.percentile(recent, 50)),
+                    'p95_ms': float(np.percentile(recent, 95)),
+                    'p99_ms': float(np.percentile(recent, 99)),
+                    # cumulative counts of requests at or below each bound
+                    'histogram_ms': dict(zip([str(bound) for bound in LATENCY_BUCKETS] + ['+Inf'], cumulative)),
+                    'mean_rss_delta_mb': record['rss_delta_mb'] / record['count'],
+                    'max_rss_delta_mb': record['max_rss_delta_mb'],
+                }
+            gauges = dict(self._gauges)
+
+        return {
+            'rss_mb': get_rss_mb(),
+            'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            'trace_memory': self.trace_memory,
+            'model': gauges,
+            'stages': stages,
+            'queries': queries,
+            'caches': self.get_cache_stats(),
+        }
+
+_recommender_metrics = RecommenderMetrics()
+
+def get_recommender_metrics():
+    return _recommender_metrics
@@ -0,0 +1,256 @@
+# Background recommender retraining
+# Training runs in a separate process that publishes a new artifacts version and exits, so serving
+# processes never hold the model being trained next to the served one, and the process-wide
+# BLAS/OpenMP/torch thread caps of training never throttle request threads
+# A single daemon thread per serving process starts that process on demand or on a schedule,
+# polls the published artifacts so every worker hot-swaps the newest model,
+# and replays committed course updates into it (see apply_course_updates in utils/recommender_system.py)
+# Only the worker holding the training lock in the artifacts directory starts a training process,
+# and scheduled retrains go by the age of the published artifacts, so one retrain runs per interval
+# however many workers serve; the other workers only reload and replay updates
+
+import os
+import gc
+import sys
+import time
+import threading
+import subprocess
+
+try:
+    import fcntl
+except ImportError: # not available on Windows, where a single serving process is assumed
+    fcntl = None
+
+from utils.recommender_artifacts import RECOMMENDER_ARTIFACTS_PATH
+
+RECOMMENDER_RETRAIN_INTERVAL = int(os.getenv('RECOMMENDER_RETRAIN_INTERVAL', 0)) # seconds, 0 disables scheduled retraining
+RECOMMENDER_RELOAD_INTERVAL = int(os.getenv('RECOMMENDER_RELOAD_INTERVAL', 60)) # seconds between checks for newer artifacts
+RECOMMENDER_UPDATE_INTERVAL = int(os.getenv('RECOMMENDER_UPDATE_INTERVAL', 10)) # seconds between checks for course updates
+RECOMMENDER_TRAINING_THREADS = int(os.getenv('RECOMMENDER_TRAINING_THREADS', 2)) # threads of the training process
+TRAINING_POLL_INTERVAL = 1 # seconds between checks whether the training process finished
+TRAINING_LOCK_FILE = 'training.lock' # in the artifacts directory, held while a training process runs
+
+BACKEND_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class RecommenderRetrainer:
+    def __init__(
+        self,
+        app,
+        retrain_interval=RECOMMENDER_RETRAIN_INTERVAL,
+        reload_interval=RECOMMENDER_RELOAD_INTERVAL,
+        update_interval=RECOMMENDER_UPDATE_INTERVAL,
+        training_threads=RECOMMENDER_TRAINING_THREADS,
+        artifacts_path=RECOMMENDER_ARTIFACTS_PATH
+    ):
+        self.app = app
+        self.retrain_interval = retrain_interval
+        self.reload_interval = reload_interval
+        self.update_interval = update_interval
+        self.training_threads = training_threads
+        self.artifacts_path = artifacts_path
+
+        self.last_trained = None
+        self.last_error = None
+
+        self._lock = threading.Lock()
+        self._lock_file = None
+        self._process = None
+        self._retrain_requested = False
+        self._update_requested = False
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    @property
+    def is_training(self):
+        with self._lock:
+            return self._process is not None or self._retrain_requested
+
+    def start(self):
+        """ Start the background thread, idempotent """
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='recommender-retrainer', daemon=True)
+            self._thread.start()
+        return self
+
+    def request_retrain(self):
+        """ Ask the background thread to retrain, returns False if a retrain is already running in any worker """
+        with self._lock:
+            if self._process is not None or self._retrain_requested or not self._acquire_training_lock():
+                return False
+            self._retrain_requested = True
+        self._wakeup.set()
+        self.start()
+        return True
+
+    def request_update(self):
+        """ Ask the background thread to replay committed course updates now instead of at its next check """
+        self._update_requested = True
+        self._wakeup.set()
+
+    def _run(self):
+        next_retrain = time.monotonic() + self.retrain_interval if self.retrain_interval else None
+        next_reload = time.monotonic() + self.reload_interval
+        next_update = time.monotonic() + self.update_interval
+
+        while True:
+            deadlines = [deadline for deadline in (next_retrain, next_reload, next_update) if deadline is not None]
+            if self._process is not None:
+                deadlines.append(time.monotonic() + TRAINING_POLL_INTERVAL)
+            self._wakeup.wait(timeout=max(min(deadlines) - time.monotonic(), 0))
+            self._wakeup.clear()
+
+            if self._process is not None and self._process.poll() is not None:
+                self._finish_retrain()
+            elif self._retrain_requested:
+                self._start_retrain()
+            elif self._process is None and next_retrain is not None and time.monotonic() >= next_retrain:
+                remaining = self._schedule_retrain()
+                next_retrain = time.monotonic() + (remaining or self.retrain_interval)
+            elif time.monotonic() >= next_reload:
+                self._reload()
+                next_reload = time.monotonic() + self.reload_interval
+
+            # after a swap, so a new model also gets the updates logged while it was trained
+            if self._update_requested or time.monotonic() >= next_update:
+                self._update_requested = False
+                self._apply_updates()
+                next_update = time.monotonic() + self.update_interval
+
+    def _acquire_training_lock(self):
+        """ Take the training lock shared by every worker without waiting, False if another worker holds it """
+        if fcntl is None:
+            return True
+
+        os.makedirs(self.artifacts_path, exist_ok=True)
+        lock_file = open(os.path.join(self.artifacts_path, TRAINING_LOCK_FILE), 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _release_training_lock(self):
+        if self._lock_file is not None:
+            # closing the file releases the lock, as does the process exiting
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _schedule_retrain(self):
+        """
+        Start a scheduled retrain if the published artifacts are older than the retrain interval
+        and no other worker is training, returns the seconds left until the artifacts are due otherwise
+        """
+        with self._lock:
+            if not self._acquire_training_lock():
+                return None
+
+            # checked under the lock, a worker that just finished training has published fresh artifacts
+            latest_path = os.path.join(self.artifacts_path, 'LATEST')
+            age = time.time() - os.path.getmtime(latest_path) if os.path.exists(latest_path) else self.retrain_interval
+            if age < self.retrain_interval:
+                self._release_training_lock()
+                return self.retrain_interval - age
+            self._retrain_requested = True
+
+        self._start_retrain()
+        return None
+
+    def _start_retrain(self):
+        env = dict(os.environ)
+        env['RECOMMENDER_DATABASE_URI'] = self.app.config['SQLALCHEMY_DATABASE_URI']
+        env['RECOMMENDER_TRAINING_THREADS'] = str(self.training_threads)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [BACKEND_PATH, env.get('PYTHONPATH')]))
+        if self.training_threads:
+            # BLAS/OpenMP pools size themselves when the training process imports them
+            for variable in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+                env[variable] = str(self.training_threads)
+
+        with self._lock:
+            try:
+                self._process = subprocess.Popen([sys.executable, '-m', 'utils.recommender_retrainer'], env=env)
+            except Exception as e:
+                self._release_training_lock()
+                self.last_error = str(e)
+                print(f"Recommender retraining failed to start, keeping the current model: {e}")
+            finally:
+                self._retrain_requested = False
+
+    def _finish_retrain(self):
+        with self._lock:
+            returncode = self._process.returncode
+            self._process = None
+            self._release_training_lock()
+
+        if returncode == 0:
+            self.last_trained = time.time()
+            self.last_error = None
+            # swap the published model in right away, other workers pick it up at their next reload
+            self._reload()
+        else:
+            self.last_error = f"Training process exited with code {returncode}"
+            print(f"Recommender retraining failed, keeping the current model: {self.last_error}")
+
+    def _reload(self):
+        # a process that never served recommendations has no model to refresh and skips the ML imports
+        if 'utils.recommender_system' not in sys.modules:
+            return
+        from utils.recommender_system import reload_course_recommender
+
+        try:
+            with self.app.app_context():
+                if reload_course_recommender() is not None:
+                    # release the previous model as soon as no request references it
+                    gc.collect()
+        except Exception as e:
+            print(f"Recommender reload failed, keeping the current model: {e}")
+
+    def _apply_updates(self):
+        if 'utils.recommender_system' not in sys.modules:
+            return
+        from utils.recommender_system import apply_course_updates
+
+        try:
+            with self.app.app_context():
+                apply_course_updates()
+        except Exception as e:
+            print(f"Recommender course updates failed, retrying at the next check: {e}")
+
+_retrainer = None
+
+def start_recommender_retrainer(app):
+    """ Start the retrainer for this process """
+    global _retrainer
+    if _retrainer is None:
+        _retrainer = RecommenderRetrainer(app)
+    return _retrainer.start()
+
+def get_recommender_retrainer():
+    return _retrainer
+
+def request_recommender_update():
+    """ Replay committed course updates in this process' background thread, if it runs one """
+    if _retrainer is not None:
+        _retrainer.request_update()
+
+def train_and_publish(database_uri, training_threads=RECOMMENDER_TRAINING_THREADS):
+    """ Train a recommender from the database and publish its artifacts, in the training process """
+    from flask import Flask
+    from threadpoolctl import threadpool_limits
+    from database import init_db
+    from utils.recommender_system import publish_course_recommender, TwoTowerEngine
+
+    if training_threads and TwoTowerEngine is not None:
+        import torch
+        torch.set_num_threads(training_threads)
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    init_db(app)
+
+    with app.app_context(), threadpool_limits(limits=training_threads or None):
+        return publish_course_recommender(num_threads=training_threads)
+
+if __name__ == '__main__':
+    train_and_publish(os.environ['RECOMMENDER_DATABASE_URI'])
@@ -16,7 +16,7 @@
 # F1 Score
 
 # Ranking Quality Metrics
-# TODO: calculate these metrics for the open source systems by splitting the matrix into training and test sets
+# Computed offline on a train/test split of the interaction matrix by utils/recommender_benchmark.py
 # NDCG
 # MRR
 # MAP
@@ -38,24 +38,176 @@
 # 5. Use of ranking (review ratings as user-course interaction data)
 # 6. Use of embedding store (like Faiss)
 
+import os
+import json
+import shutil
+import joblib
+import threading
+from collections import OrderedDict
 import pandas as pd
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from scipy.sparse import csr_matrix
+from datetime import datetime
+from sklearn.preprocessing import normalize
+from scipy.sparse import csr_matrix, diags, save_npz, load_npz, issparse, hstack as sparse_hstack, vstack as sparse_vstack
 from implicit.als import AlternatingLeastSquares
 
+from sqlalchemy.orm import selectinload
+
 from database import create_session
-from models.course import Course
+from models.course import Course, STATUS as COURSE_STATUS
+from models.course_update import CourseUpdate
 from models.enrollment import Enrollment
 from utils.field_processor import FieldProcessor
+from utils.neighbor_index import NeighborIndex, DEFAULT_NEIGHBORS, DEFAULT_BLOCK_SIZE, top_k_rows
+from utils.embedding_index import EmbeddingIndex, APPROXIMATE_SEARCH_THRESHOLD
+from utils.sparse_features import SparseTextVectorizer
 from utils.generate_enrollments import generate_enrollments
+from utils.interactions import load_interactions
+from utils.recommendation_cache import get_recommendation_cache
+from utils.recommender_artifacts import RECOMMENDER_ARTIFACTS_PATH, RECOMMENDER_ARTIFACTS_FORMAT, get_latest_artifacts_version
+from utils.recommender_metrics import get_recommender_metrics
+
+try:
+    from utils.two_tower import TwoTowerEngine, TWO_TOWER_EPOCHS
+except ImportError: # optional, two-tower recommendations are unavailable without torch
+    TwoTowerEngine, TWO_TOWER_EPOCHS = None, 0
+
+FOLDED_USER_CACHE_SIZE = 10000
+HYBRID_CONTENT_WEIGHT = float(os.getenv('HYBRID_CONTENT_WEIGHT', 0.5))
+HYBRID_COLLABORATIVE_WEIGHT = float(os.getenv('HYBRID_COLLABORATIVE_WEIGHT', 0.5))
+SIMILARITY_FEATURES = os.getenv('SIMILARITY_FEATURES', 'embedding') # 'embedding' (Word2Vec) or 'sparse' (TF-IDF/BM25)
+SPARSE_TEXT_WEIGHTING = os.getenv('SPARSE_TEXT_WEIGHTING', 'bm25') # 'bm25' or 'tfidf', sparse features only
+TEXT_EMBEDDING_WEIGHTING = os.getenv('TEXT_EMBEDDING_WEIGHTING', 'mean') # 'mean' or 'tfidf' pooling of word vectors, embedding features only
+
+NUMERICAL_COLUMNS = ['duration', 'rating', 'price']
+CATEGORICAL_COLUMNS = [
+    'course_type', 'difficulty', 
+    'school_name', 'program_type', 
+    'field', 'major', 'department', 
+    'expertise', 'subject', 'platform'
+]
+OPTIONAL_CATEGORICAL_COLUMNS = [
+    'school_name', 'program_type', 'field', 'major', 'department',
+    'expertise', 'subject', 'platform'
+]
+TEXT_COLUMNS = ['name', 'description', 'skills']
+
+_recommender_lock = threading.Lock()
+recommender_metrics = get_recommender_metrics()
 
 def get_course_recommender():
-    if CourseRecommenderSingleton._instance is None:
-        CourseRecommenderSingleton._instance = CourseRecommenderSingleton()
-        CourseRecommenderSingleton._instance._initialize(create_session())
+    """ 
+    Get the course recommender for this process
+    Loads the latest artifacts lazily on first use, only trains if no artifacts exist
+    """
+    if CourseRecommenderSingleton._instance is None or not hasattr(CourseRecommenderSingleton._instance, "recommender"):
+        with _recommender_lock:
+            if CourseRecommenderSingleton._instance is None:
+                CourseRecommenderSingleton._instance = CourseRecommenderSingleton()
+            CourseRecommenderSingleton._instance._initialize(create_session())
     return CourseRecommenderSingleton._instance.get_instance()
 
+def publish_course_recommender(num_threads=0):
+    """ 
+    Retrain the course recommender from the database and publish new artifacts
+    Runs in the training process, workers swap the artifacts in with reload_course_recommender
+    """
+    print("Rebuilding recommender system...")
+    recommender = CourseRecommender.train(create_session(), num_threads=num_threads)
+    recommender.validate()
+    with recommender_metrics.stage('save_artifacts'):
+        recommender.save_artifacts()
+    prune_course_updates(recommender)
+    print(f"Recommender system published (version {recommender.version}).")
+    return recommender
+
+def reload_course_recommender():
+    """ 
+    Swap in the latest published artifacts if they are newer than the served recommender
+    Lets every worker pick up a model retrained by another process
+    """
+    latest_version = CourseRecommender.get_latest_artifacts_version()
+    instance = CourseRecommenderSingleton._instance
+    if latest_version is None or instance is None or not hasattr(instance, "recommender"):
+        return None
+    if instance.recommender.version == latest_version:
+        return None
+
+    with recommender_metrics.stage('load_artifacts'):
+        recommender = CourseRecommender.load_artifacts(create_session(), version=latest_version)
+    recommender.validate()
+    swap_course_recommender(recommender)
+    print(f"Recommender system reloaded (version {recommender.version}).")
+    return recommender
+
+def swap_course_recommender(recommender):
+    """ Atomically replace the recommender served by this process """
+    with _recommender_lock:
+        if CourseRecommenderSingleton._instance is None:
+            CourseRecommenderSingleton._instance = CourseRecommenderSingleton()
+        CourseRecommenderSingleton._instance._swap(recommender)
+    # cached rankings belong to the previous model
+    get_recommendation_cache().clear()
+    recommender.report_model_gauges()
+
+def apply_course_updates():
+    """ 
+    Patch the courses created or changed since the served recommender was built into it, without retraining
+    Replays the committed course update log, so every worker converges on the same courses
+    Only active courses are patched in, inactive ones are already excluded from the candidates
+    Returns the number of courses patched, a process that has not loaded a recommender skips
+    """
+    instance = CourseRecommenderSingleton._instance
+    if instance is None or not hasattr(instance, "recommender"):
+        return 0
+    recommender = instance.recommender
+
+    session = create_session()
+    try:
+        course_ids, last_update_id = CourseUpdate.get_updates_after(session, recommender.course_update_id)
+        if not course_ids:
+            return 0
+        courses = (
+            session.query(Course)
+            .options(selectinload(Course.skill_tags))
+            .filter(Course.id.in_(course_ids), Course.status == COURSE_STATUS.ACTIVE)
+            .all()
+        )
+        try:
+            recommender.upsert_courses(courses)
+        except Exception as e:
+            print(f"Failed to update recommender for courses {[course.id for course in courses]}, retrying one by one: {e}")
+            for course in courses:
+                try:
+                    recommender.upsert_course(course)
+                except Exception as e:
+                    # a stale recommendation is better than blocking the rest of the log
+                    print(f"Failed to update recommender for course {course.id}: {e}")
+        recommender.course_update_id = last_update_id
+    finally:
+        session.close()
+
+    if courses:
+        get_recommendation_cache().invalidate_channel()
+    return len(courses)
+
+def prune_course_updates(recommender):
+    """ Drop the logged course updates already included in a published recommender """
+    session = create_session()
+    try:
+        CourseUpdate.prune(session, recommender.course_update_id)
+        session.commit()
+    finally:
+        session.close()
+
+def ensure_course_recommender_artifacts():
+    """ Train and publish recommender artifacts only if none have been published yet """
+    if CourseRecommender.get_latest_artifacts_version() is None:
+        print("No recommender artifacts found, training recommender system...")
+        recommender = CourseRecommender.train(create_session())
+        recommender.save_artifacts()
+        prune_course_updates(recommender)
+
 class CourseRecommenderSingleton:
     _instance = None 
 
@@ -68,12 +220,21 @@ class CourseRecommenderSingleton:
         # HACK: initialize recommender system depending on type of recommendations
         if not hasattr(self, "recommender"):
             print("Initializing recommender system...")
-            self.recommender = CourseRecommender(session)
-            self.recommender.load_data()
-            self.recommender.preprocess_courses()
-            self.recommender.prepare_user_course_data()
-            self.recommender.train_implicit_recommendation_model()
-            print("Recommender system initialized.")
+            with recommender_metrics.stage('initialize'):
+                if CourseRecommender.get_latest_artifacts_version() is not None:
+                    with recommender_metrics.stage('load_artifacts'):
+                        self.recommender = CourseRecommender.load_artifacts(session)
+                else:
+                    self.recommender = CourseRecommender.train(session)
+                    with recommender_metrics.stage('save_artifacts'):
+                        self.recommender.save_artifacts()
+                    prune_course_updates(self.recommender)
+            self.recommender.report_model_gauges()
+            print(f"Recommender system initialized (version {self.recommender.version}).")
+
+    def _swap(self, recommender):
+        # a single attribute rebind; in-flight requests hold a reference to the previous recommender
+        self.recommender = recommender
 
     def get_instance(self):
         return self.recommender
@@ -86,14 +247,251 @@ class CourseRecommender:
         self.courses_df = None
         self.enrollments_df = None
 
-        self.similarity_matrix = None
+        self.item_features = None
+        self.similarity_weights = None
+        self.tfidf_weighting = TEXT_EMBEDDING_WEIGHTING == 'tfidf' # loaded artifacts keep the weighting they were trained with
+        self.text_idf = {}
+        self.feature_mode = SIMILARITY_FEATURES
+        self.text_vectorizers = {}
+        self.neighbor_index = None
+        self.search_index = None
+        self._update_lock = threading.Lock()
 
         self.interactions_matrix = None
         self.user_mapping = None
         self.course_mapping = None
         self.model = None
+        self.confidence_multiplier = None
+        self._reverse_course_mapping = None
+        self._catalog_item_indices = None
+        self._similarity_matrix = None
+        self._folded_users = OrderedDict()
+        self._folded_users_lock = threading.Lock()
+
+        self.two_tower = None
 
         self.field_processor = FieldProcessor()
+
+        self.version = None
+        self.course_update_id = 0 # last logged course update included in this recommender
+
+    @classmethod
+    def train(cls, session, num_threads=0, artifacts_path=RECOMMENDER_ARTIFACTS_PATH):
+        """ 
+        Train a new recommender from the database
+        num_threads caps text preprocessing processes, Word2Vec and ALS threads, 0 uses all cores
+        Texts preprocessed for the latest published artifacts are reused, keyed by content hash
+        """
+        recommender = cls(session)
+        if num_threads:
+            recommender.field_processor.preprocessing_workers = num_threads
+            recommender.field_processor.workers = num_threads
+        previous_version = cls.get_latest_artifacts_version(artifacts_path)
+        if previous_version is not None:
+            FieldProcessor.load_text_cache(os.path.join(artifacts_path, previous_version))
+        with recommender_metrics.stage('train'):
+            with recommender_metrics.stage('load_data'):
+                recommender.load_data()
+            with recommender_metrics.stage('preprocess_courses'):
+                recommender.preprocess_courses()
+            with recommender_metrics.stage('prepare_user_course_data'):
+                recommender.prepare_user_course_data()
+            with recommender_metrics.stage('als_training'):
+                recommender.train_implicit_recommendation_model(num_threads=num_threads)
+            with recommender_metrics.stage('two_tower_training'):
+                recommender.train_two_tower_model()
+        return recommender
+
+    def report_model_gauges(self):
+        """ Publish the size and version of this recommender to the metrics """
+        recommender_metrics.set_gauge('version', self.version)
+        recommender_metrics.set_gauge('n_courses', int(self.courses_df.shape[0]))
+        recommender_metrics.set_gauge('n_users', len(self.user_mapping))
+        recommender_metrics.set_gauge('two_tower', self.two_tower is not None)
+
+    def validate(self):
+        """ Sanity check trained state before it is published or served """
+        n_courses = self.courses_df.shape[0]
+        if n_courses == 0:
+            raise ValueError("Recommender has no courses")
+        if len(self.neighbor_index) != n_courses or self.item_features.shape[0] != n_courses:
+            raise ValueError("Recommender neighbor index does not match the course catalog")
+        if not np.all(np.isfinite(self.neighbor_index.scores)):
+            raise ValueError("Recommender neighbor scores are not finite")
+
+        user_factors = self._to_numpy(self.model.user_factors)
+        item_factors = self._to_numpy(self.model.item_factors)
+        if user_factors.shape[0] != self.interactions_matrix.shape[0] or item_factors.shape[0] != self.interactions_matrix.shape[1]:
+            raise ValueError("Recommender factors do not match the interactions matrix")
+        if not (np.all(np.isfinite(user_factors)) and np.all(np.isfinite(item_factors))):
+            raise ValueError("Recommender factors are not finite")
+
+        if self.two_tower is not None:
+            course_vectors = self.two_tower.course_index.vectors
+            if course_vectors.shape[0] != n_courses:
+                raise ValueError("Recommender two-tower vectors do not match the course catalog")
+            if not np.all(np.isfinite(course_vectors)):
+                raise ValueError("Recommender two-tower vectors are not finite")
+
+    @staticmethod
+    def get_latest_artifacts_version(artifacts_path=RECOMMENDER_ARTIFACTS_PATH):
+        """ Get the version named by the LATEST pointer, None if nothing has been published """
+        return get_latest_artifacts_version(artifacts_path)
+
+    def save_artifacts(self, artifacts_path=RECOMMENDER_ARTIFACTS_PATH, keep_versions=3):
+        """ 
+        Save trained state as a new artifacts version and point LATEST to it
+        The version directory is written completely before LATEST is swapped,
+        so workers never observe a partially written model
+        """
+        version = datetime.now().strftime('%Y%m%d%H%M%S%f')
+        version_path = os.path.join(artifacts_path, version)
+        staging_path = version_path + '.tmp'
+        os.makedirs(staging_path, exist_ok=True)
+
+        # content-based state
+        self.courses_df.to_pickle(os.path.join(staging_path, 'courses.pkl'))
+        self.neighbor_index.save(staging_path)
+        if self.feature_mode == 'sparse':
+            save_npz(os.path.join(staging_path, 'item_features.npz'), self.item_features)
+            joblib.dump(self.text_vectorizers, os.path.join(staging_path, 'text_vectorizers.joblib'))
+        else:
+            np.save(os.path.join(staging_path, 'item_features.npy'), self.item_features)
+        with open(os.path.join(staging_path, 'similarity_weights.json'), 'w') as file:
+            json.dump(self.similarity_weights, file)
+        if self.tfidf_weighting and self.text_idf:
+            np.savez(os.path.join(staging_path, 'text_idf.npz'), **self.text_idf)
+        self.field_processor.save_state(staging_path)
+        self.field_processor.save_text_cache(staging_path, self.courses_df, TEXT_COLUMNS)
+
+        # collaborative state
+        save_npz(os.path.join(staging_path, 'interactions.npz'), self.interactions_matrix.tocsr())
+        np.save(os.path.join(staging_path, 'user_factors.npy'), self._to_numpy(self.model.user_factors))
+        np.save(os.path.join(staging_path, 'item_factors.npy'), self._to_numpy(self.model.item_factors))
+        with open(os.path.join(staging_path, 'mappings.json'), 'w') as file:
+            json.dump({
+                'users': [[self._to_builtin(k), int(v)] for k, v in self.user_mapping.items()],
+                'courses': [[self._to_builtin(k), int(v)] for k, v in self.course_mapping.items()],
+            }, file)
+
+        # two-tower state
+        if self.two_tower is not None:
+            self.two_tower.save(staging_path)
+
+        with open(os.path.join(staging_path, 'manifest.json'), 'w') as file:
+            json.dump({
+                'format': RECOMMENDER_ARTIFACTS_FORMAT,
+                'version': version,
+                'created': datetime.now().isoformat(),
+                'n_courses': int(self.courses_df.shape[0]),
+                'n_users': len(self.user_mapping),
+                'course_update_id': int(self.course_update_id),
+                'features': self.feature_mode,
+                'text_weighting': 'tfidf' if self.tfidf_weighting else 'mean',
+                'model': {
+                    'factors': int(self.model.factors),
+                    'iterations': int(self.model.iterations),
+                    'alpha': float(self.model.alpha),
+                    'confidence_multiplier': float(self.confidence_multiplier),
+                },
+                'two_tower': self.two_tower.stats if self.two_tower is not None else None,
+            }, file)
+
+        os.replace(staging_path, version_path)
+
+        latest_tmp_path = os.path.join(artifacts_path, 'LATEST.tmp')
+        with open(latest_tmp_path, 'w') as file:
+            file.write(version)
+        os.replace(latest_tmp_path, os.path.join(artifacts_path, 'LATEST'))
+
+        self.version = version
+        self._prune_artifacts(artifacts_path, keep_versions)
+
+        return version_path
+
+    @classmethod
+    def load_artifacts(cls, session, version=None, artifacts_path=RECOMMENDER_ARTIFACTS_PATH, mmap_mode='r'):
+        """ 
+        Load a recommender from saved artifacts without retraining
+        Large arrays are memory-mapped so that workers share pages through the OS cache
+        """
+        if version is None:
+            version = cls.get_latest_artifacts_version(artifacts_path)
+            if version is None:
+                raise ValueError("No recommender artifacts found")
+        version_path = os.path.join(artifacts_path, version)
+
+        with open(os.path.join(version_path, 'manifest.json'), 'r') as file:
+            manifest = json.load(file)
+        if manifest['format'] != RECOMMENDER_ARTIFACTS_FORMAT:
+            raise ValueError(f"Unsupported recommender artifacts format: {manifest['format']}")
+
+        recommender = cls(session)
+        recommender.version = manifest['version']
+        recommender.course_update_id = manifest.get('course_update_id', 0)
+
+        # content-based state
+        recommender.courses_df = pd.read_pickle(os.path.join(version_path, 'courses.pkl'))
+        recommender.neighbor_index = NeighborIndex.load(version_path, mmap_mode=mmap_mode)
+        recommender.feature_mode = manifest.get('features', 'embedding')
+        if recommender.feature_mode == 'sparse':
+            recommender.item_features = load_npz(os.path.join(version_path, 'item_features.npz')).tocsr()
+            recommender.text_vectorizers = joblib.load(os.path.join(version_path, 'text_vectorizers.joblib'))
+        else:
+            recommender.item_features = np.load(os.path.join(version_path, 'item_features.npy'), mmap_mode=mmap_mode)
+        with open(os.path.join(version_path, 'similarity_weights.json'), 'r') as file:
+            recommender.similarity_weights = json.load(file)
+        text_idf_path = os.path.join(version_path, 'text_idf.npz')
+        recommender.tfidf_weighting = os.path.exists(text_idf_path)
+        if recommender.tfidf_weighting:
+            with np.load(text_idf_path) as text_idf:
+                recommender.text_idf = {field: text_idf[field] for field in text_idf.files}
+        recommender.field_processor.load_state(version_path, mmap=mmap_mode)
+        recommender.search_index = recommender.build_search_index()
+
+        # collaborative state
+        recommender.interactions_matrix = load_npz(os.path.join(version_path, 'interactions.npz')).tocsr()
+        with open(os.path.join(version_path, 'mappings.json'), 'r') as file:
+            mappings = json.load(file)
+        recommender.user_mapping = {k: v for k, v in mappings['users']}
+        recommender.course_mapping = {k: v for k, v in mappings['courses']}
+
+        # ALS factors are small, load them fully since implicit writes into its factor arrays
+        model = AlternatingLeastSquares(
+            factors=manifest['model']['factors'],
+            iterations=manifest['model']['iterations'],
+            alpha=manifest['model']['alpha']
+        )
+        model.user_factors = np.load(os.path.join(version_path, 'user_factors.npy'))
+        model.item_factors = np.load(os.path.join(version_path, 'item_factors.npy'))
+        recommender.model = model
+        recommender.confidence_multiplier = manifest['model']['confidence_multiplier']
+
+        # two-tower state, skipped when it was not trained or torch is not installed
+        if TwoTowerEngine is not None and os.path.exists(os.path.join(version_path, 'two_tower.pt')):
+            recommender.two_tower = TwoTowerEngine.load(version_path, recommender.item_features, mmap_mode=mmap_mode)
+
+        return recommender
+
+    @staticmethod
+    def _prune_artifacts(artifacts_path, keep_versions):
+        """ Remove old artifacts versions, keeping the most recent ones """
+        versions = sorted(
+            name for name in os.listdir(artifacts_path)
+            if os.path.isdir(os.path.join(artifacts_path, name)) and not name.endswith('.tmp')
+        )
+        for version in versions[:-keep_versions]:
+            shutil.rmtree(os.path.join(artifacts_path, version), ignore_errors=True)
+
+    @staticmethod
+    def _to_numpy(factors):
+        """ Convert implicit factors to a numpy array (GPU models return device arrays) """
+        return factors.to_numpy() if hasattr(factors, 'to_numpy') else np.asarray(factors)
+
+    @staticmethod
+    def _to_builtin(value):
+        """ Convert numpy scalars to JSON serializable python values """
+        return value.item() if isinstance(value, np.generic) else value
     
     def _handle_null_numeric(self, value, default_strategy='zero'):
         """ Handle null numeric values """
@@ -122,35 +520,14 @@ class CourseRecommender:
     
     def load_courses(self):
         """ Load courses into pandas DataFrame """
+        # updates logged from here on may be missing from the loaded courses and are replayed after load
+        self.course_update_id = CourseUpdate.get_last_update_id(self.session)
+
         # Query all courses from database
-        courses = self.session.query(Course).all()
+        courses = self.session.query(Course).options(selectinload(Course.skill_tags)).all()
 
         # Convert to DataFrame
-        self.courses_df = pd.DataFrame([
-            {
-                # Common course fields
-                'course_id': course.id, # primary key
-                'name': course.name, # embeddings
-                'description': course.description, # embeddings
-                'course_type': course.course_type, # one-hot encoded
-                'duration': float(course.duration), # scaled
-                'rating': float(course.rating), # scaled
-                'price': float(course.price), # scaled
-                'difficulty': course.difficulty, # one-hot encoded
-                'skills': course.skills, # embeddings
-
-                # Course-type specific features
-                'school_name': getattr(course, 'school_name', None),
-                'program_type': getattr(course, 'program_type', None),
-                'field': getattr(course, 'field', None),
-                'major': getattr(course, 'major', None),
-                'department': getattr(course, 'department', None),
-                'expertise': getattr(course, 'expertise', None),
-                'subject': getattr(course, 'subject', None),
-                'platform': getattr(course, 'platform', None),
-            }
-            for course in courses
-        ])
+        self.courses_df = pd.DataFrame([self._course_to_record(course) for course in courses])
 
         # handle nulls in numeric columns
         numeric_columns = []
@@ -161,11 +538,7 @@ class CourseRecommender:
             )
 
         # handle nulls in optional categorical columns
-        categorical_columns = [
-            'school_name', 'program_type', 'field', 'major', 'department',
-            'expertise', 'subject', 'platform'
-        ]
-        for column in categorical_columns:
+        for column in OPTIONAL_CATEGORICAL_COLUMNS:
             self.current_column = column
             self.courses_df[column] = self.courses_df[column].apply(
                 lambda x: self._handle_null_categorical(x, default_strategy='unknown')
@@ -173,119 +546,141 @@ class CourseRecommender:
 
         self.session.close()
     
+    @staticmethod
+    def _course_to_record(course):
+        """ Convert a course into a courses_df row """
+        return {
+            # Common course fields
+            'course_id': course.id, # primary key
+            'name': course.name, # embeddings
+            'description': course.description, # embeddings
+            'course_type': str(course.course_type), # one-hot encoded
+            'duration': float(course.duration or 0), # scaled
+            'rating': float(course.rating or 0), # scaled
+            'price': float(course.price or 0), # scaled
+            'difficulty': str(course.difficulty), # one-hot encoded
+            'skills': ', '.join(skill.name for skill in course.skill_tags), # embeddings, from the normalized skills
+
+            # Course-type specific features
+            'school_name': getattr(course, 'school_name', None),
+            'program_type': getattr(course, 'program_type', None),
+            'field': getattr(course, 'field', None),
+            'major': getattr(course, 'major', None),
+            'department': getattr(course, 'department', None),
+            'expertise': getattr(course, 'expertise', None),
+            'subject': getattr(course, 'subject', None),
+            'platform': getattr(course, 'platform', None),
+        }
+
     def load_enrollments(self):
         """ 
-        Load user-course enrollments into pandas DataFrame
-        Interactions are binary (enrolled or not enrolled)
+        Load user-course interactions into pandas DataFrame
+        Enrollments, favourites, completed lessons and reviews are streamed from the database
+        and summed into one confidence weight per user and course
         """
-        # Query all enrollments from database
-        # enrollments = self.session.query(Enrollment).all()
-
-        # Convert to DataFrame
-        # self.enrollments_df = pd.DataFrame([
-        #     {
-        #         'user_id': enrollment.user_id,
-        #         'course_id': enrollment.course_id,
-        #     }
-        #     for enrollment in enrollments
-        # ])
+        self.enrollments_df = load_interactions(self.session)
 
-        # HACK: use generated enrollments due to lack of user data
-        self.enrollments_df = generate_enrollments()
+        if self.enrollments_df.empty:
+            # HACK: use generated enrollments while there is no user data
+            print("No user interactions found, training on generated enrollments")
+            self.enrollments_df = generate_enrollments(courses_df=self.courses_df)
 
         self.session.close()
     
-    def preprocess_courses(self):
+    def preprocess_courses(self, n_neighbors=DEFAULT_NEIGHBORS, block_size=DEFAULT_BLOCK_SIZE):
         """ Preprocess course data """
         dummy_courses_df = self.courses_df.copy()
 
-        numerical_columns = ['duration', 'rating', 'price']
-        categorical_columns = [
-            'course_type', 'difficulty', 
-            'school_name', 'program_type', 
-            'field', 'major', 'department', 
-            'expertise', 'subject', 'platform'
-        ]
-        text_columns = ['name', 'description', 'skills']
-
-        preprocessed_df = self.field_processor.execute_field_processing_pipeline(
-            df=dummy_courses_df,
-            numerical_columns=numerical_columns,
-            categorical_columns=categorical_columns,
-            text_columns=text_columns
-        )
-
-        # Export preprocessed DataFrame to CSV
-        preprocessed_df.to_csv('data/preprocessed_courses.csv', index=False)
+        with recommender_metrics.stage('field_processing'):
+            preprocessed_df = self.field_processor.execute_field_processing_pipeline(
+                df=dummy_courses_df,
+                numerical_columns=NUMERICAL_COLUMNS,
+                categorical_columns=CATEGORICAL_COLUMNS,
+                text_columns=TEXT_COLUMNS
+            )
 
-        # train text embeddings
-        self.field_processor.train_text_embeddings(preprocessed_df)
+        # train text embeddings, sparse features weigh the tokens themselves
+        if self.feature_mode != 'sparse':
+            with recommender_metrics.stage('word2vec_training'):
+                self.field_processor.train_text_embeddings(preprocessed_df)
 
         # generate course features
-        feature_matrices = self.extract_course_features(preprocessed_df)
+        with recommender_metrics.stage('feature_extraction'):
+            feature_matrices = self.extract_course_features(preprocessed_df)
 
-        # compute item similarity matrix
-        self.similarity_matrix = self.compute_item_similarity(feature_matrices)
+        # compute item similarity and keep only the top neighbors per course
+        with recommender_metrics.stage('similarity'):
+            self.neighbor_index = self.compute_item_similarity(
+                feature_matrices,
+                n_neighbors=n_neighbors,
+                block_size=block_size
+            )
+            self.search_index = self.build_search_index()
 
         return {
             'original_courses_df': self.courses_df,
             'preprocessed_df': preprocessed_df,
             'feature_matrices': feature_matrices,
-            'similarity_matrix': self.similarity_matrix
+            'neighbor_index': self.neighbor_index
         }
 
-    def _get_text_embedding(self, text, embedding_type, embedding_model):
-        """ Get embeddings for text """
-        tokens = text.split() if isinstance(text, str) else text
-
-        embeddings = []
-        for token in tokens:
-            try:
-                if embedding_type == 'name':
-                    embedding = embedding_model[token]
-                    embeddings.append(embedding)
-                elif embedding_type == 'description':
-                    embedding = embedding_model[token]
-                    embeddings.append(embedding)
-                elif embedding_type == 'skills':
-                    embedding = embedding_model[token]
-                    embeddings.append(embedding)
-            except KeyError:
-                continue
-        
-        return np.mean(embeddings, axis=0) if embeddings else np.zeros(embedding_model.vector_size)
+    @staticmethod
+    def _tokenize_text_column(column):
+        """ Split preprocessed text into tokens, lists (skills) are already tokens """
+        return [
+            value.split() if isinstance(value, str) else (value if isinstance(value, list) else [])
+            for value in column
+        ]
 
-    def extract_course_features(self, preprocessed_df):
-        """ Engineer features for courses for item-to-item recommendations """
-        # get numerical features
-        numerical_features = preprocessed_df[['duration', 'rating', 'price']].values
+    def _build_token_weight_matrix(self, token_lists, embedding_model, field, fit=True):
+        """ 
+        Build a sparse course x vocabulary weight matrix whose rows sum to 1
+        Tokens are mapped to vocabulary indices in one pass, out-of-vocabulary tokens are dropped
+        With TF-IDF weighting the idf is learned on fit and reused for new courses
+        """
+        lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int64, count=len(token_lists))
+        flat_tokens = pd.Series([token for tokens in token_lists for token in tokens], dtype=object)
+        token_indices = flat_tokens.map(embedding_model.key_to_index).to_numpy(dtype=np.float64, na_value=-1)
 
-        # extract text embeddings
-        name_embeddings = preprocessed_df['name'].apply(
-            lambda x: self._get_text_embedding(
-                x,
-                embedding_type='name',
-                embedding_model=self.field_processor.name_embeddings
-            )
-        )
-        description_embeddings = preprocessed_df['description'].apply(
-            lambda x: self._get_text_embedding(
-                x,
-                embedding_type='description',
-                embedding_model=self.field_processor.description_embeddings
-            )
-        )
-        skills_embeddings = preprocessed_df['skills'].apply(
-            lambda x: self._get_text_embedding(
-                x,
-                embedding_type='skills',
-                embedding_model=self.field_processor.skill_embeddings
-            )
+        rows = np.repeat(np.arange(len(token_lists)), lengths)
+        found = token_indices >= 0
+        counts = csr_matrix(
+            (np.ones(found.sum(), dtype=np.float32), (rows[found], token_indices[found].astype(np.int64))),
+            shape=(len(token_lists), len(embedding_model.key_to_index))
+        ) # duplicate entries are summed into term counts
+
+        if self.tfidf_weighting:
+            if fit:
+                document_frequency = np.bincount(counts.indices, minlength=counts.shape[1])
+                self.text_idf[field] = (np.log((1 + counts.shape[0]) / (1 + document_frequency)) + 1).astype(np.float32)
+            counts = counts.multiply(self.text_idf[field][np.newaxis, :]).tocsr()
+
+        row_totals = np.asarray(counts.sum(axis=1)).ravel()
+        row_totals[row_totals == 0] = 1 # courses without known tokens embed to zeros
+        return (diags(1 / row_totals) @ counts).astype(np.float32)
+
+    def _get_text_embeddings(self, column, embedding_model, field, fit=True):
+        """ Mean-pool token embeddings for a whole column with one sparse-dense product """
+        weights = self._build_token_weight_matrix(
+            self._tokenize_text_column(column), embedding_model, field, fit=fit
         )
+        return np.asarray(weights @ embedding_model.vectors, dtype=np.float32)
 
-        name_embedding_matrix = np.vstack(name_embeddings.values)
-        description_embedding_matrix = np.vstack(description_embeddings.values)
-        skills_embedding_matrix = np.vstack(skills_embeddings.values)
+    def _get_sparse_text_features(self, column, field, fit=True):
+        """ TF-IDF/BM25 weighted course x vocabulary matrix of a text column, the vectorizer is learned on fit """
+        token_lists = self._tokenize_text_column(column)
+        if fit:
+            self.text_vectorizers[field] = SparseTextVectorizer(weighting=SPARSE_TEXT_WEIGHTING)
+            return self.text_vectorizers[field].fit_transform(token_lists)
+        return self.text_vectorizers[field].transform(token_lists)
+
+    def extract_course_features(self, preprocessed_df, fit=True):
+        """ 
+        Engineer features for courses for item-to-item recommendations
+        Sparse features keep text and categorical groups as CSR matrices, embedding features are dense
+        """
+        # get numerical features
+        numerical_features = preprocessed_df[['duration', 'rating', 'price']].values
 
         # get categorical features
         categorical_columns = [col for col in preprocessed_df.columns 
@@ -295,9 +690,29 @@ class CourseRecommender:
                                       'field_', 'major_', 'department_', 
                                       'expertise_', 'subject_', 'platform_'
                                ))]
-        categorical_features = preprocessed_df[categorical_columns].values
+        categorical_features = self.field_processor.get_categorical_matrix(preprocessed_df, categorical_columns)
+
+        if self.feature_mode == 'sparse':
+            name_embedding_matrix = self._get_sparse_text_features(preprocessed_df['name'], 'name', fit=fit)
+            description_embedding_matrix = self._get_sparse_text_features(preprocessed_df['description'], 'description', fit=fit)
+            skills_embedding_matrix = self._get_sparse_text_features(preprocessed_df['skills'], 'skills', fit=fit)
+            numerical_features = csr_matrix(numerical_features.astype(np.float32))
+            stack = sparse_hstack
+        else:
+            # extract text embeddings
+            name_embedding_matrix = self._get_text_embeddings(
+                preprocessed_df['name'], self.field_processor.name_embeddings, 'name', fit=fit
+            )
+            description_embedding_matrix = self._get_text_embeddings(
+                preprocessed_df['description'], self.field_processor.description_embeddings, 'description', fit=fit
+            )
+            skills_embedding_matrix = self._get_text_embeddings(
+                preprocessed_df['skills'], self.field_processor.skill_embeddings, 'skills', fit=fit
+            )
+            categorical_features = categorical_features.toarray()
+            stack = np.hstack
 
-        combined_embedding_matrix = np.hstack([
+        combined_embedding_matrix = stack([
             name_embedding_matrix,
             description_embedding_matrix, 
             skills_embedding_matrix,
@@ -314,55 +729,243 @@ class CourseRecommender:
             'categorical_features': categorical_features
         }
     
-    # HACK: Consider using difference distance metrics such as TF-IDF, BM25, etc.
-    def compute_item_similarity(self, feature_matrices, weights=None):
+    def compute_item_similarity(
+        self,
+        feature_matrices,
+        weights=None,
+        n_neighbors=DEFAULT_NEIGHBORS,
+        block_size=DEFAULT_BLOCK_SIZE
+    ):
         """
-        Compute item similarity matrix
+        Compute item similarity as a top-K neighbor index
         Weights are customizable for different features
+
+        The weighted sum of per-feature cosine similarities equals the dot product of
+        the L2-normalized feature groups scaled by sqrt(weight) and concatenated,
+        so each row block needs a single float32 matmul and the N x N matrix is never built.
+        Sparse TF-IDF/BM25 features are scored with sparse-sparse products per block instead.
+        Peak memory is bounded by block_size x N scores.
         """
+        self.item_features = self.build_item_features(feature_matrices, weights)
+
+        build_index = NeighborIndex.from_sparse_features if issparse(self.item_features) else NeighborIndex.from_features
+        return build_index(
+            self.item_features,
+            row_ids=self.courses_df['course_id'].values,
+            k=n_neighbors,
+            block_size=block_size
+        )
+
+    def build_item_features(self, feature_matrices, weights=None):
+        """ Normalize each feature group once and combine them into weighted float32 item vectors """
         if weights is None:
-            weights = {
+            weights = self.similarity_weights or {
                 'name': 0.3,
                 'description': 0.1,
                 'skills': 0.3,
                 'numerical': 0.15,
                 'categorical': 0.15
             }
-        
-        # Compute individual similarity matrices through cosine similarity
-        name_sim = cosine_similarity(feature_matrices['name_embeddings'])
-        desc_sim = cosine_similarity(feature_matrices['description_embeddings'])
-        skills_sim = cosine_similarity(feature_matrices['skills_embeddings'])
-        numerical_sim = cosine_similarity(feature_matrices['numerical_features'])
-        categorical_sim = cosine_similarity(feature_matrices['categorical_features'])
-        
-        # Combine similarities with weights
-        weighted_sim = (
-            weights['name'] * name_sim +
-            weights['description'] * desc_sim +
-            weights['skills'] * skills_sim +
-            weights['numerical'] * numerical_sim +
-            weights['categorical'] * categorical_sim
-        )
-        
-        return weighted_sim
+        self.similarity_weights = weights
+
+        feature_groups = [
+            ('name', feature_matrices['name_embeddings']),
+            ('description', feature_matrices['description_embeddings']),
+            ('skills', feature_matrices['skills_embeddings']),
+            ('numerical', feature_matrices['numerical_features']),
+            ('categorical', feature_matrices['categorical_features']),
+        ]
+
+        # zero vectors stay zero, matching cosine_similarity
+        if any(issparse(matrix) for _, matrix in feature_groups):
+            return sparse_hstack([
+                np.sqrt(weights[group]) * normalize(csr_matrix(matrix, dtype=np.float32))
+                for group, matrix in feature_groups
+            ], format='csr', dtype=np.float32)
+
+        return np.hstack([
+            np.sqrt(weights[group]) * normalize(np.asarray(matrix, dtype=np.float32))
+            for group, matrix in feature_groups
+        ]).astype(np.float32)
     
+    def upsert_course(self, course):
+        """ Add a new course or refresh an edited one without retraining, see upsert_courses """
+        self.upsert_courses([course])
+
+    @recommender_metrics.timed_query('upsert_course')
+    def upsert_courses(self, courses):
+        """
+        Add new courses or refresh edited ones without retraining
+        The courses are embedded with the fitted scaler, encoder and text vocabularies,
+        scored against the whole catalog in one product and patched into the neighbor lists,
+        so the served arrays are copied once per batch rather than once per course
+        """
+        courses = list({course.id: course for course in courses}.values())
+        if not courses:
+            return
+        course_ids = [course.id for course in courses]
+        records = [self._course_to_record(course) for course in courses]
+        course_df = pd.DataFrame(records)
+        for column in OPTIONAL_CATEGORICAL_COLUMNS:
+            course_df[column] = course_df[column].fillna('unknown')
+
+        preprocessed_df = self.field_processor.execute_field_processing_pipeline(
+            df=course_df.copy(),
+            numerical_columns=NUMERICAL_COLUMNS,
+            categorical_columns=CATEGORICAL_COLUMNS,
+            text_columns=TEXT_COLUMNS,
+            fit=False
+        )
+        feature_matrices = self.extract_course_features(preprocessed_df, fit=False)
+        course_features = self.build_item_features(feature_matrices)
+
+        sparse = issparse(course_features)
+        with self._update_lock:
+            n_courses = len(self.neighbor_index)
+            existing = [self.neighbor_index.id_to_row.get(course_id) for course_id in course_ids]
+            n_new = sum(row is None for row in existing)
+
+            # every row in catalog order, edited rows taken from the batch and new rows appended
+            order = np.arange(n_courses + n_new)
+            next_row = n_courses
+            for position, row in enumerate(existing):
+                if row is None:
+                    order[next_row] = n_courses + position
+                    next_row += 1
+                else:
+                    order[row] = n_courses + position
+            if sparse:
+                item_features = sparse_vstack([self.item_features, course_features], format='csr')[order]
+            else:
+                item_features = np.vstack([self.item_features, course_features])[order]
+
+            existing_mask = np.array([row is not None for row in existing])
+            courses_df = self.courses_df.copy()
+            for position in np.flatnonzero(existing_mask):
+                courses_df.loc[courses_df['course_id'] == course_ids[position], list(records[position].keys())] = course_df.values[position]
+            courses_df = pd.concat([courses_df, course_df[~existing_mask]], ignore_index=True)
+
+            # similarity of each course against the whole catalog, itself included
+            search_dimensions = self._get_search_dimensions()
+            if sparse:
+                rows_scores = (course_features @ item_features.T).toarray()
+                search_vectors = course_features[:, :search_dimensions].toarray()
+            else:
+                rows_scores = course_features @ item_features.T
+                search_vectors = course_features[:, :search_dimensions]
+
+            # swap in the new state; readers see either the old or the new index
+            self.neighbor_index = self.neighbor_index.with_rows(course_ids, rows_scores)
+            self.search_index = self.search_index.with_rows(course_ids, search_vectors, vectors=item_features[:, :search_dimensions])
+            if self.two_tower is not None:
+                self.two_tower = self.two_tower.with_courses(course_ids, course_features)
+            self.item_features = item_features
+            self.courses_df = courses_df
+
+    def _get_search_dimensions(self):
+        """ Width of the name, description and skills groups at the start of the item vectors """
+        if self.feature_mode == 'sparse':
+            return sum(len(self.text_vectorizers[field]) for field in ('name', 'description', 'skills'))
+        return sum(
+            embedding_model.vector_size
+            for embedding_model in (
+                self.field_processor.name_embeddings,
+                self.field_processor.description_embeddings,
+                self.field_processor.skill_embeddings
+            )
+        )
+
+    def build_search_index(self):
+        """
+        Build the semantic search index over the text groups of the item vectors
+        The vectors are a view of item_features, so the index adds no copy for exact search
+        Sparse vectors are always searched exactly, a sparse product only touches the query's terms
+        """
+        return EmbeddingIndex(
+            self.courses_df['course_id'].values,
+            self.item_features[:, :self._get_search_dimensions()],
+            approximate_threshold=np.inf if issparse(self.item_features) else APPROXIMATE_SEARCH_THRESHOLD
+        )
+
+    def embed_search_query(self, query):
+        """
+        Embed a search query with the name, description and skill vocabularies
+        Each field is normalized and weighted like the item vectors, so a query scores
+        courses by the weighted cosine similarity of their text fields
+        Returns None when no query token is in any vocabulary
+        """
+        tokens = self.field_processor.preprocess_name(query).split()
+        if self.feature_mode == 'sparse':
+            # skills are whole phrases in the skills vocabulary, the query may name one
+            field_tokens = {'name': tokens, 'description': tokens, 'skills': tokens + [' '.join(tokens)]}
+            query_vector = sparse_hstack([
+                np.sqrt(self.similarity_weights[field]) * normalize(
+                    self.text_vectorizers[field].transform([field_tokens[field]])
+                )
+                for field in ('name', 'description', 'skills')
+            ], format='csr').toarray()[0].astype(np.float32)
+            return query_vector if np.any(query_vector) else None
+
+        fields = [
+            ('name', self.field_processor.name_embeddings),
+            ('description', self.field_processor.description_embeddings),
+            ('skills', self.field_processor.skill_embeddings),
+        ]
+
+        query_vector = np.hstack([
+            np.sqrt(self.similarity_weights[field]) * normalize(
+                self._get_text_embeddings([tokens], embedding_model, field, fit=False)
+            )[0]
+            for field, embedding_model in fields
+        ]).astype(np.float32)
+
+        if not np.any(query_vector):
+            return None
+        return query_vector
+
+    @recommender_metrics.timed_query('search')
+    def search_courses(self, query, top_n=10, course_ids=None, min_similarity=0.05):
+        """
+        Get the course ids most similar to a free text query, best first
+        course_ids restricts the search to a set of courses, e.g. the active courses in a channel
+        Returns None when the query cannot be embedded, so callers can fall back to keyword search
+        """
+        query_vector = self.embed_search_query(query)
+        if query_vector is None:
+            return None
+
+        matched_course_ids, _ = self.search_index.search(
+            query_vector,
+            top_k=top_n,
+            candidate_ids=course_ids,
+            min_score=min_similarity
+        )
+        return [self._to_builtin(course_id) for course_id in matched_course_ids]
+
     def prepare_user_course_data(self):
-        """ Prepare user-course data for collaborative filtering """
+        """ 
+        Prepare user-course data for collaborative filtering
+        Ids are factorized in order of first appearance; index 0 is a padding row and column
+        Interactions without a weight column count once, repeated pairs are summed
+        """
+        user_codes, user_ids = pd.factorize(self.enrollments_df['user_id'])
+        course_codes, course_ids = pd.factorize(self.enrollments_df['course_id'])
+
         # create unique mappings for user and course IDs
-        self.user_mapping = {user_id: idx + 1 for idx, user_id in enumerate(self.enrollments_df['user_id'].unique())}
-        self.course_mapping = {course_id: idx + 1 for idx, course_id in enumerate(self.enrollments_df['course_id'].unique())}
+        self.user_mapping = dict(zip(user_ids.tolist(), range(1, len(user_ids) + 1)))
+        self.course_mapping = dict(zip(course_ids.tolist(), range(1, len(course_ids) + 1)))
 
-        # map user and course IDs to integer indices
-        user_indices = [self.user_mapping[user_id] for user_id in self.enrollments_df['user_id']]
-        course_indices = [self.course_mapping[course_id] for course_id in self.enrollments_df['course_id']]
+        if 'weight' in self.enrollments_df:
+            weights = self.enrollments_df['weight'].to_numpy(dtype=np.float32)
+        else:
+            weights = np.ones(len(self.enrollments_df), dtype=np.float32)
 
         # create sparse matrix for user-course interactions
         self.interactions_matrix = csr_matrix(
-            (np.ones(self.enrollments_df.shape[0]),
-             (user_indices, course_indices)),
-            shape=(len(self.user_mapping) + 1, len(self.course_mapping) + 1)
+            (weights, (user_codes + 1, course_codes + 1)),
+            shape=(len(user_ids) + 1, len(course_ids) + 1)
         )
+        self.interactions_matrix.sum_duplicates()
 
         return self.interactions_matrix, self.user_mapping, self.course_mapping
     
@@ -370,7 +973,8 @@ class CourseRecommender:
         self,
         factors=50,
         iterations=50,
-        confidence_multiplier=40
+        confidence_multiplier=40,
+        num_threads=0
     ):
         """
         Train recommendation model through implicit
@@ -379,48 +983,74 @@ class CourseRecommender:
         model = AlternatingLeastSquares(
             factors=factors,
             iterations=iterations,
-            alpha=confidence_multiplier
+            alpha=confidence_multiplier,
+            num_threads=num_threads
         )
         model.fit(confidence_multiplier * self.interactions_matrix)
         
         self.model = model
+        self.confidence_multiplier = confidence_multiplier
+        self._reverse_course_mapping = None
+        self._catalog_item_indices = None
+        self._folded_users.clear()
 
         return self.model
+
+    def train_two_tower_model(self, epochs=TWO_TOWER_EPOCHS):
+        """ 
+        Train the two-tower model on the interactions over the content item vectors
+        Skipped when torch is not installed, epochs is 0 or the item features are sparse
+        """
+        if TwoTowerEngine is None or not epochs or self.feature_mode == 'sparse':
+            # the course tower needs dense content vectors
+            self.two_tower = None
+            return None
+
+        self.two_tower = TwoTowerEngine.train(
+            self.courses_df['course_id'].values,
+            self.item_features,
+            self.enrollments_df,
+            epochs=epochs
+        )
+        return self.two_tower
     
+    @recommender_metrics.timed_query('item_to_item')
     def get_item_to_item_recommendations(
         self,
         course_id,
         top_n=10,
         min_similarity=0.1    
     ):
-        """ Get item-to-item recommendations for a specific course """
-        # get course index
-        course_indices = self.courses_df[self.courses_df['course_id'] == course_id].index
-        if len(course_indices) == 0:
-            raise ValueError(f"Course ID {course_id} not found in the dataset.")
-        course_index = course_indices[0]
-
-        # get similarity scores for the course
-        similarity_scores = self.similarity_matrix[course_index]
-
-        # get top N similar courses
-        similar_courses_indices = np.argsort(similarity_scores)[::-1]
-        similar_courses_indices = similar_courses_indices[similarity_scores[similar_courses_indices] > min_similarity]
-
-        # exclude the given course_id
-        similar_courses_indices = similar_courses_indices[similar_courses_indices != course_index]
+        """ 
+        Get item-to-item recommendations for a specific course
+        Served from the precomputed neighbor index in O(top_n)
+        """
+        # neighbors are sorted by similarity and never include the course itself
+        similar_course_ids, _ = self.neighbor_index.get_neighbors(
+            course_id,
+            top_n=top_n,
+            min_similarity=min_similarity
+        )
 
-        # return top N course_ids as a comma delimited array
-        top_n_course_ids = self.courses_df.iloc[similar_courses_indices]['course_id'].head(top_n).values.tolist()
+        # return top N course_ids as a list
+        top_n_course_ids = similar_course_ids.tolist()
 
         return top_n_course_ids
 
+    @recommender_metrics.timed_query('user_to_item')
     def get_user_to_item_recommendations(
         self,
         user_id,
-        top_n=10
+        top_n=10,
+        enrolled_course_ids=None
     ):
-        """ Get user-to-item recommendations for a specific user """
+        """ 
+        Get user-to-item recommendations for a specific user
+        Users unseen at training time are folded in from enrolled_course_ids
+        """
+        if user_id not in self.user_mapping:
+            return self._get_folded_user_recommendations(user_id, enrolled_course_ids or [], top_n)
+
         user_idx = self.user_mapping[user_id]
         user_items = self.interactions_matrix[user_idx]
 
@@ -428,10 +1058,11 @@ class CourseRecommender:
             userid=user_idx,
             user_items=user_items,
             N=top_n,
-            filter_already_liked_items=True
+            filter_already_liked_items=True,
+            filter_items=[0] # padding column, not a course
         )
 
-        reverse_course_mapping = {idx: course for course, idx in self.course_mapping.items()}
+        reverse_course_mapping = self._get_reverse_course_mapping()
         # recommended_courses = [
         #     (reverse_course_mapping[course_id], float(score))
         #     for course_id, score in zip(recommended_course_indices, scores)
@@ -439,3 +1070,246 @@ class CourseRecommender:
         top_n_course_ids = [int(reverse_course_mapping[course_id]) for course_id in recommended_course_indices]
 
         return top_n_course_ids
+
+    def _get_reverse_course_mapping(self):
+        """ Map item indices back to course IDs """
+        if self._reverse_course_mapping is None:
+            self._reverse_course_mapping = {idx: course for course, idx in self.course_mapping.items()}
+        return self._reverse_course_mapping
+
+    def _build_user_items(self, course_ids):
+        """ Build a 1 x n_items interaction row for courses known to the model """
+        course_indices = sorted({
+            self.course_mapping[course_id]
+            for course_id in course_ids
+            if course_id in self.course_mapping
+        })
+        return csr_matrix(
+            (np.full(len(course_indices), self.confidence_multiplier, dtype=np.float32),
+             (np.zeros(len(course_indices), dtype=np.int32), course_indices)),
+            shape=(1, self.interactions_matrix.shape[1])
+        )
+
+    def get_folded_user_factors(self, user_id, course_ids):
+        """ 
+        Solve for the latent vector of a user unseen at training time
+        The least squares solve runs against the fixed item factors and is cached per user
+        until the user's enrollments change
+        """
+        user_items = self._build_user_items(course_ids)
+        cache_key = tuple(user_items.indices)
+
+        with self._folded_users_lock:
+            cached = self._folded_users.get(user_id)
+            if cached is not None and cached[0] == cache_key:
+                self._folded_users.move_to_end(user_id)
+                return cached[1], user_items
+
+        user_factors = np.asarray(self.model.recalculate_user(0, user_items)).reshape(-1)
+
+        with self._folded_users_lock:
+            self._folded_users[user_id] = (cache_key, user_factors)
+            self._folded_users.move_to_end(user_id)
+            while len(self._folded_users) > FOLDED_USER_CACHE_SIZE:
+                self._folded_users.popitem(last=False)
+
+        return user_factors, user_items
+
+    def _get_folded_user_recommendations(self, user_id, course_ids, top_n):
+        """ Recommend for a user unseen at training time through ALS fold-in """
+        user_factors, user_items = self.get_folded_user_factors(user_id, course_ids)
+        if user_items.nnz == 0:
+            # nothing to fold in, the caller falls back to its cold start strategy
+            return []
+
+        scores = self._to_numpy(self.model.item_factors) @ user_factors
+        scores[0] = -np.inf # padding column, not a course
+        scores[user_items.indices] = -np.inf
+
+        top_n = min(top_n, len(scores) - user_items.nnz - 1)
+        if top_n <= 0:
+            return []
+        top_indices = np.argpartition(-scores, top_n - 1)[:top_n]
+        top_indices = top_indices[np.argsort(-scores[top_indices])]
+
+        reverse_course_mapping = self._get_reverse_course_mapping()
+        return [int(reverse_course_mapping[course_idx]) for course_idx in top_indices]
+
+    def _get_catalog_item_indices(self):
+        """ ALS item index of every catalog row, 0 (the padding column) for courses unseen at training time """
+        row_ids = self.neighbor_index.row_ids
+        catalog_item_indices = self._catalog_item_indices
+        # courses added through upsert_course extend the catalog
+        if catalog_item_indices is None or len(catalog_item_indices) != len(row_ids):
+            catalog_item_indices = np.fromiter(
+                (self.course_mapping.get(self._to_builtin(course_id), 0) for course_id in row_ids),
+                dtype=np.int64,
+                count=len(row_ids)
+            )
+            self._catalog_item_indices = catalog_item_indices
+        return catalog_item_indices
+
+    def _get_similarity_matrix(self):
+        """ 
+        Sparse course x course matrix of the neighbor index, row i holding the top-K similarities of course i
+        Shares the index arrays, rebuilt only when the index is replaced
+        """
+        neighbor_index = self.neighbor_index
+        cached = self._similarity_matrix
+        if cached is None or cached[0] is not neighbor_index:
+            n_courses, k = len(neighbor_index), neighbor_index.k
+            similarity_matrix = csr_matrix(
+                (np.asarray(neighbor_index.scores).ravel(),
+                 np.asarray(neighbor_index.neighbors).ravel(),
+                 np.arange(0, n_courses * k + 1, k) if k else np.zeros(n_courses + 1, dtype=np.int64)),
+                shape=(n_courses, n_courses)
+            )
+            cached = (neighbor_index, similarity_matrix)
+            self._similarity_matrix = cached
+        return cached[1]
+
+    @recommender_metrics.timed_query('profile_scores')
+    def get_profile_scores(self, course_ids, weights):
+        """
+        Score every catalog course against a weighted set of courses (a user profile)
+        in one sparse vector times similarity matrix product, normalized by the total weight
+        Returns None when no profile course is in the catalog
+        """
+        profile_rows, profile_weights = [], []
+        for course_id, weight in zip(course_ids, weights):
+            row = self.neighbor_index.id_to_row.get(self._to_builtin(course_id))
+            if row is not None:
+                profile_rows.append(row)
+                profile_weights.append(weight)
+        if not profile_rows:
+            return None
+
+        n_courses = len(self.neighbor_index)
+        profile = csr_matrix(
+            (np.asarray(profile_weights, dtype=np.float32), (np.zeros(len(profile_rows), dtype=np.int64), profile_rows)),
+            shape=(1, n_courses)
+        )
+        scores = (profile @ self._get_similarity_matrix()).toarray().ravel()
+        return scores / profile.sum()
+
+    @recommender_metrics.timed_query('profile_recommendations')
+    def get_profile_recommendations(self, profile_scores, top_n=10, exclude_course_ids=None, min_similarity=0.0):
+        """ Get the course ids with the highest profile scores, best first """
+        scores = np.array(profile_scores, dtype=np.float32)
+        if exclude_course_ids is not None:
+            excluded_rows = [
+                self.neighbor_index.id_to_row[course_id]
+                for course_id in exclude_course_ids
+                if course_id in self.neighbor_index
+            ]
+            scores[excluded_rows] = -np.inf
+
+        top_rows, top_scores = top_k_rows(scores[np.newaxis], min(top_n, len(scores)))
+        top_rows = top_rows[0][top_scores[0] > min_similarity]
+        return [self._to_builtin(course_id) for course_id in self.neighbor_index.row_ids[top_rows]]
+
+    def _get_content_scores(self, course_ids):
+        """ Mean neighbor similarity of every catalog row to the given courses, None if none is indexed """
+        seed_rows = [
+            self.neighbor_index.id_to_row[course_id]
+            for course_id in course_ids
+            if course_id in self.neighbor_index
+        ]
+        if not seed_rows:
+            return None
+
+        neighbors = np.asarray(self.neighbor_index.neighbors[seed_rows]).ravel()
+        scores = np.asarray(self.neighbor_index.scores[seed_rows]).ravel()
+        return np.bincount(neighbors, weights=scores, minlength=len(self.neighbor_index)) / len(seed_rows)
+
+    def _get_collaborative_scores(self, user_id, course_ids):
+        """ 
+        ALS score of every catalog row and a mask of the rows the model knows
+        Unseen users are folded in, None if the user has no course known to the model
+        """
+        if user_id in self.user_mapping:
+            user_factors = self._to_numpy(self.model.user_factors)[self.user_mapping[user_id]]
+        else:
+            user_factors, user_items = self.get_folded_user_factors(user_id, course_ids)
+            if user_items.nnz == 0:
+                return None, None
+
+        catalog_item_indices = self._get_catalog_item_indices()
+        scores = self._to_numpy(self.model.item_factors)[catalog_item_indices] @ user_factors
+        return scores, catalog_item_indices > 0
+
+    @staticmethod
+    def _min_max_normalize(scores, mask):
+        """ Scale scores to [0, 1] over the rows in mask """
+        if not mask.any():
+            return np.zeros_like(scores)
+        low, high = scores[mask].min(), scores[mask].max()
+        if high <= low:
+            return np.zeros_like(scores)
+        return (scores - low) / (high - low)
+
+    @recommender_metrics.timed_query('hybrid')
+    def get_hybrid_recommendations(
+        self,
+        user_id,
+        enrolled_course_ids,
+        top_n=10,
+        content_weight=HYBRID_CONTENT_WEIGHT,
+        collaborative_weight=HYBRID_COLLABORATIVE_WEIGHT,
+        content_scores=None
+    ):
+        """
+        Get recommendations that blend content similarity and ALS scores
+        Both are computed for the whole catalog at once, min-max normalized over the courses
+        the user is not enrolled in and averaged with the given weights.
+        A missing source drops out of the blend per course: cold users are ranked by content only,
+        courses unseen by ALS by their content score only
+        content_scores, e.g. user profile scores, replaces the mean similarity to enrolled courses
+        """
+        n_courses = len(self.neighbor_index)
+        if content_scores is None:
+            content_scores = self._get_content_scores(enrolled_course_ids)
+        collaborative_scores, collaborative_known = self._get_collaborative_scores(user_id, enrolled_course_ids)
+        if content_scores is None and collaborative_scores is None:
+            # cold start, the caller falls back to its default ordering
+            return []
+
+        candidates = np.ones(n_courses, dtype=bool)
+        enrolled_rows = [
+            self.neighbor_index.id_to_row[course_id]
+            for course_id in enrolled_course_ids
+            if course_id in self.neighbor_index
+        ]
+        candidates[enrolled_rows] = False
+
+        blended = np.zeros(n_courses)
+        total_weight = np.zeros(n_courses)
+        if content_scores is not None:
+            blended += content_weight * self._min_max_normalize(content_scores, candidates)
+            total_weight += content_weight
+        if collaborative_scores is not None:
+            known_weight = collaborative_weight * collaborative_known
+            blended += known_weight * self._min_max_normalize(collaborative_scores, candidates & collaborative_known)
+            total_weight += known_weight
+
+        blended = np.divide(blended, total_weight, out=np.zeros(n_courses), where=total_weight > 0)
+        blended[~candidates] = -np.inf
+
+        top_rows, _ = top_k_rows(blended[np.newaxis].astype(np.float32), min(top_n, int(candidates.sum())))
+        return [self._to_builtin(course_id) for course_id in self.neighbor_index.row_ids[top_rows[0]]]
+
+    @recommender_metrics.timed_query('two_tower')
+    def get_two_tower_recommendations(self, enrolled_course_ids, top_n=10):
+        """ 
+        Get two-tower recommendations from the courses a user is enrolled in, best first
+        The user tower runs on the enrollments at request time, so new users need no fold-in
+        Empty when the model is unavailable or no enrolled course is known to it
+        """
+        two_tower = self.two_tower
+        if two_tower is None:
+            return []
+        return two_tower.get_recommendations(
+            enrolled_course_ids,
+            top_n=top_n,
+            exclude_course_ids=enrolled_course_ids
+        )
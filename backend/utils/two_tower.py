@@ -1,268 +1,320 @@
-import pandas as pd
+# Two-tower retrieval model for course recommendations
+# The course tower embeds a course from its content vector (the recommender's item_features) plus a
+# learned per-course offset, the user tower embeds a user from the weighted bag of courses they
+# interacted with, so users enrolled after training are embedded without retraining
+# Both towers output L2-normalized vectors and a recommendation is a nearest neighbor search of the
+# user vector over the exported course vectors (utils/embedding_index.py, FAISS above its threshold)
+# Training is CPU friendly:
+# - positives are the (user, course) interactions, every other course in the batch is a negative
+#   (in-batch softmax with a log-popularity correction)
+# - content features, histories and examples are tensorised once, batches are index slices
+#   instead of a DataLoader
+# - histories are padded to TWO_TOWER_MAX_HISTORY and reduced with embedding_bag,
+#   so no batch x history x features tensor is materialized
+# Throughput is logged per epoch and kept in stats, query latency is measured by
+# utils/recommender_benchmark.py --modes two_tower
+
+import os
+import copy
+import json
+import time
 import numpy as np
-from scipy.sparse import csr_matrix
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import pandas as pd
 import torch
-import torch.nn as nn
-import torch.optim as optim
-from torch.utils.data import Dataset, DataLoader
-import pytorch_lightning as pl
-from typing import Dict, List, Optional, Tuple
-import logging
-import joblib
-from datetime import datetime
-import faiss
-
-class CourseDataset(Dataset):
-    def __init__(self, user_ids, course_ids, ratings, n_users, n_courses):
-        self.user_ids = torch.LongTensor(user_ids)
-        self.course_ids = torch.LongTensor(course_ids)
-        self.ratings = torch.FloatTensor(ratings)
-        self.n_users = n_users
-        self.n_courses = n_courses
-
-    def __len__(self):
-        return len(self.ratings)
-
-    def __getitem__(self, idx):
-        return self.user_ids[idx], self.course_ids[idx], self.ratings[idx]
-
-class HybridRecommenderNet(pl.LightningModule):
-    def __init__(self, n_users, n_courses, n_factors=50, content_features_dim=512):
+import torch.nn.functional as F
+from torch import nn
+
+from utils.embedding_index import EmbeddingIndex
+
+TWO_TOWER_EPOCHS = int(os.getenv('TWO_TOWER_EPOCHS', 5)) # 0 disables two-tower training
+TWO_TOWER_DIMENSIONS = 64
+TWO_TOWER_HIDDEN = 256
+TWO_TOWER_BATCH_SIZE = 1024 # interactions per step, also the number of in-batch negatives
+TWO_TOWER_LEARNING_RATE = 0.003
+TWO_TOWER_TEMPERATURE = 0.05
+TWO_TOWER_MAX_HISTORY = 50 # heaviest courses of a user's history fed to the user tower
+TWO_TOWER_INFERENCE_BATCH_SIZE = 4096 # users or courses encoded per forward pass
+
+class TwoTowerNet(nn.Module):
+    def __init__(self, content_features, dimensions=TWO_TOWER_DIMENSIONS, hidden=TWO_TOWER_HIDDEN):
+        """
+        Initialize both towers over a fixed content matrix
+        Item index 0 is padding, item i + 1 is row i of content_features
+        """
         super().__init__()
-        self.user_factors = nn.Embedding(n_users, n_factors)
-        self.course_factors = nn.Embedding(n_courses, n_factors)
-        self.content_projection = nn.Linear(content_features_dim, n_factors)
-        
-        self.predictor = nn.Sequential(
-            nn.Linear(n_factors * 3, 128),
-            nn.ReLU(),
-            nn.Dropout(0.2),
-            nn.Linear(128, 64),
-            nn.ReLU(),
-            nn.Dropout(0.2),
-            nn.Linear(64, 1),
-            nn.Sigmoid()
-        )
-        
-    def forward(self, user_ids, course_ids, content_features):
-        user_embeddings = self.user_factors(user_ids)
-        course_embeddings = self.course_factors(course_ids)
-        content_embeddings = self.content_projection(content_features)
-        
-        combined = torch.cat([
-            user_embeddings,
-            course_embeddings,
-            content_embeddings
-        ], dim=1)
-        
-        return self.predictor(combined).squeeze()
-
-class CourseRecommender:
-    def __init__(self, use_gpu: bool = True):
-        self.device = torch.device('cuda' if use_gpu and torch.cuda.is_available() else 'cpu')
-        self.model = None
-        self.user_encoder = LabelEncoder()
-        self.course_encoder = LabelEncoder()
-        self.vectorizer = TfidfVectorizer(max_features=512)
-        self.scaler = StandardScaler()
-        self.faiss_index = None
-        self.logger = self._setup_logger()
-        
-    def _setup_logger(self):
-        logger = logging.getLogger('CourseRecommender')
-        logger.setLevel(logging.INFO)
-        handler = logging.StreamHandler()
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-        return logger
-
-    def preprocess_content(self, courses_df: pd.DataFrame) -> np.ndarray:
-        text_features = courses_df['title'] + ' ' + courses_df['description']
-        tfidf_features = self.vectorizer.fit_transform(text_features).toarray()
-        
-        numerical_features = courses_df[[
-            'difficulty_level', 'duration_hours', 'avg_rating', 
-            'num_reviews', 'price'
-        ]].values
-        
-        numerical_features = self.scaler.fit_transform(numerical_features)
-        return np.hstack([tfidf_features, numerical_features])
-
-    def build_faiss_index(self, embeddings: np.ndarray):
-        dimension = embeddings.shape[1]
-        self.faiss_index = faiss.IndexFlatL2(dimension)
-        self.faiss_index.add(embeddings.astype('float32'))
-
-    def fit(self, 
-            interactions_df: pd.DataFrame, 
-            courses_df: pd.DataFrame, 
-            epochs: int = 10,
-            batch_size: int = 256,
-            learning_rate: float = 0.001):
-            
-        self.logger.info("Starting model training...")
-        
-        # Encode IDs
-        user_ids = self.user_encoder.fit_transform(interactions_df['user_id'])
-        course_ids = self.course_encoder.fit_transform(interactions_df['course_id'])
-        
-        # Process content features
-        content_features = self.preprocess_content(courses_df)
-        
-        # Create dataset
-        dataset = CourseDataset(
-            user_ids, 
-            course_ids,
-            interactions_df['rating'].values,
-            len(self.user_encoder.classes_),
-            len(self.course_encoder.classes_)
-        )
-        
-        # Initialize model
-        self.model = HybridRecommenderNet(
-            n_users=len(self.user_encoder.classes_),
-            n_courses=len(self.course_encoder.classes_),
-            content_features_dim=content_features.shape[1]
-        ).to(self.device)
-        
-        # Training loop
-        optimizer = optim.Adam(self.model.parameters(), lr=learning_rate)
-        criterion = nn.MSELoss()
-        
-        for epoch in range(epochs):
-            total_loss = 0
-            dataloader = DataLoader(dataset, batch_size=batch_size, shuffle=True)
-            
-            for batch_user_ids, batch_course_ids, batch_ratings in dataloader:
-                batch_content_features = torch.FloatTensor(
-                    content_features[batch_course_ids]
-                ).to(self.device)
-                
-                pred_ratings = self.model(
-                    batch_user_ids.to(self.device),
-                    batch_course_ids.to(self.device),
-                    batch_content_features
-                )
-                
-                loss = criterion(pred_ratings, batch_ratings.to(self.device))
-                
+        n_items, n_features = content_features.shape
+        content = torch.zeros((n_items + 1, n_features), dtype=torch.float32)
+        content[1:] = torch.as_tensor(np.asarray(content_features, dtype=np.float32))
+        # frozen and rebuilt from the recommender's item features on load, not saved twice
+        self.register_buffer('content', content, persistent=False)
+
+        self.item_content = nn.Sequential(nn.Linear(n_features, hidden), nn.ReLU(), nn.Linear(hidden, dimensions))
+        self.user_content = nn.Sequential(nn.Linear(n_features, hidden), nn.ReLU(), nn.Linear(hidden, dimensions))
+        # per-course offsets start at zero, courses without interactions are embedded from content alone
+        self.item_offsets = nn.Embedding(n_items + 1, dimensions, padding_idx=0)
+        self.user_offsets = nn.Embedding(n_items + 1, dimensions, padding_idx=0)
+        nn.init.zeros_(self.item_offsets.weight)
+        nn.init.zeros_(self.user_offsets.weight)
+
+    def encode_items(self, items):
+        """ Course tower: unit vectors of item indices """
+        vectors = self.item_content(self.content[items]) + self.item_offsets(items)
+        return F.normalize(vectors, dim=-1)
+
+    def encode_users(self, history_items, history_weights):
+        """
+        User tower: unit vectors of padded (users x history) item indices and weights
+        Weights are normalized per user, a user without history gets a zero vector
+        """
+        history_weights = history_weights / history_weights.sum(dim=1, keepdim=True).clamp(min=1e-12)
+        content = F.embedding_bag(history_items, self.content, per_sample_weights=history_weights, mode='sum')
+        offsets = F.embedding_bag(history_items, self.user_offsets.weight, per_sample_weights=history_weights, mode='sum')
+        return F.normalize(self.user_content(content) + offsets, dim=-1) * (history_weights.sum(dim=1, keepdim=True) > 0)
+
+class TwoTowerEngine:
+    def __init__(self, course_ids, content_features, dimensions=TWO_TOWER_DIMENSIONS, hidden=TWO_TOWER_HIDDEN):
+        """ Initialize an untrained engine over the catalog, course_ids in content_features row order """
+        self.course_ids = np.asarray(course_ids)
+        self.course_to_item = {self._to_builtin(course_id): item for item, course_id in enumerate(self.course_ids, start=1)}
+        self.net = TwoTowerNet(content_features, dimensions=dimensions, hidden=hidden)
+        self.net.eval()
+        self.course_index = None
+        self.stats = {}
+
+    @staticmethod
+    def _to_builtin(value):
+        return value.item() if isinstance(value, np.generic) else value
+
+    def _build_histories(self, user_codes, items, weights, n_users, max_history=TWO_TOWER_MAX_HISTORY):
+        """ Padded (users x max_history) item and weight arrays, heaviest interactions first """
+        order = np.lexsort((-weights, user_codes))
+        user_codes, items, weights = user_codes[order], items[order], weights[order]
+        starts = np.searchsorted(user_codes, np.arange(n_users))
+        positions = np.arange(len(user_codes)) - starts[user_codes]
+        keep = positions < max_history
+
+        history_items = np.zeros((n_users, max_history), dtype=np.int64)
+        history_weights = np.zeros((n_users, max_history), dtype=np.float32)
+        history_items[user_codes[keep], positions[keep]] = items[keep]
+        history_weights[user_codes[keep], positions[keep]] = weights[keep]
+        return history_items, history_weights
+
+    def fit(
+        self,
+        interactions_df,
+        epochs=TWO_TOWER_EPOCHS,
+        batch_size=TWO_TOWER_BATCH_SIZE,
+        learning_rate=TWO_TOWER_LEARNING_RATE,
+        temperature=TWO_TOWER_TEMPERATURE,
+        seed=42
+    ):
+        """
+        Train both towers on user_id, course_id[, weight] interactions and export the course vectors
+        Interactions with courses outside the catalog are ignored
+        torch's thread count is process-wide, the training process sets it (see utils/recommender_retrainer.py)
+        """
+        generator = torch.Generator().manual_seed(seed)
+        torch.manual_seed(seed)
+
+        user_codes, _ = pd.factorize(interactions_df['user_id'])
+        items = interactions_df['course_id'].map(self.course_to_item).fillna(0).to_numpy(dtype=np.int64)
+        if 'weight' in interactions_df:
+            weights = interactions_df['weight'].to_numpy(dtype=np.float32)
+        else:
+            weights = np.ones(len(interactions_df), dtype=np.float32)
+        known = items > 0
+        user_codes, items, weights = user_codes[known], items[known], weights[known]
+
+        n_users = int(user_codes.max()) + 1 if len(user_codes) else 0
+        history_items, history_weights = self._build_histories(user_codes, items, weights, n_users)
+
+        # a user with a single interaction has no history left once its target is masked out
+        trainable = np.bincount(user_codes, minlength=n_users)[user_codes] > 1
+        example_users = torch.as_tensor(user_codes[trainable], dtype=torch.int64)
+        example_items = torch.as_tensor(items[trainable])
+        example_weights = torch.as_tensor(np.log1p(weights[trainable]))
+        history_items = torch.as_tensor(history_items)
+        history_weights = torch.as_tensor(history_weights)
+
+        # in-batch negatives are sampled by popularity, correct the logits by log q
+        item_counts = np.bincount(items[trainable], minlength=len(self.course_ids) + 1)
+        log_popularity = torch.as_tensor(np.log(np.maximum(item_counts, 1) / max(item_counts.sum(), 1)), dtype=torch.float32)
+
+        n_examples = len(example_items)
+        optimizer = torch.optim.Adam(self.net.parameters(), lr=learning_rate)
+        self.net.train()
+        started = time.perf_counter()
+        for epoch in range(epochs if n_examples > 1 else 0):
+            epoch_started = time.perf_counter()
+            total_loss = 0.0
+            permutation = torch.randperm(n_examples, generator=generator)
+            for start in range(0, n_examples, batch_size):
+                batch = permutation[start:start + batch_size]
+                if len(batch) < 2:
+                    continue
+                users, targets = example_users[batch], example_items[batch]
+
+                batch_history = history_items[users]
+                # the target itself is not part of the history it is predicted from
+                batch_history_weights = history_weights[users] * (batch_history != targets[:, None])
+
+                user_vectors = self.net.encode_users(batch_history, batch_history_weights)
+                item_vectors = self.net.encode_items(targets)
+                logits = user_vectors @ item_vectors.T / temperature - log_popularity[targets][None, :]
+                # the same course twice in a batch is not a negative for itself
+                duplicates = (targets[:, None] == targets[None, :]) & ~torch.eye(len(batch), dtype=torch.bool)
+                logits = logits.masked_fill(duplicates, float('-inf'))
+
+                loss = (F.cross_entropy(logits, torch.arange(len(batch)), reduction='none') * example_weights[batch]).mean()
                 optimizer.zero_grad()
                 loss.backward()
                 optimizer.step()
-                
-                total_loss += loss.item()
-            
-            self.logger.info(f"Epoch {epoch+1}/{epochs} - Loss: {total_loss/len(dataloader):.4f}")
-        
-        # Build FAISS index for fast similarity search
-        course_embeddings = self.model.course_factors.weight.detach().cpu().numpy()
-        self.build_faiss_index(course_embeddings)
-        
-        self.logger.info("Training completed successfully")
-
-    def get_recommendations(self, 
-                          user_id: Optional[str] = None,
-                          course_id: Optional[str] = None,
-                          user_preferences: Optional[Dict] = None,
-                          n_recommendations: int = 5) -> List[str]:
+                total_loss += loss.item() * len(batch)
+
+            epoch_seconds = time.perf_counter() - epoch_started
+            print(
+                f"Two-tower epoch {epoch + 1}/{epochs} - loss {total_loss / n_examples:.4f} - "
+                f"{n_examples / max(epoch_seconds, 1e-9):.0f} interactions/s"
+            )
+        self.net.eval()
+
+        train_seconds = time.perf_counter() - started
+        self.stats = {
+            'n_users': n_users,
+            'n_examples': n_examples,
+            'epochs': epochs,
+            'train_seconds': train_seconds,
+            'train_interactions_per_second': n_examples * epochs / train_seconds if train_seconds > 0 else None,
+        }
+        self.course_index = self.build_course_index()
+        return self
+
+    @torch.inference_mode()
+    def encode_courses(self, batch_size=TWO_TOWER_INFERENCE_BATCH_SIZE):
+        """ Course tower vectors of the whole catalog, in course_ids order """
+        items = torch.arange(1, len(self.course_ids) + 1)
+        return torch.cat([
+            self.net.encode_items(items[start:start + batch_size])
+            for start in range(0, len(items), batch_size)
+        ]).numpy() if len(items) else np.empty((0, self.net.item_offsets.embedding_dim), dtype=np.float32)
+
+    def build_course_index(self, vectors=None):
+        """ Export the course vectors into an inner-product index """
+        return EmbeddingIndex(self.course_ids, self.encode_courses() if vectors is None else vectors)
+
+    def _history_arrays(self, histories, max_history=TWO_TOWER_MAX_HISTORY):
+        """ Padded item and weight arrays of (course_ids, weights) histories, courses outside the catalog dropped """
+        history_items = np.zeros((len(histories), max_history), dtype=np.int64)
+        history_weights = np.zeros((len(histories), max_history), dtype=np.float32)
+        for row, (course_ids, weights) in enumerate(histories):
+            if weights is None:
+                weights = np.ones(len(course_ids), dtype=np.float32)
+            pairs = [
+                (self.course_to_item[course_id], weight)
+                for course_id, weight in zip(course_ids, weights)
+                if course_id in self.course_to_item
+            ]
+            pairs = sorted(pairs, key=lambda pair: -pair[1])[:max_history]
+            if pairs:
+                history_items[row, :len(pairs)], history_weights[row, :len(pairs)] = zip(*pairs)
+        return history_items, history_weights
+
+    @torch.inference_mode()
+    def encode_users(self, histories, batch_size=TWO_TOWER_INFERENCE_BATCH_SIZE):
         """
-        Get recommendations using multiple strategies:
-        1. If user_id provided: Collaborative filtering
-        2. If course_id provided: Similar course recommendations
-        3. If user_preferences provided: Content-based filtering
+        User tower vectors of (course_ids, weights) histories, weights None counting every course once
+        Users are encoded in batches, an empty history gives a zero vector
         """
-        if user_id is not None:
-            return self._get_user_recommendations(user_id, n_recommendations)
-        elif course_id is not None:
-            return self._get_similar_courses(course_id, n_recommendations)
-        elif user_preferences is not None:
-            return self._get_preference_based_recommendations(user_preferences, n_recommendations)
-        else:
-            raise ValueError("Must provide either user_id, course_id, or user_preferences")
-
-    def _get_user_recommendations(self, user_id: str, n: int) -> List[str]:
-        encoded_user_id = self.user_encoder.transform([user_id])[0]
-        user_embedding = self.model.user_factors(
-            torch.LongTensor([encoded_user_id]).to(self.device)
-        ).detach().cpu().numpy()
-        
-        D, I = self.faiss_index.search(user_embedding, n)
-        return self.course_encoder.inverse_transform(I[0])
-
-    def _get_similar_courses(self, course_id: str, n: int) -> List[str]:
-        encoded_course_id = self.course_encoder.transform([course_id])[0]
-        course_embedding = self.model.course_factors(
-            torch.LongTensor([encoded_course_id]).to(self.device)
-        ).detach().cpu().numpy()
-        
-        D, I = self.faiss_index.search(course_embedding, n + 1)  # +1 to exclude the input course
-        recommended_ids = self.course_encoder.inverse_transform(I[0][1:])  # exclude first item (input course)
-        return recommended_ids.tolist()
-
-    def _get_preference_based_recommendations(self, preferences: Dict, n: int) -> List[str]:
-        # Create a feature vector from preferences
-        dummy_text = f"{preferences.get('category', '')} {preferences.get('difficulty', '')}"
-        text_features = self.vectorizer.transform([dummy_text]).toarray()
-        
-        numerical_features = np.array([[
-            preferences.get('difficulty_level', 0),
-            preferences.get('duration_hours', 0),
-            preferences.get('min_rating', 0),
-            0,  # num_reviews placeholder
-            preferences.get('max_price', 0)
-        ]])
-        
-        numerical_features = self.scaler.transform(numerical_features)
-        preference_features = np.hstack([text_features, numerical_features])
-        
-        # Project preferences into embedding space
-        preference_embedding = self.model.content_projection(
-            torch.FloatTensor(preference_features).to(self.device)
-        ).detach().cpu().numpy()
-        
-        D, I = self.faiss_index.search(preference_embedding, n)
-        return self.course_encoder.inverse_transform(I[0]).tolist()
-
-    def save_model(self, path: str):
-        state = {
-            'model_state': self.model.state_dict(),
-            'user_encoder': self.user_encoder,
-            'course_encoder': self.course_encoder,
-            'vectorizer': self.vectorizer,
-            'scaler': self.scaler,
-            'faiss_index': faiss.serialize_index(self.faiss_index)
-        }
-        torch.save(state, path)
-        self.logger.info(f"Model saved to {path}")
-
-    def load_model(self, path: str):
-        state = torch.load(path, map_location=self.device)
-        self.model.load_state_dict(state['model_state'])
-        self.user_encoder = state['user_encoder']
-        self.course_encoder = state['course_encoder']
-        self.vectorizer = state['vectorizer']
-        self.scaler = state['scaler']
-        self.faiss_index = faiss.deserialize_index(state['faiss_index'])
-        self.logger.info(f"Model loaded from {path}")
-
-# Initialize
-recommender = CourseRecommender()
-
-# Train
-recommender.fit(interactions_df, courses_df)
-
-# Get recommendations
-user_recs = recommender.get_recommendations(user_id="user123")
-similar_courses = recommender.get_recommendations(course_id="course456")
-preference_recs = recommender.get_recommendations(user_preferences={
-    "category": "Machine Learning",
-    "difficulty": "Intermediate",
-    "max_price": 100
-})
-
-# Save/load
-recommender.save_model("recommender_v1.pt")
+        history_items, history_weights = self._history_arrays(histories)
+        return np.vstack([
+            self.net.encode_users(
+                torch.as_tensor(history_items[start:start + batch_size]),
+                torch.as_tensor(history_weights[start:start + batch_size])
+            ).numpy()
+            for start in range(0, len(histories), batch_size)
+        ]) if histories else np.empty((0, self.net.item_offsets.embedding_dim), dtype=np.float32)
+
+    def get_recommendations(self, course_ids, weights=None, top_n=10, exclude_course_ids=None, candidate_ids=None):
+        """
+        Get the course ids closest to a user's history, best first
+        Returns an empty list when no history course is in the catalog, so callers can fall back
+        """
+        user_vector = self.encode_users([(course_ids, weights)])[0]
+        if not np.any(user_vector):
+            return []
+
+        exclude_course_ids = set(exclude_course_ids or [])
+        matched_course_ids, _ = self.course_index.search(
+            user_vector,
+            top_k=top_n + len(exclude_course_ids),
+            candidate_ids=candidate_ids
+        )
+        return [
+            course_id for course_id in (self._to_builtin(course_id) for course_id in matched_course_ids)
+            if course_id not in exclude_course_ids
+        ][:top_n]
+
+    def with_course(self, course_id, content_vector):
+        """ Return an engine that can also retrieve a course added or edited after training, see with_courses """
+        return self.with_courses([course_id], np.asarray(content_vector).reshape(1, -1))
+
+    @torch.inference_mode()
+    def with_courses(self, course_ids, content_vectors):
+        """
+        Return an engine that can also retrieve courses added or edited after training
+        The course vectors come from the course tower on their new content; a course new to the engine
+        keeps a zero offset and is not used in user histories until the next retrain
+        """
+        content = torch.as_tensor(np.asarray(content_vectors, dtype=np.float32).reshape(len(course_ids), -1))
+        items = torch.tensor([self.course_to_item.get(course_id, 0) for course_id in course_ids])
+        vectors = F.normalize(
+            self.net.item_content(content) + self.net.item_offsets(items),
+            dim=-1
+        ).numpy()
+
+        engine = copy.copy(self)
+        engine.course_index = self.course_index.with_rows(course_ids, vectors)
+        return engine
+
+    def save(self, path):
+        """ Save the network weights, the catalog order and the exported course vectors into a directory """
+        torch.save(self.net.state_dict(), os.path.join(path, 'two_tower.pt'))
+        np.save(os.path.join(path, 'two_tower_course_vectors.npy'), np.asarray(self.course_index.vectors, dtype=np.float32))
+        with open(os.path.join(path, 'two_tower.json'), 'w') as file:
+            json.dump({
+                'course_ids': [self._to_builtin(course_id) for course_id in self.course_index.row_ids],
+                'n_items': len(self.course_ids),
+                'dimensions': self.net.item_offsets.embedding_dim,
+                'hidden': self.net.item_content[0].out_features,
+                'stats': self.stats,
+            }, file)
+
+    @classmethod
+    def load(cls, path, content_features, mmap_mode='r'):
+        """
+        Load an engine saved by save
+        content_features are the item features of the catalog it was trained on, in the same order
+        """
+        with open(os.path.join(path, 'two_tower.json'), 'r') as file:
+            config = json.load(file)
+        n_items = config['n_items']
+
+        engine = cls(
+            config['course_ids'][:n_items],
+            np.asarray(content_features[:n_items]),
+            dimensions=config['dimensions'],
+            hidden=config['hidden']
+        )
+        engine.net.load_state_dict(torch.load(os.path.join(path, 'two_tower.pt'), map_location='cpu'))
+        engine.net.eval()
+        engine.stats = config['stats']
+        engine.course_index = EmbeddingIndex(
+            config['course_ids'],
+            np.load(os.path.join(path, 'two_tower_course_vectors.npy'), mmap_mode=mmap_mode)
+        )
+        return engine
+
+    @classmethod
+    def train(cls, course_ids, content_features, interactions_df, **kwargs):
+        """ Build and fit an engine over the catalog """
+        return cls(course_ids, content_features).fit(interactions_df, **kwargs)
@@ -0,0 +1,116 @@
+# User profiles for content recommendations
+# A profile is a recency-weighted bag of the courses a user interacted with:
+# enrollments, favourites and completed lessons (counted towards their course)
+# The recommender turns it into scores for the whole catalog with one sparse product
+# against its neighbor similarity matrix, instead of one item-to-item lookup per course
+# Profiles are cached per user as their sparse (course ids, weights), dropped when the user's interactions
+# change, and scored per request, so the cache stays small and always matches the served neighbor index
+
+import os
+import time
+import threading
+import numpy as np
+from datetime import datetime, timezone
+from collections import OrderedDict
+
+from models.enrollment import Enrollment
+from models.favourite import Favourite
+from models.lesson_completion import LessonCompletion
+from models.chapter_lesson import ChapterLesson
+from models.chapter import Chapter
+
+PROFILE_INTERACTION_WEIGHTS = {
+    'enrollment': 1.0,
+    'favourite': 0.5,
+    'lesson_completion': 0.1, # per completed lesson
+}
+PROFILE_RECENCY_HALF_LIFE = float(os.getenv('PROFILE_RECENCY_HALF_LIFE', 90)) # days
+USER_PROFILE_CACHE_SIZE = 10000 # users
+USER_PROFILE_CACHE_TTL = int(os.getenv('USER_PROFILE_CACHE_TTL', 300)) # seconds, bounds staleness across workers
+
+def load_user_interactions(session, user_id, now=None):
+    """
+    Load a user's interactions as (course_ids, weights)
+    Each interaction weighs its kind's weight, halved every PROFILE_RECENCY_HALF_LIFE days
+    """
+    interactions = (
+        [(course_id, created, 'enrollment') for course_id, created in (
+            session.query(Enrollment.course_id, Enrollment.enrolled)
+            .filter(Enrollment.user_id == user_id)
+        )]
+        + [(course_id, created, 'favourite') for course_id, created in (
+            session.query(Favourite.course_id, Favourite.created)
+            .filter(Favourite.user_id == user_id)
+        )]
+        + [(course_id, created, 'lesson_completion') for course_id, created in (
+            session.query(Chapter.course_id, LessonCompletion.completed)
+            .join(ChapterLesson, ChapterLesson.lesson_id == LessonCompletion.lesson_id)
+            .join(Chapter, Chapter.id == ChapterLesson.chapter_id)
+            .filter(LessonCompletion.user_id == user_id)
+        )]
+    )
+    if not interactions:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    import pandas as pd # only processes serving recommendations need pandas
+
+    interactions_df = pd.DataFrame(interactions, columns=['course_id', 'created', 'kind'])
+    now = now or datetime.now(timezone.utc)
+    age_days = (pd.Timestamp(now) - pd.to_datetime(interactions_df['created'], utc=True)).dt.total_seconds() / 86400
+    interactions_df['weight'] = (
+        interactions_df['kind'].map(PROFILE_INTERACTION_WEIGHTS)
+        * np.power(0.5, np.maximum(age_days, 0) / PROFILE_RECENCY_HALF_LIFE)
+    )
+
+    weights = interactions_df.groupby('course_id')['weight'].sum()
+    return weights.index.to_numpy(dtype=np.int64), weights.to_numpy(dtype=np.float32)
+
+class UserProfiles:
+    def __init__(self, ttl=USER_PROFILE_CACHE_TTL, max_users=USER_PROFILE_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_users = max_users
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_profile(self, session, user_id):
+        """ Get the user's profile as (course_ids, weights) """
+        with self._lock:
+            profile = self._profiles.get(user_id)
+            if profile is not None and time.monotonic() - profile['loaded'] >= self.ttl:
+                profile = None
+            if profile is not None:
+                self._profiles.move_to_end(user_id)
+                self.hits += 1
+                return profile['course_ids'], profile['weights']
+            self.misses += 1
+
+        course_ids, weights = load_user_interactions(session, user_id)
+        with self._lock:
+            self._profiles[user_id] = {'loaded': time.monotonic(), 'course_ids': course_ids, 'weights': weights}
+            self._profiles.move_to_end(user_id)
+            while len(self._profiles) > self.max_users:
+                self._profiles.popitem(last=False)
+
+        return course_ids, weights
+
+    def get_scores(self, session, recommender, user_id):
+        """
+        Get the user's profile scores for every course in the recommender catalog,
+        None for users without interactions known to the recommender
+        """
+        course_ids, weights = self.get_profile(session, user_id)
+        if not len(course_ids):
+            return None
+        return recommender.get_profile_scores(course_ids, weights)
+
+    def invalidate(self, user_id):
+        """ Drop the cached profile of a user """
+        with self._lock:
+            self._profiles.pop(user_id, None)
+
+_user_profiles = UserProfiles()
+
+def get_user_profiles():
+    return _user_profiles